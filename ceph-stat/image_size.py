@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+批量统计 RBD 卷的实际用量，按命名空间和租户汇总，用于容量规划。
+
+与 test.sh 相同，每个镜像调用一次 imagestat 的 /api/v1/image-size 接口，但：
+- 卷列表来自 `kubectl get pv -o json`（所有 ceph-csi RBD 卷），或 k8s-tools/pv_index.py --format json、
+  k8s-tools/GetPersistentVolumes.sh 的输出；
+- 每个工作线程复用一个 HTTP keep-alive 连接，并发数由 --concurrency 限制；
+- 结果缓存在本地文件中，--ttl 秒内重复执行不会再次查询。
+
+用法：
+    python3 image_size.py --region dc2
+    python3 image_size.py --region dc2 --input pvs.txt --namespace aione-staging
+    python3 ../k8s-tools/pv_index.py -n aione-staging --format json | python3 image_size.py --input -
+    python3 image_size.py --region dc2 --format csv --by tenant > usage.csv
+"""
+import argparse
+import csv
+import http.client
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+API_URL = "http://imagestat.ops.fzyun.io/api/v1/image-size"
+DEFAULT_REGION = "dc2"
+DEFAULT_CONCURRENCY = 16
+HTTP_TIMEOUT_SECONDS = 10
+# 缓存有效期（秒）
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.cache/ceph-stat/image-size.json")
+# 命名空间上表示租户的标签
+DEFAULT_TENANT_LABEL = "tenant"
+RBD_DRIVER_SUFFIX = "rbd.csi.ceph.com"
+# 接口返回中表示已用和分配大小（字节）的字段，按顺序取第一个存在的
+USED_FIELDS = ("used_size", "used", "usedSize")
+PROVISIONED_FIELDS = ("provisioned_size", "provisioned", "size")
+UNITS = {"": 1, "k": 1000, "M": 1000**2, "G": 1000**3, "T": 1000**4, "P": 1000**5}
+UNITS.update({"Ki": 1024, "Mi": 1024**2, "Gi": 1024**3, "Ti": 1024**4, "Pi": 1024**5})
+
+logger = logging.getLogger("image_size")
+
+
+@dataclass
+class Volume:
+    pv: str
+    namespace: str
+    pvc: str
+    image: str
+    pool: str
+    capacity: int
+
+
+@dataclass
+class ImageSize:
+    used: Optional[int]
+    provisioned: Optional[int]
+    error: Optional[str] = None
+
+
+def parse_quantity(quantity: str) -> int:
+    """
+    解析 Kubernetes 容量，例如 "10Gi"、"500M"。
+    """
+    match = re.fullmatch(r"([0-9.]+)([A-Za-z]*)", quantity.strip())
+    if not match or match.group(2) not in UNITS:
+        raise ValueError(f"无法解析容量: {quantity}")
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+
+def volumes_from_cluster(kubectl: str = "kubectl") -> List[Volume]:
+    """
+    一次 `kubectl get pv -o json` 取出所有 ceph-csi RBD 卷。
+    """
+    result = subprocess.run([kubectl, "get", "pv", "-o", "json"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"kubectl get pv 失败: {result.stderr.strip()}")
+    volumes = []
+    for item in json.loads(result.stdout)["items"]:
+        spec = item["spec"]
+        csi = spec.get("csi") or {}
+        attributes = csi.get("volumeAttributes") or {}
+        if not csi.get("driver", "").endswith(RBD_DRIVER_SUFFIX) or "imageName" not in attributes:
+            continue
+        claim = spec.get("claimRef") or {}
+        volumes.append(
+            Volume(
+                pv=item["metadata"]["name"],
+                namespace=claim.get("namespace", "-"),
+                pvc=claim.get("name", "-"),
+                image=attributes["imageName"],
+                pool=attributes.get("pool", ""),
+                capacity=parse_quantity(spec.get("capacity", {}).get("storage", "0")),
+            )
+        )
+    return volumes
+
+
+def volumes_from_text(lines: Iterable[str], namespace: str = "-") -> List[Volume]:
+    """
+    解析 GetPersistentVolumes.sh 的输出，其中不含命名空间和容量。
+    """
+    volumes = []
+    current: Dict[str, str] = {}
+    for line in lines:
+        match = re.match(r"\s*PVC:\s*(\S+)\s+PV:\s*(\S+)", line)
+        if match:
+            current = {"pvc": match.group(1), "pv": match.group(2)}
+            continue
+        match = re.match(r"\s*(imageName|pool):\s*(\S*)", line)
+        if match and current:
+            current[match.group(1)] = match.group(2)
+            if "imageName" in current and "pool" in current:
+                volumes.append(Volume(current["pv"], namespace, current["pvc"], current["imageName"], current["pool"], 0))
+                current = {}
+    return volumes
+
+
+def volumes_from_index(rows: List[dict]) -> List[Volume]:
+    """
+    解析 k8s-tools/pv_index.py 的 JSON 输出，跳过不是 RBD 卷的行。
+    pv_index.py 每个挂载卷的 Pod 输出一行，多个 Pod 共用的 PVC 按 PV 去重，只统计一次。
+    """
+    volumes: Dict[str, Volume] = {}
+    for row in rows:
+        if row["image"] and row["pv"] not in volumes:
+            volumes[row["pv"]] = Volume(
+                row["pv"], row["namespace"], row["pvc"], row["image"], row["pool"], parse_quantity(row["capacity"] or "0")
+            )
+    return list(volumes.values())
+
+
+def namespace_tenants(label: str, kubectl: str = "kubectl") -> Dict[str, str]:
+    result = subprocess.run([kubectl, "get", "namespace", "-o", "json"], capture_output=True, text=True)
+    if result.returncode != 0:
+        logger.warning(f"无法获取命名空间标签，租户记为 '-': {result.stderr.strip()}")
+        return {}
+    return {
+        item["metadata"]["name"]: item["metadata"].get("labels", {}).get(label, "-")
+        for item in json.loads(result.stdout)["items"]
+    }
+
+
+class SizeCache:
+    """
+    按 (region, image) 缓存查询结果的 JSON 文件，过期条目不会被使用。
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._entries: Dict[str, dict] = {}
+        try:
+            with open(path) as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def _key(region: str, image: str) -> str:
+        return f"{region}/{image}"
+
+    def get(self, region: str, image: str) -> Optional[ImageSize]:
+        entry = self._entries.get(self._key(region, image))
+        # 没有已用大小的条目来自未把它视为失败的旧版本
+        if entry is None or entry.get("used") is None or time.time() - entry["fetched_at"] > self.ttl:
+            return None
+        return ImageSize(entry["used"], entry["provisioned"])
+
+    def put(self, region: str, image: str, size: ImageSize):
+        self._entries[self._key(region, image)] = {
+            "used": size.used,
+            "provisioned": size.provisioned,
+            "fetched_at": time.time(),
+        }
+
+    def save(self):
+        now = time.time()
+        entries = {key: entry for key, entry in self._entries.items() if now - entry["fetched_at"] <= self.ttl}
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+
+def _first(payload: dict, fields: Tuple[str, ...]) -> Optional[int]:
+    for field in fields:
+        if payload.get(field) is not None:
+            return int(payload[field])
+    return None
+
+
+def parse_image_size(payload, image: str) -> ImageSize:
+    """
+    解析 image-size 接口的返回。结果可能包在 data 中，可能是带已用、分配大小字段的对象，也可能是
+    `rbd du --format json` 的格式，此时已用大小为镜像及其快照之和，分配大小取镜像本身。
+    没有已用大小的返回视为查询失败，不会被当作 0 计入用量。
+    """
+    if isinstance(payload, dict) and isinstance(payload.get("data"), dict):
+        payload = payload["data"]
+    if not isinstance(payload, dict):
+        return ImageSize(None, None, f"无法识别的返回: {json.dumps(payload)[:200]}")
+    try:
+        if isinstance(payload.get("images"), list):
+            entries = [entry for entry in payload["images"] if entry.get("name") == image]
+            head = [entry for entry in entries if not entry.get("snapshot")]
+            used = sum(_first(entry, USED_FIELDS) or 0 for entry in entries) if entries else None
+            provisioned = _first(head[0], PROVISIONED_FIELDS) if head else None
+        else:
+            used = _first(payload, USED_FIELDS)
+            provisioned = _first(payload, PROVISIONED_FIELDS)
+    except (TypeError, ValueError) as e:
+        return ImageSize(None, None, f"无法解析大小: {e}")
+    if used is None:
+        return ImageSize(None, provisioned, f"返回中没有已用大小: {json.dumps(payload)[:200]}")
+    return ImageSize(used, provisioned)
+
+
+class ImageSizeClient:
+    """
+    imagestat 接口的客户端，每个线程复用一个 keep-alive 连接，连接被服务端关闭时重连一次。
+    """
+
+    def __init__(self, url: str = API_URL, timeout: float = HTTP_TIMEOUT_SECONDS):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.netloc = parts.netloc
+        self.path = parts.path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            cls = http.client.HTTPSConnection if self.scheme == "https" else http.client.HTTPConnection
+            connection = cls(self.netloc, timeout=self.timeout)
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def get(self, region: str, image: str) -> ImageSize:
+        query = urlencode({"region": region, "imageName": image})
+        for attempt in range(2):
+            connection = self._connection()
+            try:
+                connection.request("GET", f"{self.path}?{query}", headers={"Connection": "keep-alive"})
+                response = connection.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                if attempt:
+                    return ImageSize(None, None, str(e))
+                continue
+            if response.status != 200:
+                return ImageSize(None, None, f"HTTP {response.status}: {body[:200].decode(errors='replace')}")
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return ImageSize(None, None, f"无法解析返回: {body[:200].decode(errors='replace')}")
+            return parse_image_size(payload, image)
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+
+def collect_sizes(
+    volumes: List[Volume], client: ImageSizeClient, cache: SizeCache, region: str, concurrency: int
+) -> Dict[str, ImageSize]:
+    """
+    查询所有卷的镜像大小，缓存命中的不再查询，同一镜像只查询一次。
+    """
+    sizes: Dict[str, ImageSize] = {}
+    missing = []
+    for image in dict.fromkeys(v.image for v in volumes):
+        cached = cache.get(region, image)
+        if cached is not None:
+            sizes[image] = cached
+        else:
+            missing.append(image)
+    logger.info(f"{len(sizes)} 个镜像命中缓存，查询 {len(missing)} 个")
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for image, size in zip(missing, executor.map(lambda i: client.get(region, i), missing)):
+            sizes[image] = size
+            if size.error:
+                logger.warning(f"查询 {image} 失败: {size.error}")
+            else:
+                cache.put(region, image, size)
+    if missing:
+        logger.info(f"查询 {len(missing)} 个镜像用时 {time.monotonic() - start:.1f} 秒")
+    return sizes
+
+
+def build_report(
+    volumes: List[Volume], sizes: Dict[str, ImageSize], tenants: Dict[str, str], by: str
+) -> List[dict]:
+    """
+    按命名空间（by="namespace"）或租户（by="tenant"）汇总卷数、申请容量和实际用量。
+    """
+    rows: Dict[Tuple[str, str], dict] = {}
+    for volume in volumes:
+        tenant = tenants.get(volume.namespace, "-")
+        key = (tenant, volume.namespace) if by == "namespace" else (tenant, "")
+        row = rows.setdefault(
+            key,
+            {"tenant": tenant, "namespace": key[1], "volumes": 0, "capacity": 0, "provisioned": 0, "used": 0, "failed": 0},
+        )
+        size = sizes[volume.image]
+        row["volumes"] += 1
+        row["capacity"] += volume.capacity
+        if size.error:
+            row["failed"] += 1
+            continue
+        row["used"] += size.used
+        row["provisioned"] += size.provisioned or 0
+    report = sorted(rows.values(), key=lambda r: r["used"], reverse=True)
+    if by == "tenant":
+        for row in report:
+            del row["namespace"]
+    return report
+
+
+def human(size: int) -> str:
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(size) < 1024 or unit == "TiB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{size}B"
+        size /= 1024
+    return str(size)
+
+
+def write_report(report: List[dict], fmt: str, out=None):
+    out = out if out is not None else sys.stdout
+    if fmt == "json":
+        json.dump(report, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    if not report:
+        return
+    fields = list(report[0])
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(report)
+        return
+    sized = ("capacity", "provisioned", "used")
+    table = [fields] + [[human(r[f]) if f in sized else str(r[f]) for f in fields] for r in report]
+    widths = [max(len(row[i]) for row in table) for i in range(len(fields))]
+    for row in table:
+        out.write("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--region", default=DEFAULT_REGION, help="imagestat 的 region")
+    parser.add_argument("--url", default=API_URL, help="image-size 接口地址")
+    parser.add_argument(
+        "--input", help="pv_index.py 的 JSON 输出或 GetPersistentVolumes.sh 的输出文件（- 为标准输入），默认从集群读取所有 PV"
+    )
+    parser.add_argument("--namespace", default="-", help="GetPersistentVolumes.sh 输出中卷所在的命名空间")
+    parser.add_argument("--kubectl", default="kubectl", help="kubectl 命令")
+    parser.add_argument("--tenant-label", default=DEFAULT_TENANT_LABEL, help="命名空间上表示租户的标签")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="最大并发查询数")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL_SECONDS, help="缓存有效期（秒），0 表示不使用缓存")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="缓存文件")
+    parser.add_argument("--by", choices=("namespace", "tenant"), default="namespace", help="汇总维度")
+    parser.add_argument("--format", choices=("table", "csv", "json"), default="table", help="输出格式")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s %(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    try:
+        if args.input:
+            with open(args.input) if args.input != "-" else sys.stdin as f:
+                text = f.read()
+            if text.lstrip().startswith("["):
+                volumes = volumes_from_index(json.loads(text))
+            else:
+                volumes = volumes_from_text(text.splitlines(), args.namespace)
+        else:
+            volumes = volumes_from_cluster(args.kubectl)
+    except (OSError, RuntimeError, ValueError, KeyError) as e:
+        logger.error(str(e))
+        return 1
+    logger.info(f"共 {len(volumes)} 个 RBD 卷")
+    tenants = namespace_tenants(args.tenant_label, args.kubectl) if args.by == "tenant" or not args.input else {}
+
+    cache = SizeCache(args.cache, args.ttl)
+    client = ImageSizeClient(args.url)
+    try:
+        sizes = collect_sizes(volumes, client, cache, args.region, args.concurrency)
+    finally:
+        client.close()
+        if args.ttl > 0:
+            try:
+                cache.save()
+            except OSError as e:
+                logger.warning(f"无法写入缓存 {args.cache}: {e}")
+
+    write_report(build_report(volumes, sizes, tenants, args.by), args.format)
+    failed = sum(1 for size in sizes.values() if size.error)
+    if failed:
+        logger.warning(f"{failed} 个镜像查询失败，未计入用量")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from image_size import (
+    ImageSize,
+    ImageSizeClient,
+    SizeCache,
+    Volume,
+    build_report,
+    collect_sizes,
+    main,
+    parse_image_size,
+    volumes_from_index,
+)
+
+GiB = 1024**3
+
+# imageName -> (HTTP status, body)
+RESPONSES = {
+    "csi-vol-a": (200, {"used_size": 2 * GiB, "provisioned_size": 10 * GiB}),
+    "csi-vol-b": (200, {"code": 0, "data": {"used": 1 * GiB, "size": 5 * GiB}}),
+    "csi-vol-c": (
+        200,
+        {
+            "images": [
+                {"name": "csi-vol-c", "snapshot": "snap1", "provisioned_size": 20 * GiB, "used_size": 1 * GiB},
+                {"name": "csi-vol-c", "provisioned_size": 20 * GiB, "used_size": 3 * GiB},
+            ],
+            "total_provisioned_size": 40 * GiB,
+            "total_used_size": 4 * GiB,
+        },
+    ),
+    "csi-vol-nosize": (200, {"code": 0, "data": {"provisioned_size": 10 * GiB}}),
+    "csi-vol-missing": (404, {"message": "image not found"}),
+}
+
+
+@pytest.fixture
+def imagestat():
+    """
+    A local imagestat serving RESPONSES, recording the query and the client port of every request.
+    """
+    requests = []
+
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            parts = urlsplit(self.path)
+            query = {key: values[0] for key, values in parse_qs(parts.query).items()}
+            requests.append((parts.path, query, self.client_address[1]))
+            status, payload = RESPONSES.get(query.get("imageName"), (404, {}))
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/api/v1/image-size", requests
+    server.shutdown()
+    server.server_close()
+
+
+def volume(image, namespace="ns1", capacity=10 * GiB):
+    return Volume(f"pv-{image}", namespace, f"pvc-{image}", image, "rbd", capacity)
+
+
+def test_parse_image_size():
+    assert parse_image_size(RESPONSES["csi-vol-a"][1], "csi-vol-a") == ImageSize(2 * GiB, 10 * GiB)
+    assert parse_image_size(RESPONSES["csi-vol-b"][1], "csi-vol-b") == ImageSize(1 * GiB, 5 * GiB)
+    # rbd du lists the snapshots of the image too, their space counts as used
+    assert parse_image_size(RESPONSES["csi-vol-c"][1], "csi-vol-c") == ImageSize(4 * GiB, 20 * GiB)
+    size = parse_image_size(RESPONSES["csi-vol-nosize"][1], "csi-vol-nosize")
+    assert size.used is None and "已用大小" in size.error
+    assert parse_image_size({"images": []}, "csi-vol-a").error
+    assert parse_image_size(["unexpected"], "csi-vol-a").error
+    assert parse_image_size({"used_size": "n/a"}, "csi-vol-a").error
+
+
+def test_client_reuses_connection(imagestat):
+    url, requests = imagestat
+    client = ImageSizeClient(url)
+    try:
+        assert client.get("dc2", "csi-vol-a") == ImageSize(2 * GiB, 10 * GiB)
+        assert client.get("dc2", "csi-vol-b") == ImageSize(1 * GiB, 5 * GiB)
+        assert client.get("dc2", "csi-vol-missing").error.startswith("HTTP 404")
+    finally:
+        client.close()
+    assert [query for _, query, _ in requests] == [
+        {"region": "dc2", "imageName": "csi-vol-a"},
+        {"region": "dc2", "imageName": "csi-vol-b"},
+        {"region": "dc2", "imageName": "csi-vol-missing"},
+    ]
+    assert {path for path, _, _ in requests} == {"/api/v1/image-size"}
+    assert len({port for _, _, port in requests}) == 1
+
+
+def test_failed_sizes_are_not_cached(imagestat, tmp_path):
+    url, requests = imagestat
+    images = ["csi-vol-a", "csi-vol-nosize", "csi-vol-missing", "csi-vol-a"]
+    cache = SizeCache(str(tmp_path / "cache.json"), ttl=3600)
+    client = ImageSizeClient(url)
+    try:
+        sizes = collect_sizes([volume(i) for i in images], client, cache, "dc2", concurrency=2)
+        assert len(requests) == 3
+        assert [image for image, size in sizes.items() if size.error] == ["csi-vol-nosize", "csi-vol-missing"]
+        cache.save()
+
+        cache = SizeCache(str(tmp_path / "cache.json"), ttl=3600)
+        collect_sizes([volume(i) for i in images], client, cache, "dc2", concurrency=2)
+    finally:
+        client.close()
+    # Only the failed images are queried again
+    assert sorted(query["imageName"] for _, query, _ in requests[3:]) == ["csi-vol-missing", "csi-vol-nosize"]
+
+
+def test_cache_expires(tmp_path):
+    cache = SizeCache(str(tmp_path / "cache.json"), ttl=0)
+    cache.put("dc2", "csi-vol-a", ImageSize(1, 2))
+    cache._entries["dc2/csi-vol-a"]["fetched_at"] -= 1
+    assert cache.get("dc2", "csi-vol-a") is None
+
+
+def test_build_report():
+    volumes = [volume("csi-vol-a"), volume("csi-vol-b"), volume("csi-vol-nosize", "ns2")]
+    sizes = {
+        "csi-vol-a": ImageSize(2, 10),
+        "csi-vol-b": ImageSize(1, 5),
+        "csi-vol-nosize": ImageSize(None, 10, "返回中没有已用大小"),
+    }
+    tenants = {"ns1": "t1", "ns2": "t1"}
+    assert build_report(volumes, sizes, tenants, "namespace") == [
+        {"tenant": "t1", "namespace": "ns1", "volumes": 2, "capacity": 20 * GiB, "provisioned": 15, "used": 3, "failed": 0},
+        {"tenant": "t1", "namespace": "ns2", "volumes": 1, "capacity": 10 * GiB, "provisioned": 0, "used": 0, "failed": 1},
+    ]
+    assert build_report(volumes, sizes, tenants, "tenant") == [
+        {"tenant": "t1", "volumes": 3, "capacity": 30 * GiB, "provisioned": 15, "used": 3, "failed": 1}
+    ]
+
+
+def index_row(image, pod="pod-1", pv=None, capacity="10Gi"):
+    """
+    A row of k8s-tools/pv_index.py --format json.
+    """
+    return {
+        "namespace": "ns1",
+        "pod": pod,
+        "node": "node-1",
+        "volume": "data",
+        "pvc": f"pvc-{image}",
+        "pv": pv or f"pv-{image}",
+        "capacity": capacity,
+        "volume_handle": f"0001-handle-{image}",
+        "image": image,
+        "pool": "rbd" if image else "",
+    }
+
+
+def test_volumes_from_index_counts_shared_claims_once():
+    rows = [index_row("csi-vol-a"), index_row("csi-vol-a", pod="pod-2"), index_row("csi-vol-b", pod="pod-2")]
+    assert volumes_from_index(rows) == [
+        Volume("pv-csi-vol-a", "ns1", "pvc-csi-vol-a", "csi-vol-a", "rbd", 10 * GiB),
+        Volume("pv-csi-vol-b", "ns1", "pvc-csi-vol-b", "csi-vol-b", "rbd", 10 * GiB),
+    ]
+
+
+def test_main_reports_failed_queries(imagestat, tmp_path, capsys, caplog):
+    url, _ = imagestat
+    rows = [index_row(image) for image in ("csi-vol-a", "csi-vol-c", "csi-vol-nosize")]
+    # A claim mounted by two pods is listed once per pod and counted once
+    rows.append(index_row("csi-vol-a", pod="pod-2"))
+    rows.append(index_row("", pv="pv-nfs", capacity="1Gi"))
+    index_path = tmp_path / "index.json"
+    index_path.write_text(json.dumps(rows))
+
+    argv = ["--url", url, "--input", str(index_path), "--cache", str(tmp_path / "cache.json"), "--format", "json"]
+    assert main(argv) == 0
+    report = json.loads(capsys.readouterr().out)
+    assert report == [
+        {"tenant": "-", "namespace": "ns1", "volumes": 3, "capacity": 30 * GiB, "provisioned": 30 * GiB, "used": 6 * GiB, "failed": 1}
+    ]
+    assert "1 个镜像查询失败" in caplog.text
@@ -1,2 +1,3 @@
-
-kubectl port-forward --address 0.0.0.0 a2mfbnpczn8gqxrk24l6-n0-0 8080:8080 -n flytesnacks-development
+#!/bin/bash
+# 用法: ./script/port-forward.sh <执行ID>:8080 [<执行ID>:8081 ...] [-n 命名空间]
+exec python3 "$(dirname "$0")/port_forward.py" --address 0.0.0.0 "$@"
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Forward local ports to the VSCode servers of Flyte executions, all from one process.
+
+The pod of each execution is found by its execution-id label, so no pod name is needed. Every forward keeps a few
+port-forward streams to its pod open ahead of time, so a new connection does not wait for a handshake with the
+apiserver. When the pod is restarted or replaced, the pod is looked up again and the streams are reopened.
+
+Usage:
+    python3 script/port_forward.py EXECUTION_ID:LOCAL_PORT[:REMOTE_PORT] [...] -n flytesnacks-development
+"""
+import argparse
+import select
+import socket
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from kubernetes import client, config
+from kubernetes.stream import portforward
+
+# Label flytepropeller sets on the pods of an execution
+EXECUTION_ID_LABEL = "execution-id"
+DEFAULT_NAMESPACE = "flytesnacks-development"
+DEFAULT_REMOTE_PORT = 8080
+# Number of streams kept open ahead of time per forward
+POOL_SIZE = 2
+# Pooled streams older than this are replaced, the apiserver closes idle streams after a while
+POOL_MAX_IDLE_SECONDS = 300
+RECONNECT_BACKOFF_SECONDS = 1
+MAX_RECONNECT_BACKOFF_SECONDS = 30
+BUFFER_SIZE = 64 * 1024
+
+
+@dataclass
+class ForwardSpec:
+    execution_id: str
+    local_port: int
+    remote_port: int = DEFAULT_REMOTE_PORT
+
+    @classmethod
+    def parse(cls, value: str) -> "ForwardSpec":
+        parts = value.split(":")
+        try:
+            if len(parts) not in (2, 3) or not parts[0]:
+                raise ValueError
+            return cls(parts[0], *(int(port) for port in parts[1:]))
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"Expected EXECUTION_ID:LOCAL_PORT[:REMOTE_PORT], got {value!r}")
+
+
+def resolve_pod(api: client.CoreV1Api, namespace: str, execution_id: str) -> str:
+    """
+    Find the running pod of an execution, the latest one if the task was retried.
+
+    Raises:
+        LookupError: If the execution has no running pod.
+    """
+    pods = api.list_namespaced_pod(namespace, label_selector=f"{EXECUTION_ID_LABEL}={execution_id}").items
+    running = [pod for pod in pods if pod.status.phase == "Running" and pod.metadata.deletion_timestamp is None]
+    if not running:
+        raise LookupError(f"Execution {execution_id} has no running pod in {namespace}")
+    return max(running, key=lambda pod: pod.metadata.creation_timestamp).metadata.name
+
+
+class StreamPool:
+    """
+    StreamPool keeps port-forward streams to the pod of one execution open ahead of time and reopens them on the
+    pod found again after a stream fails, e.g. because the pod was restarted.
+
+    Args:
+        api (client.CoreV1Api): The Kubernetes API.
+        namespace (str): The namespace of the execution.
+        spec (ForwardSpec): The forward.
+        size (int, optional): The number of streams kept open.
+    """
+
+    def __init__(self, api: client.CoreV1Api, namespace: str, spec: ForwardSpec, size: int = POOL_SIZE):
+        self.api = api
+        self.namespace = namespace
+        self.spec = spec
+        self.size = size
+        self.pod = None
+        # (opened at, pod, stream), oldest first
+        self._idle = deque()
+        self._lock = threading.Lock()
+        self._refill = threading.Event()
+        self._refill.set()
+        threading.Thread(target=self._fill, name=f"pool-{spec.execution_id}", daemon=True).start()
+
+    def _open(self):
+        pod = self.pod
+        if pod is None:
+            pod = resolve_pod(self.api, self.namespace, self.spec.execution_id)
+            if pod != self.pod:
+                print(f"{self.spec.execution_id}: forwarding localhost:{self.spec.local_port} to {pod}:{self.spec.remote_port}")
+            self.pod = pod
+        try:
+            stream = portforward(
+                self.api.connect_get_namespaced_pod_portforward, pod, self.namespace, ports=str(self.spec.remote_port)
+            )
+        except Exception:
+            # Look the pod up again on the next attempt
+            self.pod = None
+            raise
+        return pod, stream
+
+    def _usable(self, opened_at: float, pod: str, stream) -> bool:
+        return stream.connected and pod == self.pod and time.monotonic() - opened_at < POOL_MAX_IDLE_SECONDS
+
+    def acquire(self):
+        """
+        Return an open stream, from the pool if one is ready.
+        """
+        stale = []
+        stream = None
+        with self._lock:
+            while self._idle:
+                entry = self._idle.popleft()
+                if self._usable(*entry):
+                    stream = entry[2]
+                    break
+                stale.append(entry[2])
+        for old in stale:
+            old.close()
+        self._refill.set()
+        if stream is None:
+            stream = self._open()[1]
+        return stream
+
+    def invalidate(self):
+        """
+        Drop the pooled streams and look the pod up again, after a stream to it failed.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+            self.pod = None
+        for _, _, stream in idle:
+            stream.close()
+        self._refill.set()
+
+    def _fill(self):
+        backoff = RECONNECT_BACKOFF_SECONDS
+        while True:
+            self._refill.wait(POOL_MAX_IDLE_SECONDS / 2)
+            self._refill.clear()
+            with self._lock:
+                stale = [entry for entry in self._idle if not self._usable(*entry)]
+                self._idle = deque(entry for entry in self._idle if self._usable(*entry))
+            for _, _, stream in stale:
+                stream.close()
+            while True:
+                with self._lock:
+                    if len(self._idle) >= self.size:
+                        break
+                try:
+                    entry = (time.monotonic(), *self._open())
+                except Exception as e:
+                    print(f"{self.spec.execution_id}: {e}, retrying in {backoff}s", file=sys.stderr)
+                    time.sleep(backoff)
+                    backoff = min(backoff * 2, MAX_RECONNECT_BACKOFF_SECONDS)
+                    continue
+                backoff = RECONNECT_BACKOFF_SECONDS
+                with self._lock:
+                    self._idle.append(entry)
+
+
+def pipe(local: socket.socket, upstream) -> int:
+    """
+    Copy data both ways until either side closes, and return the number of bytes received from upstream.
+    """
+    received = 0
+    sockets = [local, upstream]
+    while True:
+        readable, _, _ = select.select(sockets, [], [])
+        for sock in readable:
+            try:
+                data = sock.recv(BUFFER_SIZE)
+            except OSError:
+                return received
+            if not data:
+                return received
+            if sock is local:
+                upstream.sendall(data)
+            else:
+                received += len(data)
+                local.sendall(data)
+
+
+class Forwarder:
+    """
+    Forwarder accepts connections on a local port and forwards each over a pooled stream.
+
+    Args:
+        pool (StreamPool): The streams to the pod of the execution.
+        address (str, optional): The local address to listen on.
+    """
+
+    def __init__(self, pool: StreamPool, address: str = "127.0.0.1"):
+        self.pool = pool
+        self.listener = socket.create_server((address, pool.spec.local_port))
+
+    def serve_forever(self):
+        while True:
+            local, _ = self.listener.accept()
+            threading.Thread(target=self._handle, args=(local,), daemon=True).start()
+
+    def _handle(self, local: socket.socket):
+        remote_port = self.pool.spec.remote_port
+        stream = None
+        try:
+            local.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            stream = self.pool.acquire()
+            received = pipe(local, stream.socket(remote_port))
+            error = stream.error(remote_port)
+            if error or (received == 0 and not stream.connected):
+                print(f"{self.pool.spec.execution_id}: stream failed: {error or 'closed'}", file=sys.stderr)
+                self.pool.invalidate()
+        except Exception as e:
+            print(f"{self.pool.spec.execution_id}: {e}", file=sys.stderr)
+            self.pool.invalidate()
+        finally:
+            local.close()
+            if stream is not None:
+                stream.close()
+
+
+def load_api() -> client.CoreV1Api:
+    try:
+        config.load_incluster_config()
+    except config.ConfigException:
+        config.load_kube_config()
+    return client.CoreV1Api()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("forwards", nargs="+", type=ForwardSpec.parse, help="EXECUTION_ID:LOCAL_PORT[:REMOTE_PORT]")
+    parser.add_argument("-n", "--namespace", default=DEFAULT_NAMESPACE)
+    parser.add_argument("--address", default="127.0.0.1", help="The local address to listen on, e.g. 0.0.0.0")
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="Streams kept open per forward")
+    args = parser.parse_args()
+
+    api = load_api()
+    forwarders = [Forwarder(StreamPool(api, args.namespace, spec, args.pool_size), args.address) for spec in args.forwards]
+    threads = [threading.Thread(target=forwarder.serve_forever, daemon=True) for forwarder in forwarders]
+    for thread in threads:
+        thread.start()
+    try:
+        for thread in threads:
+            thread.join()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,89 +1,276 @@
 #!/usr/bin/env python3
 """
 Script to execute ide.py and capture the VSCode access URL.
-After executing ide.py, this script will parse the output to find and display
-the VSCode access URL.
+The output of ide.py is streamed line by line, the VSCode access URL is displayed
+as soon as it appears, and code-server is then polled until it answers.
+
+A remote run prints the Flyte console URL of its execution instead of a VSCode URL. The pod of the execution is
+then looked up by its execution-id label and code-server is polled through a port-forward stream to the pod.
+
+A URL that only has a port number in common with a VSCode URL is a fallback: it is used when the script ends
+without printing a more specific URL, so an unrelated URL printed earlier does not hide the VSCode URL.
 """
 
-import subprocess
-import re
+import argparse
 import os
+import re
+import subprocess
 import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+from kubernetes.stream import portforward
+
+from port_forward import load_api, resolve_pod
 
 # Path to the ide.py file
 IDE_SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tasks", "ide.py")
 
-def run_ide_script():
+# Common patterns for VSCode URLs, in order of preference
+URL_PATTERNS = [
+    re.compile(r'https?://[^\s]+vscode[^\s]*'),  # URLs containing 'vscode'
+    re.compile(r'https?://[^\s]+code-server[^\s]*'),  # URLs containing 'code-server'
+    re.compile(r'https?://[^\s]+/ide/[^\s]*'),  # URLs containing '/ide/'
+    re.compile(r'https?://[^\s]+/interactive/[^\s]*'),  # URLs containing '/interactive/'
+]
+# Any URL with a port number, only used if the output has no URL matching a more specific pattern
+FALLBACK_URL_PATTERN = re.compile(r'https?://[^\s]+:[0-9]+/[^\s]*')
+
+# Logged by the vscode decorator when it starts code-server locally, which does not print a URL itself
+LAUNCH_MARKER = "Launching VSCode server"
+# The port code-server listens on, see flytekit.interactive
+DEFAULT_VSCODE_PORT = 8080
+# Flyte console URL of an execution, printed by a remote run; executions run in the <project>-<domain> namespace
+CONSOLE_EXECUTION_PATTERN = re.compile(r"/console/projects/([^/\s]+)/domains/([^/\s]+)/executions/([a-z0-9]+)")
+CONSOLE_URL_PATTERN = re.compile(r"https?://[^\s]+" + CONSOLE_EXECUTION_PATTERN.pattern)
+
+POLL_INTERVAL_SECONDS = 1
+PROBE_TIMEOUT_SECONDS = 5
+
+
+def run_ide_script(script_path=IDE_SCRIPT_PATH, probe_url=None, timeout=600, namespace=None):
     """
-    Execute the ide.py script and capture its output.
+    Execute the ide.py script, stream its output and display the VSCode URL as soon as it appears.
+
+    Args:
+        script_path (str): The script to execute.
+        probe_url (str, optional): The URL to poll instead of the discovered one, e.g. a port-forwarded address.
+        timeout (int, optional): Seconds to wait for the server to answer after the URL is found.
+        namespace (str, optional): The namespace of a remote execution, <project>-<domain> of its console URL if
+            not given.
+
+    Returns:
+        int: The exit code of the script.
     """
-    print(f"Executing {IDE_SCRIPT_PATH}...")
-    
+    print(f"Executing {script_path}...")
+    start_time = time.monotonic()
+
+    # Unbuffered, so that lines reach the pipe as they are printed
+    env = dict(os.environ, PYTHONUNBUFFERED="1")
     try:
-        # Run the ide.py script and capture its output
-        result = subprocess.run(
-            [sys.executable, IDE_SCRIPT_PATH],
-            capture_output=True,
+        process = subprocess.Popen(
+            [sys.executable, script_path],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
             text=True,
-            check=True
+            bufsize=1,
+            env=env,
         )
-        
-        # Print the standard output for debugging
-        print("\nOutput from ide.py:")
-        print(result.stdout)
-        
-        # Extract the VSCode URL from the output
-        url = extract_vscode_url(result.stdout)
-        
-        if url:
-            print("\n" + "="*50)
-            print(f"VSCode access URL: {url}")
-            print("="*50)
-        else:
-            print("\nCould not find VSCode access URL in the output.")
-            print("Check the full output above for any error messages or the URL format.")
-        
-        # If there were any errors, print them
-        if result.stderr:
-            print("\nErrors:")
-            print(result.stderr)
-            
-    except subprocess.CalledProcessError as e:
-        print(f"Error executing ide.py: {e}")
-        print("\nStandard output:")
-        print(e.stdout)
-        print("\nStandard error:")
-        print(e.stderr)
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+    except OSError as e:
+        print(f"Error executing {script_path}: {e}")
+        return 1
+
+    url = None
+    fallback_url = None
+    prober = None
+
+    def found(url):
+        print("\n" + "=" * 50)
+        print(f"VSCode access URL: {url} (after {time.monotonic() - start_time:.1f}s)")
+        print("=" * 50 + "\n", flush=True)
+        # Poll in the background so the output of the script keeps streaming
+        prober = threading.Thread(
+            target=report_ready,
+            args=(*readiness_probe(url, probe_url, namespace), start_time, timeout),
+            daemon=True,
+        )
+        prober.start()
+        return prober
+
+    try:
+        for line in process.stdout:
+            sys.stdout.write(line)
+            if url is not None:
+                continue
+            url = extract_vscode_url(line)
+            if url is None and LAUNCH_MARKER in line:
+                url = f"http://localhost:{DEFAULT_VSCODE_PORT}/"
+            if url is not None:
+                prober = found(url)
+            elif fallback_url is None:
+                fallback_url = extract_fallback_url(line)
+    except KeyboardInterrupt:
+        process.terminate()
+    returncode = process.wait()
+    if url is None and fallback_url is not None and returncode == 0:
+        url = fallback_url
+        prober = found(url)
+    # A remote run exits once the execution is submitted, keep polling until the server answers
+    if prober is not None and returncode == 0:
+        try:
+            prober.join()
+        except KeyboardInterrupt:
+            pass
+
+    if url is None:
+        print("\nCould not find VSCode access URL in the output.")
+        print("Check the full output above for any error messages or the URL format.")
+    if returncode != 0:
+        print(f"\nError executing {script_path}: exit code {returncode}")
+    return returncode
+
+
+def readiness_probe(url, probe_url=None, namespace=None):
+    """
+    Choose how to poll code-server once its URL is found.
+
+    Returns:
+        tuple: A description of what is polled, and a function returning the HTTP status code of one request.
+    """
+    if probe_url:
+        return probe_url, lambda: http_status(probe_url)
+    match = CONSOLE_EXECUTION_PATTERN.search(url)
+    if match is None:
+        return url, lambda: http_status(url)
+    project, domain, execution_id = match.groups()
+    namespace = namespace or f"{project}-{domain}"
+    return f"execution {execution_id} in {namespace}", PodProbe(load_api(), namespace, execution_id)
+
+
+def http_status(url):
+    """
+    Send one request and return the status code of the response, following redirects.
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=PROBE_TIMEOUT_SECONDS) as response:
+            response.read(1)
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+class PodProbe:
+    """
+    PodProbe sends a request to code-server in the pod of an execution over a port-forward stream. The pod is looked
+    up for every request, since it does not exist until the execution starts and may be replaced by a retry.
+
+    Args:
+        api (CoreV1Api): The Kubernetes API.
+        namespace (str): The namespace of the execution.
+        execution_id (str): The execution.
+        port (int, optional): The port code-server listens on in the pod.
+    """
+
+    def __init__(self, api, namespace, execution_id, port=DEFAULT_VSCODE_PORT):
+        self.api = api
+        self.namespace = namespace
+        self.execution_id = execution_id
+        self.port = port
+
+    def __call__(self):
+        pod = resolve_pod(self.api, self.namespace, self.execution_id)
+        stream = portforward(self.api.connect_get_namespaced_pod_portforward, pod, self.namespace, ports=str(self.port))
+        try:
+            sock = stream.socket(self.port)
+            sock.settimeout(PROBE_TIMEOUT_SECONDS)
+            sock.sendall(b"GET / HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n")
+            status_line = sock.makefile("rb").readline()
+        finally:
+            stream.close()
+        parts = status_line.split()
+        if len(parts) < 2 or not parts[0].startswith(b"HTTP/") or not parts[1].isdigit():
+            raise OSError(f"No HTTP response from {pod}:{self.port}: {status_line!r}")
+        return int(parts[1])
+
+
+def report_ready(target, probe, start_time, timeout):
+    ttfb = wait_until_ready(probe, timeout)
+    if ttfb is None:
+        print(f"\nVSCode server of {target} was not ready within {timeout}s", flush=True)
+    else:
+        print(
+            f"\nVSCode server of {target} is ready after {time.monotonic() - start_time:.1f}s"
+            f" (time to first byte {ttfb * 1000:.0f}ms)",
+            flush=True,
+        )
+
+
+def wait_until_ready(probe, timeout):
+    """
+    Poll until code-server answers with a 2xx or 3xx status. Errors, e.g. from a proxy in front of a server that is
+    not up yet, count as not ready.
+
+    Args:
+        probe (callable): Sends one request and returns its HTTP status code, see readiness_probe.
+        timeout (int): Seconds to keep polling.
+
+    Returns:
+        float or None: The time to first byte of the first ready response in seconds, None if the server was never
+            ready.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        request_time = time.monotonic()
+        try:
+            status = probe()
+            if 200 <= status < 400:
+                return time.monotonic() - request_time
+        # The pod may not exist or run yet, and the port-forward raises whatever its websocket fails with
+        except Exception:
+            pass
+        time.sleep(POLL_INTERVAL_SECONDS)
+    return None
+
 
 def extract_vscode_url(output):
     """
     Extract the VSCode URL from the output.
-    This function uses a regular expression to find URLs that look like VSCode access URLs.
-    
+    This function uses a regular expression to find the console URL of a remote execution or URLs that look like
+    VSCode access URLs. URLs only matching FALLBACK_URL_PATTERN are not returned, see extract_fallback_url.
+
     Args:
-        output (str): The output from running ide.py
-        
+        output (str): A line or the whole output from running ide.py
+
     Returns:
         str or None: The VSCode URL if found, None otherwise
     """
-    # Common patterns for VSCode URLs
-    # This regex looks for http/https URLs that might be VSCode access URLs
-    url_patterns = [
-        r'https?://[^\s]+vscode[^\s]*',  # URLs containing 'vscode'
-        r'https?://[^\s]+code-server[^\s]*',  # URLs containing 'code-server'
-        r'https?://[^\s]+/ide/[^\s]*',  # URLs containing '/ide/'
-        r'https?://[^\s]+/interactive/[^\s]*',  # URLs containing '/interactive/'
-        r'https?://[^\s]+:[0-9]+/[^\s]*'  # Any URL with a port number
-    ]
-    
-    for pattern in url_patterns:
-        matches = re.findall(pattern, output)
-        if matches:
-            return matches[0]  # Return the first match
-    
+    for pattern in [CONSOLE_URL_PATTERN, *URL_PATTERNS]:
+        match = pattern.search(output)
+        if match:
+            return match.group(0)
+
     return None
 
+
+def extract_fallback_url(output):
+    """
+    Extract any URL with a port number from the output, for when it holds no URL extract_vscode_url finds.
+    """
+    match = FALLBACK_URL_PATTERN.search(output)
+    return match.group(0) if match else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", default=IDE_SCRIPT_PATH, help="The script to execute")
+    parser.add_argument("--probe-url", help="Poll this URL instead of the discovered one, e.g. a port-forwarded address")
+    parser.add_argument("--timeout", type=int, default=600, help="Seconds to wait for the server to answer")
+    parser.add_argument("-n", "--namespace", help="The namespace of a remote execution, <project>-<domain> by default")
+    args = parser.parse_args()
+    return run_ide_script(args.script, args.probe_url, args.timeout, args.namespace)
+
+
 if __name__ == "__main__":
-    run_ide_script()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+Launch many AIONE IDE instances with one registration per base template.
+
+Instances sharing a base template (see InstanceSpec.base_key) share one registered workflow, whose node runs task1 of
+aione.py with the cached base PodTemplate of podspec.py. The instance fields are set per execution instead, through
+the labels and annotations of the execution options, which flytepropeller puts on the pod: the aione_id label, the
+owner/tenant annotations and the aione_params annotation, which the download init container of the base template
+reads AIONE_PARAMS from. Execution environment variables would reach the main container instead of the init
+container. All executions are created concurrently through one FlyteRemote client, so the gRPC connection to
+flyteadmin is reused. The ConfigMap holding the prefetch and lazyfs scripts is created in the execution namespace
+first if any instance has repositories or data; repositories and prefetched data also need the workspace claim there
+(see podspec.py install-workspace).
+
+Usage:
+    python launch.py instances.json --project flytesnacks --domain development --workers 16
+    python launch.py instances.json --namespace aione-staging
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from flytekit import PodTemplate
+from flytekit.configuration import Config, ImageConfig
+from flytekit.core.workflow import ImperativeWorkflow
+from flytekit.exceptions.user import FlyteEntityNotExistException
+from flytekit.models.common import Annotations, Labels
+from flytekit.remote import FlyteRemote, FlyteWorkflow
+from flytekit.tools.translator import Options
+from kubernetes.client import ApiException
+
+from podspec import (
+    PRIMARY_CONTAINER_NAME,
+    WORKSPACE_CLAIM_NAME,
+    InstanceSpec,
+    base_pod_spec,
+    ensure_scripts_config_map,
+    instance_annotations,
+    instance_labels,
+    load_api,
+    load_instance_specs,
+    params_value,
+    template_version,
+)
+
+TASKS_DIR = os.path.dirname(os.path.abspath(__file__))
+WORKFLOW_NAME = "aione.batch"
+# Source files whose changes require a new registration
+SOURCE_FILES = ("aione.py", "podspec.py", "params.py", "prefetch.py", "lazyfs.py")
+DEFAULT_WORKERS = 16
+
+
+@dataclass
+class LaunchResult:
+    """
+    The outcome of launching one instance.
+
+    Args:
+        instance_id (str): The instance ID.
+        template_version (str): The version of the registered workflow the instance was launched from.
+        execution_id (str, optional): The name of the Flyte execution.
+        register_seconds (float): The duration of registering the workflow, shared by all instances of a template.
+        launch_seconds (float): The duration of creating the execution.
+        error (str, optional): The error message if the launch failed.
+    """
+
+    instance_id: str
+    template_version: str
+    execution_id: Optional[str] = None
+    register_seconds: float = 0.0
+    launch_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def source_digest() -> str:
+    digest = hashlib.sha256()
+    for name in SOURCE_FILES:
+        with open(os.path.join(TASKS_DIR, name), "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:8]
+
+
+def build_workflow(spec: InstanceSpec) -> ImperativeWorkflow:
+    """
+    Build the workflow running task1 with the base PodTemplate of the spec, which holds no instance fields.
+    """
+    from aione import task1
+
+    workflow = ImperativeWorkflow(name=WORKFLOW_NAME)
+    node = workflow.add_entity(task1)
+    node.with_overrides(
+        pod_template=PodTemplate(primary_container_name=PRIMARY_CONTAINER_NAME, pod_spec=base_pod_spec(*spec.base_key))
+    )
+    return workflow
+
+
+def register_workflow(remote: FlyteRemote, spec: InstanceSpec, image_config: ImageConfig) -> FlyteWorkflow:
+    """
+    Register the workflow of the spec's base template, unless a workflow with the same template and source
+    is already registered.
+    """
+    version = f"{template_version(spec)}-{source_digest()}"
+    try:
+        return remote.fetch_workflow(name=WORKFLOW_NAME, version=version)
+    except FlyteEntityNotExistException:
+        pass
+    print(f"Registering {WORKFLOW_NAME} version {version}")
+    return remote.register_script(
+        build_workflow(spec),
+        image_config=image_config,
+        version=version,
+        source_path=TASKS_DIR,
+        module_name="aione",
+    )
+
+
+def launch_instance(remote: FlyteRemote, workflow: FlyteWorkflow, spec: InstanceSpec) -> LaunchResult:
+    result = LaunchResult(instance_id=spec.instance_id, template_version=template_version(spec))
+    start_time = time.monotonic()
+    try:
+        execution = remote.execute(
+            workflow,
+            inputs={},
+            options=Options(
+                labels=Labels(instance_labels(spec)),
+                annotations=Annotations(instance_annotations(spec, params_value(spec)[0])),
+            ),
+        )
+        result.execution_id = execution.id.name
+    except Exception as e:
+        result.error = str(e)
+    result.launch_seconds = time.monotonic() - start_time
+    return result
+
+
+def launch_batch(
+    remote: FlyteRemote,
+    specs: List[InstanceSpec],
+    image_config: Optional[ImageConfig] = None,
+    max_workers: int = DEFAULT_WORKERS,
+) -> List[LaunchResult]:
+    """
+    Register each distinct base template once and launch all instances concurrently.
+
+    Args:
+        remote (FlyteRemote): The client shared by all registrations and executions.
+        specs (List[InstanceSpec]): The instances to launch.
+        image_config (ImageConfig, optional): The image config used for registration.
+        max_workers (int, optional): The maximum number of concurrent registrations and launches.
+
+    Returns:
+        List[LaunchResult]: The outcome of each instance, in the order the specs were given.
+    """
+    image_config = image_config or ImageConfig.auto_default_image()
+    groups: Dict[str, InstanceSpec] = {}
+    for spec in specs:
+        groups.setdefault(template_version(spec), spec)
+
+    def register(version: str):
+        start_time = time.monotonic()
+        try:
+            return register_workflow(remote, groups[version], image_config), None, time.monotonic() - start_time
+        except Exception as e:
+            return None, str(e), time.monotonic() - start_time
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        registered = dict(zip(groups, executor.map(register, groups)))
+
+        def launch(spec: InstanceSpec) -> LaunchResult:
+            workflow, error, register_seconds = registered[template_version(spec)]
+            if workflow is None:
+                result = LaunchResult(instance_id=spec.instance_id, template_version=template_version(spec), error=error)
+            else:
+                result = launch_instance(remote, workflow, spec)
+            result.register_seconds = register_seconds
+            return result
+
+        return list(executor.map(launch, specs))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Launch many AIONE IDE instances with one registration.")
+    parser.add_argument("instances", help="JSON file holding a list of instance specs.")
+    parser.add_argument("--project", default="flytesnacks")
+    parser.add_argument("--domain", default="development")
+    parser.add_argument("--config", default=None, help="Flyte config file. Defaults to the flytectl config.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Maximum concurrent launches.")
+    parser.add_argument("--namespace", default=None, help="Namespace of the executions. Defaults to <project>-<domain>.")
+    args = parser.parse_args(argv)
+
+    specs = load_instance_specs(args.instances)
+    namespace = args.namespace or f"{args.project}-{args.domain}"
+    if any(spec.data_dirs or spec.lazy_dirs for spec in specs):
+        api = load_api()
+        ensure_scripts_config_map(api, namespace)
+    if any(spec.data_dirs for spec in specs):
+        # Without the claim the pods would stay pending
+        try:
+            api.read_namespaced_persistent_volume_claim(WORKSPACE_CLAIM_NAME, namespace)
+        except ApiException as e:
+            if e.status != 404:
+                raise
+            print(
+                f"PersistentVolumeClaim {WORKSPACE_CLAIM_NAME} does not exist in {namespace}, "
+                "create it with python podspec.py install-workspace",
+                file=sys.stderr,
+            )
+            return 1
+    remote = FlyteRemote(
+        Config.auto(config_file=args.config),
+        default_project=args.project,
+        default_domain=args.domain,
+    )
+
+    start_time = time.monotonic()
+    results = launch_batch(remote, specs, max_workers=args.workers)
+    for result in results:
+        print(json.dumps(asdict(result)))
+    failed = sum(1 for result in results if result.error)
+    print(
+        f"Launched {len(results) - failed}/{len(results)} instances in {time.monotonic() - start_time:.2f}s",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
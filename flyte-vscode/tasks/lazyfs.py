@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+"""
+Mount S3 data read-only with FUSE and fetch objects on first read, instead of downloading them before the IDE starts.
+
+The objects under bucket_path are listed once at mount time, so the whole tree appears in target_dir right away.
+Reads are served in blocks from a local LRU-bounded block cache; sequential reads prefetch the following blocks
+in the background. Only S3Data entries with lazy set are mounted.
+
+It runs in the lazyfs container of the pod template of podspec.py, which mounts into volumes shared with the main
+container through mount propagation; prefetch.py skips lazy entries. The lazyfs container's postStart hook runs it
+with --wait, which returns once every lazy target_dir is mounted, so the main container starts with the data in place.
+Stopping the container unmounts the data.
+
+Usage:
+    AIONE_PARAMS=... python lazyfs.py
+    AIONE_PARAMS=... python lazyfs.py --wait
+"""
+import argparse
+import errno
+import hashlib
+import multiprocessing
+import os
+import signal
+import stat
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from params import S3Data, decode_params
+from prefetch import PARAMS_ENV, S3Object, list_objects, s3_filesystem
+
+try:
+    from fuse import FUSE, Operations
+except (ImportError, OSError):  # fusepy or libfuse is missing, only needed to mount
+    FUSE = None
+    Operations = object
+
+CACHE_DIR_ENV = "AIONE_LAZY_CACHE_DIR"
+CACHE_MAX_BYTES_ENV = "AIONE_LAZY_CACHE_MAX_BYTES"
+DEFAULT_CACHE_DIR = "/tmp/aione-lazy-cache"
+DEFAULT_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024
+# Size of a block fetched with one ranged GET and cached as one file
+BLOCK_SIZE = 4 * 1024 * 1024
+# Number of blocks prefetched ahead of a sequential reader
+READ_AHEAD_BLOCKS = 4
+# Maximum number of ranged GETs in flight per mount
+MAX_CONCURRENT_FETCHES = 8
+# Duration --wait waits for the mounts, which includes listing the objects
+MOUNT_WAIT_TIMEOUT_SECONDS = 300
+MOUNT_CHECK_SECONDS = 0.5
+
+
+class BlockCache:
+    """
+    BlockCache keeps fetched blocks as files in a local directory and evicts the least recently used ones once
+    their total size exceeds max_bytes. Blocks left by an earlier mount are reused.
+
+    Args:
+        cache_dir (str): The directory of the block files.
+        max_bytes (int, optional): The total size of blocks above which the least recently used are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # block key -> size, least recently used first
+        self._blocks: "OrderedDict[str, int]" = OrderedDict()
+        os.makedirs(cache_dir, exist_ok=True)
+        existing = []
+        for name in os.listdir(cache_dir):
+            if name.startswith("."):
+                continue
+            st = os.stat(os.path.join(cache_dir, name))
+            existing.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(existing):
+            self._blocks[name] = size
+        self._total = sum(self._blocks.values())
+
+    def contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._blocks
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            if key not in self._blocks:
+                return None
+            self._blocks.move_to_end(key)
+        try:
+            with open(os.path.join(self.cache_dir, key), "rb") as f:
+                return f.read()
+        except OSError:
+            with self._lock:
+                self._total -= self._blocks.pop(key, 0)
+            return None
+
+    def put(self, key: str, data: bytes):
+        path = os.path.join(self.cache_dir, key)
+        tmp_path = os.path.join(self.cache_dir, f".{key}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._total += len(data) - self._blocks.pop(key, 0)
+            self._blocks[key] = len(data)
+            while self._total > self.max_bytes and len(self._blocks) > 1:
+                evicted, size = self._blocks.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(os.path.join(self.cache_dir, evicted))
+                except OSError:
+                    pass
+
+
+class LazyObject:
+    """
+    LazyObject reads an S3 object by block through the block cache, deduplicating concurrent fetches of the same
+    block and reading ahead when the object is read sequentially.
+
+    Args:
+        fs: The S3 filesystem.
+        obj (S3Object): The object.
+        cache (BlockCache): The block cache.
+        pool (ThreadPoolExecutor): The pool the ranged GETs run on.
+        block_size (int, optional): The size of a block.
+        read_ahead (int, optional): The number of blocks to prefetch after a sequential read.
+    """
+
+    def __init__(
+        self,
+        fs,
+        obj: S3Object,
+        cache: BlockCache,
+        pool: ThreadPoolExecutor,
+        block_size: int = BLOCK_SIZE,
+        read_ahead: int = READ_AHEAD_BLOCKS,
+    ):
+        self.fs = fs
+        self.obj = obj
+        self.cache = cache
+        self.pool = pool
+        self.block_size = block_size
+        # Blocks read ahead must fit in the cache next to the one being read, or they are evicted before use
+        self.read_ahead = max(0, min(read_ahead, cache.max_bytes // block_size - 1))
+        # The ETag is part of the key, so a changed object never reads stale blocks
+        self._key_prefix = hashlib.sha256(f"{obj.path}\0{obj.etag}".encode()).hexdigest()[:32]
+        # Guards _inflight, _last_block and _recent, since FUSE calls read from several threads
+        self._inflight: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._last_block = -1
+        # FUSE reads 128KiB at a time, so the last block is kept in memory instead of rereading its file every time
+        self._recent: Optional[tuple] = None
+
+    def _key(self, index: int) -> str:
+        return f"{self._key_prefix}-{index}"
+
+    def _fetch(self, index: int) -> bytes:
+        start = index * self.block_size
+        end = min(start + self.block_size, self.obj.size)
+        data = self.fs.cat_file(self.obj.path, start=start, end=end)
+        if len(data) != end - start:
+            raise IOError(f"Short read of {self.obj.path} at {start}: {len(data)} of {end - start} bytes")
+        self.cache.put(self._key(index), data)
+        return data
+
+    def _submit(self, index: int) -> Future:
+        with self._lock:
+            future = self._inflight.get(index)
+            if future is not None:
+                return future
+            future = self.pool.submit(self._fetch, index)
+            self._inflight[index] = future
+        # Outside the lock, since the callback runs right away if the fetch has already finished
+        future.add_done_callback(lambda _: self._done(index))
+        return future
+
+    def _done(self, index: int):
+        with self._lock:
+            self._inflight.pop(index, None)
+
+    def _block(self, index: int) -> bytes:
+        with self._lock:
+            recent = self._recent
+        if recent is not None and recent[0] == index:
+            return recent[1]
+        data = self.cache.get(self._key(index))
+        if data is None:
+            data = self._submit(index).result()
+        with self._lock:
+            self._recent = (index, data)
+        return data
+
+    def read(self, offset: int, size: int) -> bytes:
+        end = min(offset + size, self.obj.size)
+        if offset >= end:
+            return b""
+        first = offset // self.block_size
+        last = (end - 1) // self.block_size
+
+        with self._lock:
+            sequential = first in (self._last_block, self._last_block + 1)
+            self._last_block = last
+        if sequential:
+            last_block = (self.obj.size - 1) // self.block_size
+            for index in range(last + 1, min(last + self.read_ahead, last_block) + 1):
+                if not self.cache.contains(self._key(index)):
+                    self._submit(index)
+
+        data = b"".join(self._block(index) for index in range(first, last + 1))
+        start = offset - first * self.block_size
+        return data[start : start + end - offset]
+
+
+class LazyS3Operations(Operations):
+    """
+    Read-only FUSE operations presenting a listing of S3 objects as a directory tree.
+
+    Args:
+        fs: The S3 filesystem.
+        objects (List[S3Object]): The objects, whose target paths are relative to root.
+        root (str): The mount point.
+        cache (BlockCache): The block cache.
+        max_fetches (int, optional): The maximum number of ranged GETs in flight.
+    """
+
+    def __init__(self, fs, objects: List[S3Object], root: str, cache: BlockCache, max_fetches: int = MAX_CONCURRENT_FETCHES):
+        self.pool = ThreadPoolExecutor(max_workers=max_fetches)
+        self.mount_time = time.time()
+        self.files: Dict[str, LazyObject] = {}
+        self.dirs: Dict[str, set] = {"/": set()}
+        for obj in objects:
+            path = "/" + os.path.relpath(obj.target, root)
+            self.files[path] = LazyObject(fs, obj, cache, self.pool)
+            child = path
+            parent = os.path.dirname(child)
+            while True:
+                self.dirs.setdefault(parent, set()).add(os.path.basename(child))
+                if parent == "/":
+                    break
+                child, parent = parent, os.path.dirname(parent)
+
+    def getattr(self, path, fh=None):
+        if path in self.dirs:
+            mode, size, nlink = stat.S_IFDIR | 0o555, 0, 2
+        elif path in self.files:
+            mode, size, nlink = stat.S_IFREG | 0o444, self.files[path].obj.size, 1
+        else:
+            raise OSError(errno.ENOENT, path)
+        return {
+            "st_mode": mode,
+            "st_size": size,
+            "st_nlink": nlink,
+            "st_uid": os.getuid(),
+            "st_gid": os.getgid(),
+            "st_atime": self.mount_time,
+            "st_mtime": self.mount_time,
+            "st_ctime": self.mount_time,
+        }
+
+    def readdir(self, path, fh):
+        if path not in self.dirs:
+            raise OSError(errno.ENOTDIR, path)
+        return [".", "..", *sorted(self.dirs[path])]
+
+    def open(self, path, flags):
+        if path not in self.files:
+            raise OSError(errno.ENOENT, path)
+        if flags & (os.O_WRONLY | os.O_RDWR):
+            raise OSError(errno.EROFS, path)
+        return 0
+
+    def read(self, path, size, offset, fh):
+        return self.files[path].read(offset, size)
+
+    def destroy(self, path):
+        self.pool.shutdown(wait=False)
+
+
+def mount(s3data: S3Data, cache_dir: str, max_cache_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+    """
+    List the objects of an S3Data entry and mount them at its target_dir. Blocks until unmounted.
+    """
+    if FUSE is None:
+        raise RuntimeError("Mounting S3 data lazily needs fusepy and libfuse in the image")
+    fs = s3_filesystem(s3data)
+    objects = list_objects(fs, s3data)
+    os.makedirs(s3data.target_dir, exist_ok=True)
+    print(f"Mounting {len(objects)} objects of s3://{s3data.bucket_name}/{s3data.bucket_path} at {s3data.target_dir}")
+    operations = LazyS3Operations(fs, objects, s3data.target_dir, BlockCache(cache_dir, max_cache_bytes))
+    FUSE(operations, s3data.target_dir, foreground=True, ro=True, allow_other=True)
+
+
+def wait_mounted(target_dirs: List[str], timeout: float = MOUNT_WAIT_TIMEOUT_SECONDS) -> bool:
+    """
+    Wait until every target directory is a mount point.
+
+    Returns:
+        bool: Whether all of them were mounted within timeout seconds.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        pending = [target_dir for target_dir in target_dirs if not os.path.ismount(target_dir)]
+        if not pending:
+            return True
+        if time.monotonic() >= deadline:
+            print(f"Not mounted after {timeout}s: {', '.join(pending)}")
+            return False
+        time.sleep(MOUNT_CHECK_SECONDS)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Mount lazy S3 data with FUSE.")
+    parser.add_argument("--wait", action="store_true", help="Wait until the data is mounted by another process.")
+    parser.add_argument("--timeout", type=float, default=MOUNT_WAIT_TIMEOUT_SECONDS, help="Seconds to wait.")
+    args = parser.parse_args(argv)
+
+    value = os.getenv(PARAMS_ENV)
+    if not value:
+        print(f"{PARAMS_ENV} is not set, nothing to mount")
+        return 0
+    lazy_s3datas = [s3data for s3data in decode_params(value).s3datas if s3data.lazy]
+    if args.wait:
+        return 0 if wait_mounted([s3data.target_dir for s3data in lazy_s3datas], args.timeout) else 1
+    cache_dir = os.getenv(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+    max_cache_bytes = int(os.getenv(CACHE_MAX_BYTES_ENV, DEFAULT_CACHE_MAX_BYTES))
+
+    # FUSE handles signals in the main thread, so every mount runs in its own process
+    processes = []
+    for index, s3data in enumerate(lazy_s3datas):
+        process = multiprocessing.Process(
+            target=mount, args=(s3data, os.path.join(cache_dir, str(index)), max_cache_bytes // len(lazy_s3datas))
+        )
+        process.start()
+        processes.append(process)
+    # Pass the stop of the container on, libfuse unmounts when it receives SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: [process.terminate() for process in processes])
+    for process in processes:
+        process.join()
+    return 1 if any(process.exitcode for process in processes) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,211 @@
+"""
+Schema and encoding of AIONE_PARAMS, the instance parameters passed to the download init container.
+
+Only depends on the standard library, so the init container can decode the parameters without flytekit.
+
+Encodings of the AIONE_PARAMS value:
+    ey...                       Version 1: base64 of the JSON object, including all transient fields.
+    z2:<base64>                 Version 2: base64 of the zlib-compressed compact JSON of AioneParams.
+    @<dir>/<sha256>             Version 2 offloaded to a mounted ConfigMap, the file holds the z2: value.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List
+
+PARAMS_VERSION = 2
+COMPACT_PREFIX = "z2:"
+FILE_PREFIX = "@"
+# Fields describing a previous run of the instance, which the init container has no use for
+TRANSIENT_FIELDS = frozenset({"runStatus", "runTime", "runTimeEnd", "runError", "created", "lastModified"})
+# Fields of version 1 that version 2 derives from other fields
+DERIVED_FIELDS = frozenset({"sshUsed"})
+
+_INSTANCE_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9-]*$")
+
+
+def _overlaps(a: str, b: str) -> bool:
+    a, b = a.rstrip("/") + "/", b.rstrip("/") + "/"
+    return a.startswith(b) or b.startswith(a)
+
+
+@dataclass
+class GitData:
+    repo_url: str
+    target_dir: str
+    access_token: str
+    branch: str
+
+
+@dataclass
+class S3Data:
+    endpoint: str
+    access_key: str
+    secret_key: str
+    bucket_name: str
+    bucket_path: str
+    target_dir: str
+    # Mount the objects read-only with lazyfs.py and fetch them on first read, instead of prefetching them
+    lazy: bool = False
+
+
+@dataclass
+class WorkflowInputs:
+    codes: List[GitData] = field(default_factory=list)
+    s3datas: List[S3Data] = field(default_factory=list)
+    command: str = ""
+    ssh: str = ""
+
+
+@dataclass
+class AioneParams:
+    """
+    The instance parameters of version 2.
+
+    Args:
+        id (str): The instance ID.
+        owner (str): The owner of the instance.
+        tenant (str): The tenant ID.
+        image (str): The image of the main container.
+        codes (List[GitData]): The git repositories to clone.
+        s3datas (List[S3Data]): The S3 data to download.
+        ssh (str): The SSH public key, empty if SSH is off.
+        resources (dict): The resource definition, e.g. {"cpu": "2", "memory": "4Gi"}.
+        metadata (dict): The remaining fields, e.g. name and projectId, without the transient fields.
+    """
+
+    id: str
+    owner: str
+    tenant: str
+    image: str
+    codes: List[GitData] = field(default_factory=list)
+    s3datas: List[S3Data] = field(default_factory=list)
+    ssh: str = ""
+    resources: Dict[str, Any] = field(default_factory=dict)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def validate(self):
+        """
+        Raises:
+            ValueError: If a field is missing or malformed.
+        """
+        if not _INSTANCE_ID_PATTERN.match(self.id):
+            raise ValueError(f"Invalid instance id {self.id!r}")
+        for name in ("owner", "tenant", "image"):
+            if not getattr(self, name):
+                raise ValueError(f"Missing {name} of instance {self.id}")
+        for code in self.codes:
+            if not code.repo_url or not code.target_dir:
+                raise ValueError(f"Git data of instance {self.id} needs repo_url and target_dir: {code.repo_url!r}")
+        for s3data in self.s3datas:
+            if not s3data.endpoint or not s3data.bucket_name or not s3data.target_dir:
+                raise ValueError(
+                    f"S3 data of instance {self.id} needs endpoint, bucket_name and target_dir: {s3data.bucket_name!r}"
+                )
+        # A lazy mount hides whatever else is written into or below its target directory
+        target_dirs = [code.target_dir for code in self.codes] + [s3data.target_dir for s3data in self.s3datas]
+        for s3data in self.s3datas:
+            if s3data.lazy and sum(1 for target_dir in target_dirs if _overlaps(target_dir, s3data.target_dir)) > 1:
+                raise ValueError(
+                    f"Lazy S3 data of instance {self.id} needs a target_dir of its own: {s3data.target_dir}"
+                )
+        transient = TRANSIENT_FIELDS & self.metadata.keys()
+        if transient:
+            raise ValueError(f"Transient fields must not be passed to instance {self.id}: {sorted(transient)}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["v"] = PARAMS_VERSION
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "AioneParams":
+        """
+        Read parameters of version 2, or of version 1 if the object has no version field.
+        """
+        data = dict(data)
+        version = data.pop("v", 1)
+        if version == 1:
+            return cls.from_legacy_dict(data)
+        if version != PARAMS_VERSION:
+            raise ValueError(f"Unsupported AIONE_PARAMS version {version}")
+        codes = [GitData(**code) for code in data.pop("codes", [])]
+        s3datas = [S3Data(**s3data) for s3data in data.pop("s3datas", [])]
+        return cls(codes=codes, s3datas=s3datas, **data)
+
+    @classmethod
+    def from_legacy_dict(cls, data: Dict[str, Any]) -> "AioneParams":
+        """
+        Read parameters of version 1 and drop their transient fields.
+        """
+        metadata = {k: v for k, v in data.items() if k not in TRANSIENT_FIELDS and k not in DERIVED_FIELDS}
+        fields = {name: metadata.pop(name, "") for name in ("id", "owner", "tenant", "image", "ssh")}
+        return cls(
+            codes=[GitData(**code) for code in metadata.pop("codes", [])],
+            s3datas=[S3Data(**s3data) for s3data in metadata.pop("ossDatas", [])],
+            resources=metadata.pop("resourceDefinition", {}),
+            metadata=metadata,
+            **fields,
+        )
+
+    def to_legacy_dict(self) -> Dict[str, Any]:
+        """
+        The version 1 form, for init containers that do not read version 2 yet.
+        """
+        data = dict(self.metadata)
+        data.update(
+            id=self.id,
+            owner=self.owner,
+            tenant=self.tenant,
+            image=self.image,
+            codes=[asdict(code) for code in self.codes],
+            ossDatas=[asdict(s3data) for s3data in self.s3datas],
+            ssh=self.ssh,
+            sshUsed="ON" if self.ssh else "OFF",
+            resourceDefinition=self.resources,
+        )
+        return data
+
+
+def encode_params(params: AioneParams, compact: bool = False) -> str:
+    """
+    Validate and encode the parameters as the value of AIONE_PARAMS.
+
+    Args:
+        params (AioneParams): The parameters.
+        compact (bool, optional): Encode as version 2, which only init containers decoding with decode_params read.
+            Encodes as version 1, which every download image reads, if False.
+    """
+    params.validate()
+    if not compact:
+        return base64.b64encode(json.dumps(params.to_legacy_dict()).encode()).decode()
+    payload = json.dumps(params.to_dict(), separators=(",", ":"), ensure_ascii=False).encode()
+    return COMPACT_PREFIX + base64.b64encode(zlib.compress(payload, 9)).decode()
+
+
+def decode_params(value: str) -> AioneParams:
+    """
+    Decode the value of AIONE_PARAMS in any of its encodings.
+
+    Raises:
+        ValueError: If the value is malformed or an offloaded file does not match its hash.
+    """
+    if value.startswith(FILE_PREFIX):
+        path = value[len(FILE_PREFIX) :]
+        with open(path) as f:
+            value = f.read()
+        if params_digest(value) != os.path.basename(path):
+            raise ValueError(f"AIONE_PARAMS file {path} does not match its hash")
+    if value.startswith(COMPACT_PREFIX):
+        data = json.loads(zlib.decompress(base64.b64decode(value[len(COMPACT_PREFIX) :])))
+    else:
+        data = json.loads(base64.b64decode(value))
+    return AioneParams.from_dict(data)
+
+
+def params_digest(value: str) -> str:
+    return hashlib.sha256(value.encode()).hexdigest()
@@ -0,0 +1,659 @@
+"""
+Build the PodTemplate of an AIONE IDE instance.
+
+All instances with the same image, resource class, command, target directories and image pull secret share one base
+template, which is built once and cached. Only the instance fields (the aione_id label, the owner/tenant annotations
+and AIONE_PARAMS) are patched in per instance.
+
+AIONE_PARAMS holds credentials, so it is passed to the download init container only: the pod carries the encoded
+parameters in the aione_params annotation, which the init container reads into its environment through the
+downward API. The annotations of a pod are set per execution, so the base template does not change between
+instances, and the main container never sees the parameters in its environment.
+
+The git repositories and S3 data are fetched by prefetch.py in a second init container, which runs in the instance
+image with the scripts mounted from a ConfigMap (see ensure_scripts_config_map). It reads its parameters from the
+aione_prefetch_params annotation; the download container no longer gets the repositories and data.
+
+The target directories live on the workspace volume, a ReadWriteMany PersistentVolumeClaim shared by all instances of
+a namespace (see ensure_workspace_claim). Each target directory is mounted from <aione_id>/<target_dir> on the claim,
+at the same path in the prefetch and main containers, with the instance ID taken from the aione_id label through
+the downward API, so the base template stays free of instance fields. A restarted instance gets its repositories,
+its workspace changes and the sync state of its S3 data back.
+
+S3 data marked lazy is not prefetched. A lazyfs container, started before the main container, mounts it with
+lazyfs.py at its target directory in an emptyDir volume, which reaches the main container through mount propagation;
+its postStart hook holds back the start of the main container until the mounts are up. The lazyfs container is
+privileged, as FUSE needs /dev/fuse and propagating a mount needs Bidirectional propagation, and the instance image
+needs libfuse and fusepy.
+
+Usage:
+    from podspec import InstanceSpec, WorkflowInputs, build_pod_template
+
+    spec = InstanceSpec(instance_id="ins-xxx", owner="ljgong", tenant="opo-xxx", inputs=WorkflowInputs())
+    pod_template = build_pod_template(spec)
+
+    # Create the ConfigMap holding the prefetch scripts and the workspace volume, needed before launching instances
+    # with repositories or data
+    python podspec.py install-scripts -n flytesnacks-development
+    python podspec.py install-workspace -n flytesnacks-development --storage-class cephfs
+
+    # Delete the params ConfigMaps no pod uses anymore
+    python podspec.py prune-params -n flytesnacks-development
+"""
+import argparse
+import copy
+import datetime
+import functools
+import hashlib
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple
+
+from flytekit import PodTemplate
+from kubernetes import config
+from kubernetes.client import ApiException, CoreV1Api
+from kubernetes.client.models import (
+    V1ConfigMap,
+    V1ConfigMapVolumeSource,
+    V1Container,
+    V1ContainerPort,
+    V1EmptyDirVolumeSource,
+    V1EnvVar,
+    V1EnvVarSource,
+    V1ExecAction,
+    V1Lifecycle,
+    V1LifecycleHandler,
+    V1LocalObjectReference,
+    V1ObjectFieldSelector,
+    V1ObjectMeta,
+    V1PersistentVolumeClaim,
+    V1PersistentVolumeClaimSpec,
+    V1PersistentVolumeClaimVolumeSource,
+    V1PodSpec,
+    V1ResourceRequirements,
+    V1SecurityContext,
+    V1Volume,
+    V1VolumeMount,
+    V1VolumeResourceRequirements,
+)
+
+from params import FILE_PREFIX, AioneParams, GitData, S3Data, WorkflowInputs, encode_params, params_digest  # noqa: F401
+
+PRIMARY_CONTAINER_NAME = "aione-main-container"
+DOWNLOAD_CONTAINER_NAME = "aione-download-container"
+DOWNLOAD_IMAGE = "docker.fzyun.io/founder/aione.download:1.0.0.51"
+DEFAULT_IMAGE = "registry-tcenter-001.dc4-faas.fzyun.io/founder/aione.ide:1.0.0.54-dev"
+IDE_PORT = 8080
+# Environment variable the download init container reads the instance parameters from
+PARAMS_ENV = "AIONE_PARAMS"
+# Pod annotation holding the encoded parameters, the source of PARAMS_ENV
+PARAMS_ANNOTATION = "aione_params"
+# DOWNLOAD_IMAGE only decodes version 1 of AIONE_PARAMS. Set to True together with pinning a download image that
+# decodes version 2 (z2: values and @ references to a ConfigMap) with params.decode_params.
+PARAMS_COMPACT = False
+# Encoded parameters above this size are moved into a ConfigMap if a ParamsConfigMapStore is given
+PARAMS_INLINE_MAX_BYTES = 2048
+PARAMS_VOLUME_NAME = "aione-params"
+PARAMS_MOUNT_DIR = "/etc/aione/params"
+# Label of the params ConfigMaps, which prune-params selects on
+PARAMS_MANAGED_BY_LABEL = {"app.kubernetes.io/managed-by": "aione-params"}
+# ConfigMaps younger than this are not pruned, as the pod of a launch that just created one may not exist yet
+PARAMS_PRUNE_MIN_AGE_SECONDS = 3600
+PREFETCH_CONTAINER_NAME = "aione-prefetch-container"
+# Pod annotation holding the parameters of the prefetch container, always version 2 since prefetch.py reads it
+PREFETCH_PARAMS_ANNOTATION = "aione_prefetch_params"
+# Scripts the prefetch container runs, mounted from a ConfigMap named by their content hash
+SCRIPT_FILES = ("params.py", "prefetch.py", "lazyfs.py")
+SCRIPTS_VOLUME_NAME = "aione-scripts"
+SCRIPTS_MOUNT_DIR = "/opt/aione"
+SCRIPTS_MANAGED_BY_LABEL = {"app.kubernetes.io/managed-by": "aione-scripts"}
+# ReadWriteMany claim holding the repositories and data of all instances, one <aione_id> directory per instance
+WORKSPACE_CLAIM_NAME = "aione-workspace"
+WORKSPACE_VOLUME_NAME = "aione-workspace"
+DEFAULT_WORKSPACE_SIZE = "500Gi"
+# Label holding the instance ID, and the environment variable the sub paths of the workspace mounts are expanded with,
+# set from the label
+INSTANCE_LABEL = "aione_id"
+INSTANCE_ID_ENV = "AIONE_ID"
+LAZYFS_CONTAINER_NAME = "aione-lazyfs-container"
+# Prefix of the emptyDir volumes lazy S3 data is mounted in, one per target directory
+LAZY_VOLUME_PREFIX = "aione-lazy"
+LAZY_CACHE_VOLUME_NAME = "aione-lazy-cache"
+LAZY_CACHE_MOUNT_DIR = "/var/cache/aione-lazy"
+# Environment variable lazyfs.py reads the block cache directory from
+LAZY_CACHE_DIR_ENV = "AIONE_LAZY_CACHE_DIR"
+
+
+@dataclass(frozen=True)
+class ResourceClass:
+    """
+    Resource class of the main container, e.g. C2M4 is 2 CPUs and 4Gi of memory.
+    """
+
+    cpu: str = "2"
+    memory: str = "4Gi"
+    gpu: str = "0"
+    title: str = ""
+
+
+@dataclass
+class InstanceSpec:
+    """
+    Everything that makes up one IDE instance.
+
+    Args:
+        instance_id (str): The instance ID, set as the aione_id label.
+        owner (str): The owner of the instance, set as the aione_owner annotation.
+        tenant (str): The tenant ID, set as the aione_tenant annotation.
+        inputs (WorkflowInputs): The git repositories, S3 data, startup command and SSH key.
+        image (str): The image of the main container.
+        resources (ResourceClass): The resource class of the main container.
+        metadata (dict): The remaining AIONE_PARAMS fields, e.g. name and projectId, passed on as they are.
+        image_pull_secret (str, optional): The name of the secret to pull the image with.
+    """
+
+    instance_id: str
+    owner: str
+    tenant: str
+    inputs: WorkflowInputs = field(default_factory=WorkflowInputs)
+    image: str = DEFAULT_IMAGE
+    resources: ResourceClass = field(default_factory=ResourceClass)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    image_pull_secret: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "InstanceSpec":
+        """
+        Create an instance spec from its JSON form, e.g. one entry of an instance list file.
+        """
+        data = dict(data)
+        inputs = data.pop("inputs", {})
+        inputs = WorkflowInputs(
+            codes=[GitData(**code) for code in inputs.get("codes", [])],
+            s3datas=[S3Data(**s3data) for s3data in inputs.get("s3datas", [])],
+            command=inputs.get("command", ""),
+            ssh=inputs.get("ssh", ""),
+        )
+        resources = ResourceClass(**data.pop("resources", {}))
+        return cls(inputs=inputs, resources=resources, **data)
+
+    @property
+    def data_dirs(self) -> Tuple[str, ...]:
+        """
+        The target directories of the git repositories and the S3 data that is prefetched.
+        """
+        dirs = {code.target_dir for code in self.inputs.codes}
+        dirs |= {s3data.target_dir for s3data in self.inputs.s3datas if not s3data.lazy}
+        return tuple(sorted(dirs))
+
+    @property
+    def lazy_dirs(self) -> Tuple[str, ...]:
+        """
+        The target directories of the S3 data mounted lazily.
+        """
+        return tuple(sorted({s3data.target_dir for s3data in self.inputs.s3datas if s3data.lazy}))
+
+    @property
+    def base_key(self) -> Tuple[str, ResourceClass, str, Tuple[str, ...], Optional[str], Tuple[str, ...]]:
+        """
+        The fields that determine the base template. Instances with the same base_key share one base template.
+        """
+        return self.image, self.resources, self.inputs.command, self.data_dirs, self.image_pull_secret, self.lazy_dirs
+
+
+def load_instance_specs(path: str) -> List[InstanceSpec]:
+    """
+    Load the instance specs from a JSON file holding one spec object or a list of them.
+    """
+    with open(path) as f:
+        data = json.load(f)
+    return [InstanceSpec.from_dict(item) for item in (data if isinstance(data, list) else [data])]
+
+
+def aione_params(spec: InstanceSpec) -> AioneParams:
+    """
+    Assemble the instance parameters. The download container gets them without the repositories and data, which
+    the prefetch container fetches.
+    """
+    return AioneParams(
+        id=spec.instance_id,
+        owner=spec.owner,
+        tenant=spec.tenant,
+        image=spec.image,
+        codes=spec.inputs.codes,
+        s3datas=spec.inputs.s3datas,
+        ssh=spec.inputs.ssh,
+        resources={
+            "title": spec.resources.title,
+            "cpu": spec.resources.cpu,
+            "memory": spec.resources.memory,
+            "count": int(spec.resources.gpu),
+        },
+        metadata=spec.metadata,
+    )
+
+
+class ParamsConfigMapStore:
+    """
+    ParamsConfigMapStore keeps encoded parameters in ConfigMaps named by their hash, so identical parameters share
+    one ConfigMap and a ConfigMap never changes once created. A ConfigMap outlives the pods that mount it, so prune
+    deletes the ones no pod mounts anymore.
+
+    Args:
+        api (CoreV1Api): The Kubernetes client.
+        namespace (str): The namespace the pods run in.
+    """
+
+    def __init__(self, api: CoreV1Api, namespace: str):
+        self.api = api
+        self.namespace = namespace
+
+    def put(self, value: str) -> Tuple[str, str]:
+        """
+        Store an encoded value.
+
+        Returns:
+            Tuple[str, str]: The name of the ConfigMap and the key holding the value, which is its SHA-256 digest.
+        """
+        key = params_digest(value)
+        name = f"{PARAMS_VOLUME_NAME}-{key[:16]}"
+        config_map = V1ConfigMap(
+            metadata=V1ObjectMeta(name=name, labels=PARAMS_MANAGED_BY_LABEL), data={key: value}, immutable=True
+        )
+        try:
+            self.api.create_namespaced_config_map(self.namespace, config_map)
+        except ApiException as e:
+            # Created by an earlier launch with the same parameters
+            if e.status != 409:
+                raise
+        return name, key
+
+    def prune(self, min_age_seconds: float = PARAMS_PRUNE_MIN_AGE_SECONDS) -> List[str]:
+        """
+        Delete the params ConfigMaps that no pod in the namespace mounts and that are older than min_age_seconds.
+
+        Returns:
+            List[str]: The names of the deleted ConfigMaps.
+        """
+        selector = ",".join(f"{k}={v}" for k, v in PARAMS_MANAGED_BY_LABEL.items())
+        config_maps = self.api.list_namespaced_config_map(self.namespace, label_selector=selector).items
+        in_use = {
+            volume.config_map.name
+            for pod in self.api.list_namespaced_pod(self.namespace).items
+            for volume in pod.spec.volumes or []
+            if volume.config_map is not None
+        }
+        now = datetime.datetime.now(datetime.timezone.utc)
+        deleted = []
+        for config_map in config_maps:
+            name = config_map.metadata.name
+            age = (now - config_map.metadata.creation_timestamp).total_seconds()
+            if name in in_use or age < min_age_seconds:
+                continue
+            try:
+                self.api.delete_namespaced_config_map(name, self.namespace)
+            except ApiException as e:
+                if e.status != 404:
+                    raise
+            deleted.append(name)
+        return deleted
+
+
+@functools.lru_cache(maxsize=None)
+def scripts_config_map() -> V1ConfigMap:
+    """
+    The ConfigMap holding SCRIPT_FILES, named by the hash of their content, so a changed script gets a new ConfigMap
+    and the pods of earlier templates keep theirs.
+    """
+    tasks_dir = os.path.dirname(os.path.abspath(__file__))
+    data = {}
+    for name in SCRIPT_FILES:
+        with open(os.path.join(tasks_dir, name)) as f:
+            data[name] = f.read()
+    digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:16]
+    return V1ConfigMap(
+        metadata=V1ObjectMeta(name=f"{SCRIPTS_VOLUME_NAME}-{digest}", labels=SCRIPTS_MANAGED_BY_LABEL),
+        data=data,
+        immutable=True,
+    )
+
+
+def ensure_scripts_config_map(api: CoreV1Api, namespace: str) -> str:
+    """
+    Create the scripts ConfigMap in the namespace, unless it exists.
+
+    Returns:
+        str: The name of the ConfigMap.
+    """
+    config_map = scripts_config_map()
+    try:
+        api.create_namespaced_config_map(namespace, config_map)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+    return config_map.metadata.name
+
+
+def template_version(spec: InstanceSpec) -> str:
+    """
+    Content hash of the base template, usable as the registration version, so an unchanged base template does not
+    need to be registered again.
+    """
+    image, resources, command, data_dirs, image_pull_secret, lazy_dirs = spec.base_key
+    content = json.dumps(
+        [
+            image,
+            asdict(resources),
+            command,
+            list(data_dirs),
+            image_pull_secret,
+            list(lazy_dirs),
+            WORKSPACE_CLAIM_NAME,
+            DOWNLOAD_IMAGE,
+            scripts_config_map().metadata.name,
+        ],
+        sort_keys=True,
+    )
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def ensure_workspace_claim(
+    api: CoreV1Api, namespace: str, storage_class: Optional[str] = None, size: str = DEFAULT_WORKSPACE_SIZE
+) -> str:
+    """
+    Create the workspace claim in the namespace, unless it exists.
+
+    Args:
+        api (CoreV1Api): The Kubernetes client.
+        namespace (str): The namespace the pods run in.
+        storage_class (str, optional): A storage class supporting ReadWriteMany, e.g. CephFS. The cluster default
+            if not given.
+        size (str, optional): The requested size, shared by all instances of the namespace.
+
+    Returns:
+        str: The name of the claim.
+    """
+    claim = V1PersistentVolumeClaim(
+        metadata=V1ObjectMeta(name=WORKSPACE_CLAIM_NAME),
+        spec=V1PersistentVolumeClaimSpec(
+            access_modes=["ReadWriteMany"],
+            storage_class_name=storage_class,
+            resources=V1VolumeResourceRequirements(requests={"storage": size}),
+        ),
+    )
+    try:
+        api.create_namespaced_persistent_volume_claim(namespace, claim)
+    except ApiException as e:
+        if e.status != 409:
+            raise
+    return WORKSPACE_CLAIM_NAME
+
+
+def _params_env(annotation: str) -> V1EnvVar:
+    return V1EnvVar(
+        name=PARAMS_ENV,
+        value_from=V1EnvVarSource(field_ref=V1ObjectFieldSelector(field_path=f"metadata.annotations['{annotation}']")),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def base_pod_spec(
+    image: str,
+    resources: ResourceClass,
+    command: str,
+    data_dirs: Tuple[str, ...] = (),
+    image_pull_secret: Optional[str] = None,
+    lazy_dirs: Tuple[str, ...] = (),
+) -> V1PodSpec:
+    """
+    Build the PodSpec without any instance fields. The result is cached and shared between instances, so callers must
+    not modify it.
+
+    Args:
+        image (str): The image of the main container, which the prefetch container runs in as well.
+        resources (ResourceClass): The resource class of the main container.
+        command (str): The startup command of the main container, the image's entrypoint if empty.
+        data_dirs (Tuple[str, ...], optional): The target directories of the repositories and prefetched data. The
+            prefetch container is only added if there are any.
+        image_pull_secret (str, optional): The name of the secret to pull the image with.
+        lazy_dirs (Tuple[str, ...], optional): The target directories of the lazily mounted data. The lazyfs
+            container is only added if there are any.
+    """
+    download_container = V1Container(
+        name=DOWNLOAD_CONTAINER_NAME,
+        image=DOWNLOAD_IMAGE,
+        env=[_params_env(PARAMS_ANNOTATION)],
+        volume_mounts=[],
+        resources=V1ResourceRequirements(
+            limits={"cpu": "500m", "memory": "500Mi"},
+            requests={"cpu": "500m", "memory": "500Mi"},
+        ),
+    )
+    # The same target directory of a restarted instance maps to the same directory on the claim
+    data_mounts = [
+        V1VolumeMount(
+            name=WORKSPACE_VOLUME_NAME,
+            mount_path=target_dir,
+            sub_path_expr=f"$({INSTANCE_ID_ENV})/{target_dir.strip('/')}",
+        )
+        for target_dir in data_dirs
+    ]
+    instance_id_env = [
+        V1EnvVar(
+            name=INSTANCE_ID_ENV,
+            value_from=V1EnvVarSource(
+                field_ref=V1ObjectFieldSelector(field_path=f"metadata.labels['{INSTANCE_LABEL}']")
+            ),
+        )
+    ]
+    init_containers = [download_container]
+    containers = []
+    volumes = []
+    if data_dirs or lazy_dirs:
+        volumes.append(
+            V1Volume(
+                name=SCRIPTS_VOLUME_NAME,
+                config_map=V1ConfigMapVolumeSource(name=scripts_config_map().metadata.name),
+            )
+        )
+    if data_dirs:
+        init_containers.append(
+            V1Container(
+                name=PREFETCH_CONTAINER_NAME,
+                image=image,
+                command=["python3", f"{SCRIPTS_MOUNT_DIR}/prefetch.py"],
+                env=[_params_env(PREFETCH_PARAMS_ANNOTATION), *instance_id_env],
+                volume_mounts=[
+                    V1VolumeMount(name=SCRIPTS_VOLUME_NAME, mount_path=SCRIPTS_MOUNT_DIR, read_only=True),
+                    *data_mounts,
+                ],
+                resources=V1ResourceRequirements(
+                    limits={"cpu": "2", "memory": "1Gi"},
+                    requests={"cpu": "500m", "memory": "1Gi"},
+                ),
+            )
+        )
+        volumes.append(
+            V1Volume(
+                name=WORKSPACE_VOLUME_NAME,
+                persistent_volume_claim=V1PersistentVolumeClaimVolumeSource(claim_name=WORKSPACE_CLAIM_NAME),
+            )
+        )
+    lazy_volumes = [
+        V1Volume(name=f"{LAZY_VOLUME_PREFIX}-{i}", empty_dir=V1EmptyDirVolumeSource()) for i in range(len(lazy_dirs))
+    ]
+    if lazy_dirs:
+        containers.append(
+            V1Container(
+                name=LAZYFS_CONTAINER_NAME,
+                image=image,
+                command=["python3", f"{SCRIPTS_MOUNT_DIR}/lazyfs.py"],
+                env=[
+                    _params_env(PREFETCH_PARAMS_ANNOTATION),
+                    V1EnvVar(name=LAZY_CACHE_DIR_ENV, value=LAZY_CACHE_MOUNT_DIR),
+                ],
+                volume_mounts=[
+                    V1VolumeMount(name=SCRIPTS_VOLUME_NAME, mount_path=SCRIPTS_MOUNT_DIR, read_only=True),
+                    V1VolumeMount(name=LAZY_CACHE_VOLUME_NAME, mount_path=LAZY_CACHE_MOUNT_DIR),
+                    *(
+                        V1VolumeMount(name=volume.name, mount_path=target_dir, mount_propagation="Bidirectional")
+                        for volume, target_dir in zip(lazy_volumes, lazy_dirs)
+                    ),
+                ],
+                security_context=V1SecurityContext(privileged=True),
+                # The kubelet starts the next container once the hook returns
+                lifecycle=V1Lifecycle(
+                    post_start=V1LifecycleHandler(
+                        _exec=V1ExecAction(command=["python3", f"{SCRIPTS_MOUNT_DIR}/lazyfs.py", "--wait"])
+                    )
+                ),
+                resources=V1ResourceRequirements(
+                    limits={"cpu": "1", "memory": "1Gi"},
+                    requests={"cpu": "200m", "memory": "512Mi"},
+                ),
+            )
+        )
+        volumes += [V1Volume(name=LAZY_CACHE_VOLUME_NAME, empty_dir=V1EmptyDirVolumeSource()), *lazy_volumes]
+    lazy_mounts = [
+        V1VolumeMount(name=volume.name, mount_path=target_dir, mount_propagation="HostToContainer", read_only=True)
+        for volume, target_dir in zip(lazy_volumes, lazy_dirs)
+    ]
+    main_container = V1Container(
+        name=PRIMARY_CONTAINER_NAME,
+        image=image,
+        env=instance_id_env if data_dirs else None,
+        volume_mounts=[*data_mounts, *lazy_mounts],
+        resources=V1ResourceRequirements(
+            limits={"cpu": resources.cpu, "memory": resources.memory, "nvidia.com/gpu": resources.gpu},
+        ),
+        command=["/bin/sh", "-c", command] if command else None,
+        ports=[V1ContainerPort(container_port=IDE_PORT, name="ide")],
+    )
+    return V1PodSpec(
+        init_containers=init_containers,
+        containers=[*containers, main_container],
+        tolerations=[],
+        image_pull_secrets=[V1LocalObjectReference(name=image_pull_secret)] if image_pull_secret else [],
+        volumes=volumes,
+    )
+
+
+def params_value(spec: InstanceSpec, params_store: Optional[ParamsConfigMapStore] = None) -> Tuple[str, Optional[str]]:
+    """
+    Encode the parameters of an instance as the value of the aione_params annotation.
+
+    Args:
+        spec (InstanceSpec): The instance.
+        params_store (ParamsConfigMapStore, optional): The store large parameters are moved to, mounted into the
+            init container and referenced from AIONE_PARAMS by their path. Parameters are always inline if not given.
+            Needs PARAMS_COMPACT, since only version 2 readers resolve the reference.
+
+    Returns:
+        Tuple[str, Optional[str]]: The value, and the name of the ConfigMap holding the parameters if they were moved.
+    """
+    if params_store is not None and not PARAMS_COMPACT:
+        raise ValueError(f"{DOWNLOAD_IMAGE} cannot read AIONE_PARAMS from a ConfigMap, see PARAMS_COMPACT")
+    value = encode_params(replace(aione_params(spec), codes=[], s3datas=[]), compact=PARAMS_COMPACT)
+    if params_store is None or len(value) <= PARAMS_INLINE_MAX_BYTES:
+        return value, None
+    config_map_name, key = params_store.put(value)
+    return f"{FILE_PREFIX}{PARAMS_MOUNT_DIR}/{key}", config_map_name
+
+
+def build_pod_spec(spec: InstanceSpec, params_config_map: Optional[str] = None) -> V1PodSpec:
+    """
+    Patch the instance fields into the cached base PodSpec. Only the patched objects are copied, everything else is
+    shared with the base template.
+
+    Args:
+        spec (InstanceSpec): The instance.
+        params_config_map (str, optional): The ConfigMap returned by params_value, mounted into the init container.
+    """
+    base = base_pod_spec(*spec.base_key)
+    pod_spec = copy.copy(base)
+    if params_config_map:
+        download_container = copy.copy(base.init_containers[0])
+        pod_spec.volumes = [
+            *base.volumes,
+            V1Volume(name=PARAMS_VOLUME_NAME, config_map=V1ConfigMapVolumeSource(name=params_config_map)),
+        ]
+        download_container.volume_mounts = [
+            *base.init_containers[0].volume_mounts,
+            V1VolumeMount(name=PARAMS_VOLUME_NAME, mount_path=PARAMS_MOUNT_DIR, read_only=True),
+        ]
+        pod_spec.init_containers = [download_container, *base.init_containers[1:]]
+    return pod_spec
+
+
+def instance_labels(spec: InstanceSpec) -> Dict[str, str]:
+    return {INSTANCE_LABEL: spec.instance_id}
+
+
+def instance_annotations(spec: InstanceSpec, params: str) -> Dict[str, str]:
+    """
+    The annotations of an instance's pod, including the parameters of the prefetch container if it has one.
+
+    Args:
+        spec (InstanceSpec): The instance.
+        params (str): The encoded parameters of the download container, see params_value.
+    """
+    annotations = {"aione_owner": spec.owner, "aione_tenant": spec.tenant, PARAMS_ANNOTATION: params}
+    if spec.data_dirs or spec.lazy_dirs:
+        annotations[PREFETCH_PARAMS_ANNOTATION] = encode_params(aione_params(spec), compact=True)
+    return annotations
+
+
+def build_pod_template(spec: InstanceSpec, params_store: Optional[ParamsConfigMapStore] = None) -> PodTemplate:
+    """
+    Build the complete PodTemplate of one instance. See params_value for params_store.
+    """
+    value, config_map_name = params_value(spec, params_store)
+    return PodTemplate(
+        primary_container_name=PRIMARY_CONTAINER_NAME,
+        labels=instance_labels(spec),
+        annotations=instance_annotations(spec, value),
+        pod_spec=build_pod_spec(spec, config_map_name),
+    )
+
+
+def load_api() -> CoreV1Api:
+    try:
+        config.load_incluster_config()
+    except config.ConfigException:
+        config.load_kube_config()
+    return CoreV1Api()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Maintain the Kubernetes objects of AIONE IDE instances.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    install = commands.add_parser("install-scripts", help="Create the ConfigMap holding the prefetch scripts.")
+    install.add_argument("-n", "--namespace", required=True)
+    workspace = commands.add_parser("install-workspace", help="Create the claim holding the repositories and data.")
+    workspace.add_argument("-n", "--namespace", required=True)
+    workspace.add_argument(
+        "--storage-class", help="A storage class supporting ReadWriteMany. Defaults to the cluster's."
+    )
+    workspace.add_argument("--size", default=DEFAULT_WORKSPACE_SIZE)
+    prune = commands.add_parser("prune-params", help="Delete the params ConfigMaps no pod mounts anymore.")
+    prune.add_argument("-n", "--namespace", required=True)
+    prune.add_argument("--min-age", type=float, default=PARAMS_PRUNE_MIN_AGE_SECONDS, help="Minimum age in seconds.")
+    args = parser.parse_args(argv)
+
+    api = load_api()
+    if args.command == "install-scripts":
+        print(f"ConfigMap {ensure_scripts_config_map(api, args.namespace)} is in place")
+        return 0
+    if args.command == "install-workspace":
+        claim = ensure_workspace_claim(api, args.namespace, args.storage_class, args.size)
+        print(f"PersistentVolumeClaim {claim} is in place")
+        return 0
+    for name in ParamsConfigMapStore(api, args.namespace).prune(args.min_age):
+        print(f"Deleted ConfigMap {name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
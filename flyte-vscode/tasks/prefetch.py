@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Prefetch the git repositories and S3 data of an AIONE IDE instance, run by the prefetch init container of podspec.py.
+
+Repositories are cloned shallowly and S3 objects are downloaded with concurrent ranged GETs, all in parallel.
+Each object is written in place into a sparse file next to its target, verified against its ETag and renamed,
+so nothing is staged and copied.
+
+S3 data is synced incrementally: a manifest in each target directory records the objects already downloaded,
+so a restarted pod only transfers new and changed objects, and resumes partially downloaded files where the
+previous pod stopped. Both rely on the target directories outliving the pod, which podspec.py mounts from the
+workspace claim.
+
+Usage:
+    AIONE_PARAMS=... python prefetch.py
+"""
+import base64
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set
+
+import s3fs
+
+from params import AioneParams, GitData, S3Data, decode_params
+
+PARAMS_ENV = "AIONE_PARAMS"
+# Size of a ranged GET; objects up to this size are downloaded with a single GET
+PART_SIZE = 8 * 1024 * 1024
+# Maximum number of repositories and objects fetched at once
+MAX_CONCURRENT_OBJECTS = 8
+# Maximum number of ranged GETs in flight, each buffering up to PART_SIZE bytes
+MAX_CONCURRENT_PARTS = 16
+# Suffix of a file being downloaded, and of the record of its finished parts
+PART_SUFFIX = ".aione-part"
+PART_STATE_SUFFIX = ".aione-part.json"
+# Name of the sync manifest in each S3 target directory
+MANIFEST_NAME = ".aione-manifest.json"
+# Number of downloaded objects after which the manifest is saved, so an interrupted sync keeps most of its progress
+MANIFEST_SAVE_INTERVAL = 100
+VERIFY_CHUNK_SIZE = 1024 * 1024
+# Part sizes in MiB of common S3 clients, tried after the smallest whole MiB part size to verify multipart ETags
+MULTIPART_PART_SIZES_MIB = (5, 8, 16, 32, 50, 64, 100, 128)
+# Attempts to download an object whose content does not match its ETag, each starting over
+DOWNLOAD_ATTEMPTS = 2
+
+
+@dataclass
+class S3Object:
+    path: str
+    size: int
+    etag: str
+    target: str
+
+
+@dataclass
+class PrefetchResult:
+    """
+    The outcome of fetching one repository or object.
+
+    Args:
+        source (str): The repository URL or the S3 path.
+        target (str): The local path.
+        bytes (int): The number of bytes downloaded, 0 for repositories.
+        seconds (float): The duration of the fetch.
+        error (str, optional): The error message if the fetch failed.
+        skipped (bool): Whether the object was skipped, since the manifest records it as current.
+    """
+
+    source: str
+    target: str
+    bytes: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+    skipped: bool = False
+
+
+def _write_json(path: str, data):
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(f"{path}.tmp", path)
+
+
+class SyncManifest:
+    """
+    SyncManifest records the key, size, ETag and local mtime of each object downloaded into a target directory.
+    An object is current if its size and ETag are unchanged and the local file has not been touched since.
+
+    Args:
+        target_dir (str): The target directory of the S3 data.
+    """
+
+    def __init__(self, target_dir: str):
+        self.path = os.path.join(target_dir, MANIFEST_NAME)
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        try:
+            with open(self.path) as f:
+                self.entries: Dict[str, dict] = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def is_current(self, obj: "S3Object") -> bool:
+        entry = self.entries.get(obj.path)
+        if entry is None or entry["size"] != obj.size or entry["etag"] != obj.etag:
+            return False
+        try:
+            stat = os.stat(obj.target)
+        except OSError:
+            return False
+        return stat.st_size == obj.size and stat.st_mtime == entry["mtime"]
+
+    def record(self, obj: "S3Object"):
+        entry = {"size": obj.size, "etag": obj.etag, "mtime": os.stat(obj.target).st_mtime}
+        with self._lock:
+            self.entries[obj.path] = entry
+            self._unsaved += 1
+            if self._unsaved >= MANIFEST_SAVE_INTERVAL:
+                self._save()
+
+    def retain(self, paths: Set[str]):
+        """
+        Forget the objects that no longer exist in the bucket.
+        """
+        with self._lock:
+            self.entries = {path: entry for path, entry in self.entries.items() if path in paths}
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        _write_json(self.path, self.entries)
+        self._unsaved = 0
+
+
+def s3_filesystem(s3data: S3Data) -> s3fs.S3FileSystem:
+    return s3fs.S3FileSystem(
+        key=s3data.access_key,
+        secret=s3data.secret_key,
+        client_kwargs={"endpoint_url": s3data.endpoint},
+    )
+
+
+def list_objects(fs: s3fs.S3FileSystem, s3data: S3Data) -> List[S3Object]:
+    """
+    List the objects under bucket_path. A bucket_path naming a single object lists that object.
+    """
+    prefix = f"{s3data.bucket_name}/{s3data.bucket_path.strip('/')}".rstrip("/")
+    objects = []
+    for path, info in fs.find(prefix, detail=True).items():
+        if info.get("type") == "directory" or path.endswith("/"):
+            continue
+        relative = os.path.relpath(path, prefix) if path != prefix else os.path.basename(path)
+        objects.append(
+            S3Object(
+                path=path,
+                size=info["size"],
+                etag=info.get("ETag", "").strip('"'),
+                target=os.path.join(s3data.target_dir, relative),
+            )
+        )
+    return objects
+
+
+def _md5(path: str, size: int, offset: int = 0) -> bytes:
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while size > 0:
+            chunk = f.read(min(VERIFY_CHUNK_SIZE, size))
+            if not chunk:
+                break
+            digest.update(chunk)
+            size -= len(chunk)
+    return digest.digest()
+
+
+def _multipart_part_sizes(size: int, parts: int) -> List[int]:
+    """
+    The part sizes an upload of size bytes in parts parts may have used: the smallest whole MiB size, then the
+    common client defaults that give the same number of parts.
+    """
+    mib = 1024 * 1024
+    smallest = -(-size // parts)
+    smallest = -(-smallest // mib) * mib
+    sizes = [smallest]
+    for part_mib in MULTIPART_PART_SIZES_MIB:
+        part_size = part_mib * mib
+        if part_size not in sizes and -(-size // part_size) == parts:
+            sizes.append(part_size)
+    return sizes
+
+
+def verify_etag(path: str, obj: S3Object) -> bool:
+    """
+    Check a downloaded file against the ETag of its object.
+
+    Returns:
+        bool: True if the file matches, False if the ETag cannot be checked, i.e. it is missing or not an MD5.
+
+    Raises:
+        ValueError: If the file does not match the ETag, of a single part upload or of a multipart upload with
+            any of the part sizes that _multipart_part_sizes considers.
+    """
+    if not obj.etag:
+        return False
+    if "-" not in obj.etag:
+        if len(obj.etag) != 32:
+            return False
+        actual = _md5(path, obj.size).hex()
+        if actual != obj.etag:
+            raise ValueError(f"Checksum mismatch for {obj.path}: expected {obj.etag}, got {actual}")
+        return True
+
+    # The ETag of a multipart upload is the MD5 of the part MD5s
+    etag, _, count = obj.etag.partition("-")
+    if len(etag) != 32 or not count.isdigit() or int(count) == 0:
+        return False
+    for part_size in _multipart_part_sizes(obj.size, int(count)):
+        digest = hashlib.md5()
+        for offset in range(0, obj.size, part_size):
+            digest.update(_md5(path, min(part_size, obj.size - offset), offset))
+        if digest.hexdigest() == etag:
+            return True
+    raise ValueError(f"Checksum mismatch for {obj.path}: no part size reproduces the multipart ETag {obj.etag}")
+
+
+def _load_part_state(state_path: str, tmp_path: str, obj: S3Object, part_size: int) -> Set[int]:
+    """
+    Return the offsets of the parts a previous attempt finished, if it downloaded the same version of the object.
+    """
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+        if (state["etag"], state["size"], state["part_size"]) != (obj.etag, obj.size, part_size):
+            return set()
+        if os.path.getsize(tmp_path) != obj.size:
+            return set()
+        return set(state["parts"])
+    except (OSError, ValueError, KeyError):
+        return set()
+
+
+def _remove(*paths: str):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def download_object(fs: s3fs.S3FileSystem, obj: S3Object, part_pool: ThreadPoolExecutor, part_size: int = PART_SIZE):
+    """
+    Download an object with concurrent ranged GETs written in place, verify it and move it to its target.
+    The finished parts are recorded next to the partial file, so an interrupted download resumes with the
+    missing parts, as long as the object has not changed in between.
+
+    A file that does not match the ETag is corrupt, e.g. from a resumed part written by a pod killed mid-write
+    or an object replaced during the download. It is deleted with its part record and downloaded again from
+    scratch, up to DOWNLOAD_ATTEMPTS times in total.
+
+    Raises:
+        ValueError: If the last attempt does not match the ETag either.
+    """
+    os.makedirs(os.path.dirname(obj.target) or ".", exist_ok=True)
+    tmp_path = obj.target + PART_SUFFIX
+    state_path = obj.target + PART_STATE_SUFFIX
+    for attempt in range(1, DOWNLOAD_ATTEMPTS + 1):
+        _download_parts(fs, obj, part_pool, part_size, tmp_path, state_path)
+        try:
+            if not verify_etag(tmp_path, obj):
+                print(f"Could not verify the ETag {obj.etag} of {obj.path}, only its size was checked")
+        except ValueError as e:
+            _remove(tmp_path, state_path)
+            if attempt == DOWNLOAD_ATTEMPTS:
+                raise
+            print(f"{e}, downloading it again")
+            continue
+        os.replace(tmp_path, obj.target)
+        _remove(state_path)
+        return
+
+
+def _download_parts(
+    fs: s3fs.S3FileSystem, obj: S3Object, part_pool: ThreadPoolExecutor, part_size: int, tmp_path: str, state_path: str
+):
+    done = _load_part_state(state_path, tmp_path, obj, part_size) if obj.etag else set()
+    if done:
+        print(f"Resuming {obj.path} with {len(done)} parts already downloaded")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | (0 if done else os.O_TRUNC), 0o644)
+    lock = threading.Lock()
+    try:
+        os.ftruncate(fd, obj.size)
+
+        def fetch(start: int, end: int):
+            data = fs.cat_file(obj.path, start=start, end=end)
+            if len(data) != end - start:
+                raise IOError(f"Short read of {obj.path} at {start}: {len(data)} of {end - start} bytes")
+            os.pwrite(fd, data, start)
+            with lock:
+                done.add(start)
+                _write_json(
+                    state_path,
+                    {"etag": obj.etag, "size": obj.size, "part_size": part_size, "parts": sorted(done)},
+                )
+
+        futures = [
+            part_pool.submit(fetch, start, min(start + part_size, obj.size))
+            for start in range(0, obj.size, part_size)
+            if start not in done
+        ]
+        # Every part has to finish before the file is closed, even if one of them failed
+        wait(futures)
+        for future in futures:
+            future.result()
+    finally:
+        os.close(fd)
+
+
+def clone_repo(git: GitData):
+    """
+    Clone the branch of a repository with depth 1. A target directory that already holds files is left alone,
+    so a restarted pod keeps the changes made in its workspace.
+    """
+    if os.path.isdir(git.target_dir) and os.listdir(git.target_dir):
+        print(f"{git.target_dir} is not empty, skipping the clone of {git.repo_url}")
+        return
+
+    env = dict(os.environ)
+    if git.access_token:
+        # Passed through the environment, so the token does not show up in the process list
+        credentials = base64.b64encode(f"oauth2:{git.access_token}".encode()).decode()
+        env.update(
+            GIT_CONFIG_COUNT="1",
+            GIT_CONFIG_KEY_0="http.extraHeader",
+            GIT_CONFIG_VALUE_0=f"Authorization: Basic {credentials}",
+        )
+    cmd = ["git", "clone", "--depth", "1", "--single-branch"]
+    if git.branch:
+        cmd += ["--branch", git.branch]
+    cmd += [git.repo_url, git.target_dir]
+    subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+
+
+def _timed(source: str, target: str, size: int, fetch) -> PrefetchResult:
+    start_time = time.monotonic()
+    result = PrefetchResult(source=source, target=target, bytes=size)
+    try:
+        fetch()
+    except subprocess.CalledProcessError as e:
+        result.error = e.stderr.strip() or str(e)
+    except Exception as e:
+        result.error = str(e)
+    result.seconds = time.monotonic() - start_time
+    return result
+
+
+def sync_object(fs: s3fs.S3FileSystem, obj: S3Object, manifest: SyncManifest, part_pool: ThreadPoolExecutor, part_size: int):
+    download_object(fs, obj, part_pool, part_size)
+    manifest.record(obj)
+
+
+def prefetch(
+    params: AioneParams,
+    max_objects: int = MAX_CONCURRENT_OBJECTS,
+    max_parts: int = MAX_CONCURRENT_PARTS,
+    part_size: int = PART_SIZE,
+    sync: bool = True,
+) -> List[PrefetchResult]:
+    """
+    Fetch all repositories and S3 data of an instance in parallel.
+
+    Args:
+        params (AioneParams): The instance parameters.
+        max_objects (int, optional): The maximum number of repositories and objects fetched at once.
+        max_parts (int, optional): The maximum number of ranged GETs in flight.
+        part_size (int, optional): The size of a ranged GET.
+        sync (bool, optional): Skip the objects the manifest of the target directory records as current.
+            Downloads everything again if False.
+
+    Returns:
+        List[PrefetchResult]: The outcome of each repository and object.
+    """
+    with ThreadPoolExecutor(max_workers=max_objects) as object_pool, ThreadPoolExecutor(
+        max_workers=max_parts
+    ) as part_pool:
+        futures = [
+            object_pool.submit(_timed, git.repo_url, git.target_dir, 0, lambda git=git: clone_repo(git))
+            for git in params.codes
+        ]
+        manifests = []
+        for s3data in params.s3datas:
+            # Mounted by lazyfs.py in the lazyfs container instead
+            if s3data.lazy:
+                continue
+            fs = s3_filesystem(s3data)
+            try:
+                objects = list_objects(fs, s3data)
+            except Exception as e:
+                source = f"s3://{s3data.bucket_name}/{s3data.bucket_path}"
+                futures.append(object_pool.submit(PrefetchResult, source, s3data.target_dir, error=str(e)))
+                continue
+            manifest = SyncManifest(s3data.target_dir)
+            manifest.retain({obj.path for obj in objects})
+            manifests.append(manifest)
+            for obj in objects:
+                if sync and manifest.is_current(obj):
+                    futures.append(object_pool.submit(PrefetchResult, f"s3://{obj.path}", obj.target, skipped=True))
+                    continue
+                futures.append(
+                    object_pool.submit(
+                        _timed,
+                        f"s3://{obj.path}",
+                        obj.target,
+                        obj.size,
+                        lambda fs=fs, obj=obj, manifest=manifest: sync_object(fs, obj, manifest, part_pool, part_size),
+                    )
+                )
+        try:
+            return [future.result() for future in futures]
+        finally:
+            for manifest in manifests:
+                manifest.save()
+
+
+def main() -> int:
+    value = os.getenv(PARAMS_ENV)
+    if not value:
+        print(f"{PARAMS_ENV} is not set, nothing to prefetch")
+        return 0
+
+    start_time = time.monotonic()
+    results = prefetch(decode_params(value))
+    failed = [result for result in results if result.error]
+    for result in failed:
+        print(f"FAILED {result.source} -> {result.target}: {result.error}")
+    skipped = sum(1 for result in results if result.skipped)
+    total_bytes = sum(result.bytes for result in results if not result.error)
+    seconds = time.monotonic() - start_time
+    print(
+        f"Prefetched {len(results) - len(failed)}/{len(results)} items ({skipped} up to date), "
+        f"{total_bytes / 1024 / 1024:.1f} MiB in {seconds:.2f}s ({total_bytes / 1024 / 1024 / max(seconds, 1e-6):.1f} MiB/s)"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
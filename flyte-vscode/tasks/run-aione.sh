@@ -1 +1,2 @@
-pyflyte run --remote aione.py testflow
+# 实例参数来自 AIONE_INSTANCE_SPEC 指向的 JSON 文件，复制 instance.example.json 并填写 imageSecret 等字段
+AIONE_INSTANCE_SPEC="${AIONE_INSTANCE_SPEC:-instance.json}" pyflyte run --remote aione.py testflow
@@ -0,0 +1 @@
+python launch.py "$@"
@@ -0,0 +1,46 @@
+import hashlib
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "tasks"))
+sys.path.insert(0, os.path.join(ROOT, "script"))
+
+
+class StubS3:
+    """
+    In-memory stand-in for the s3fs calls prefetch.py and lazyfs.py make: find and ranged cat_file.
+
+    Args:
+        objects (dict): The content of each object, keyed by "<bucket>/<key>".
+    """
+
+    def __init__(self, objects):
+        self.objects = dict(objects)
+        self.etags = {path: hashlib.md5(data).hexdigest() for path, data in self.objects.items()}
+        self.reads = []
+        # Content returned instead of the object's for the next reads of a path, to simulate corruption
+        self.corrupt = {}
+
+    def find(self, prefix, detail=False):
+        found = {
+            path: {"name": path, "type": "file", "size": len(data), "ETag": f'"{self.etags[path]}"'}
+            for path, data in self.objects.items()
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/")
+        }
+        return found if detail else sorted(found)
+
+    def cat_file(self, path, start=None, end=None):
+        self.reads.append((path, start, end))
+        if self.corrupt.get(path):
+            data = self.corrupt[path].pop(0)
+        else:
+            data = self.objects[path]
+        return data[start:end]
+
+
+@pytest.fixture
+def stub_s3():
+    return StubS3
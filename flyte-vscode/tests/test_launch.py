@@ -0,0 +1,110 @@
+import json
+from unittest import mock
+
+import pytest
+from flytekit.exceptions.user import FlyteEntityNotExistException
+from kubernetes.client import ApiException
+
+import launch
+import podspec
+from params import decode_params
+from podspec import InstanceSpec
+
+
+def instance(instance_id, **fields) -> InstanceSpec:
+    return InstanceSpec(instance_id=instance_id, owner="alice", tenant="opo-1", **fields)
+
+
+@pytest.fixture
+def remote():
+    """
+    A FlyteRemote on which no workflow is registered yet. register_script returns a workflow named by its version, and
+    execute an execution named by the aione_id label.
+    """
+    remote = mock.Mock()
+    remote.fetch_workflow.side_effect = FlyteEntityNotExistException("not registered")
+    remote.register_script.side_effect = lambda entity, version, **kwargs: f"workflow-{version}"
+    remote.execute.side_effect = lambda workflow, inputs, options: mock.Mock(
+        **{"id.name": f"exec-{options.labels.values['aione_id']}"}
+    )
+    return remote
+
+
+def test_launch_batch_registers_each_template_once(remote):
+    specs = [instance("ins-1"), instance("ins-2", image_pull_secret="registry"), instance("ins-3")]
+    results = launch.launch_batch(remote, specs, image_config=mock.Mock(), max_workers=4)
+
+    assert [result.instance_id for result in results] == ["ins-1", "ins-2", "ins-3"]
+    assert not [result for result in results if result.error]
+    assert results[0].template_version == results[2].template_version != results[1].template_version
+    assert remote.register_script.call_count == 2
+    # Each instance runs the workflow registered for its template
+    workflows = {call.kwargs["options"].labels.values["aione_id"]: call.args[0] for call in remote.execute.mock_calls}
+    assert workflows["ins-1"] == workflows["ins-3"] != workflows["ins-2"]
+    assert workflows["ins-2"].startswith(f"workflow-{results[1].template_version}-")
+
+
+def test_launch_batch_reuses_registered_workflow(remote):
+    remote.fetch_workflow.side_effect = None
+    remote.fetch_workflow.return_value = "registered"
+    results = launch.launch_batch(remote, [instance("ins-1"), instance("ins-2")], image_config=mock.Mock())
+    assert [result.execution_id for result in results] == ["exec-ins-1", "exec-ins-2"]
+    remote.register_script.assert_not_called()
+    assert [call.args[0] for call in remote.execute.mock_calls] == ["registered", "registered"]
+
+
+def test_registered_template_overrides(remote):
+    spec = instance("ins-1", image="registry.example.com/ide:1", image_pull_secret="registry")
+    launch.launch_batch(remote, [spec], image_config=mock.Mock())
+
+    [register] = remote.register_script.mock_calls
+    [node] = register.args[0].nodes
+    pod_template = node._pod_template
+    assert pod_template.primary_container_name == podspec.PRIMARY_CONTAINER_NAME
+    assert pod_template.pod_spec.containers[0].image == "registry.example.com/ide:1"
+    assert [secret.name for secret in pod_template.pod_spec.image_pull_secrets] == ["registry"]
+    # No instance field is part of the registered template
+    assert not pod_template.labels and not pod_template.annotations
+
+
+def test_launch_sets_instance_labels_and_annotations(remote):
+    launch.launch_batch(remote, [instance("ins-1", metadata={"name": "dev"})], image_config=mock.Mock())
+
+    [execute] = remote.execute.mock_calls
+    options = execute.kwargs["options"]
+    assert options.labels.values == {"aione_id": "ins-1"}
+    annotations = options.annotations.values
+    assert (annotations["aione_owner"], annotations["aione_tenant"]) == ("alice", "opo-1")
+    params = decode_params(annotations[podspec.PARAMS_ANNOTATION])
+    assert (params.id, params.metadata) == ("ins-1", {"name": "dev"})
+
+
+def test_failed_registration_fails_its_instances_only(remote):
+    def register(entity, version, **kwargs):
+        if entity.nodes[0]._pod_template.pod_spec.image_pull_secrets:
+            raise RuntimeError("registration failed")
+        return f"workflow-{version}"
+
+    remote.register_script.side_effect = register
+    results = launch.launch_batch(
+        remote, [instance("ins-1"), instance("ins-2", image_pull_secret="registry")], image_config=mock.Mock()
+    )
+    assert [result.error for result in results] == [None, "registration failed"]
+    assert results[0].execution_id and results[1].execution_id is None
+    assert remote.execute.call_count == 1
+
+
+def test_main_needs_the_workspace_claim(tmp_path, monkeypatch, capsys):
+    code = {"repo_url": "https://git.example.com/a.git", "target_dir": "/root/a", "access_token": "", "branch": "main"}
+    path = tmp_path / "instances.json"
+    spec = {"instance_id": "ins-1", "owner": "alice", "tenant": "opo-1", "inputs": {"codes": [code]}}
+    path.write_text(json.dumps([spec]))
+    api = mock.Mock()
+    api.read_namespaced_persistent_volume_claim.side_effect = ApiException(status=404)
+    monkeypatch.setattr(launch, "load_api", lambda: api)
+    monkeypatch.setattr(launch, "FlyteRemote", mock.Mock(side_effect=AssertionError("nothing is launched")))
+
+    assert launch.main([str(path), "--namespace", "aione-staging"]) == 1
+    api.create_namespaced_config_map.assert_called_once()
+    api.read_namespaced_persistent_volume_claim.assert_called_once_with(podspec.WORKSPACE_CLAIM_NAME, "aione-staging")
+    assert "install-workspace" in capsys.readouterr().err
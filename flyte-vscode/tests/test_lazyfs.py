@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from conftest import StubS3
+
+import lazyfs
+from lazyfs import BlockCache, LazyObject
+from params import AioneParams, S3Data, encode_params
+from prefetch import S3Object
+
+
+@pytest.fixture
+def pool():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        yield pool
+
+
+def lazy_object(tmp_path, pool, data: bytes, block_size=4, read_ahead=0, max_bytes=1024, fs=None):
+    fs = fs or StubS3({"bucket/a": data})
+    obj = S3Object("bucket/a", len(data), fs.etags["bucket/a"], str(tmp_path / "a"))
+    cache = BlockCache(str(tmp_path / "cache"), max_bytes)
+    return LazyObject(fs, obj, cache, pool, block_size=block_size, read_ahead=read_ahead), fs
+
+
+def test_block_cache_evicts_least_recently_used(tmp_path):
+    cache = BlockCache(str(tmp_path), max_bytes=8)
+    cache.put("a", b"aaaa")
+    cache.put("b", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", b"cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    assert sorted(os.listdir(tmp_path)) == ["a", "c"]
+
+
+def test_block_cache_reuses_blocks_of_earlier_mount(tmp_path):
+    BlockCache(str(tmp_path)).put("a", b"aaaa")
+    cache = BlockCache(str(tmp_path))
+    assert cache.contains("a")
+    assert cache.get("a") == b"aaaa"
+
+
+def test_block_cache_forgets_removed_files(tmp_path):
+    cache = BlockCache(str(tmp_path))
+    cache.put("a", b"aaaa")
+    os.remove(tmp_path / "a")
+    assert cache.get("a") is None
+    assert not cache.contains("a")
+
+
+def test_read_spans_blocks(tmp_path, pool):
+    data = bytes(range(30))
+    obj, fs = lazy_object(tmp_path, pool, data)
+    assert obj.read(0, 30) == data
+    assert obj.read(3, 6) == data[3:9]
+    assert obj.read(28, 10) == data[28:]
+    assert obj.read(30, 10) == b""
+    # Every block is fetched once and served from the cache afterwards
+    assert sorted(start for _, start, _ in fs.reads) == list(range(0, 30, 4))
+
+
+def test_changed_object_does_not_read_stale_blocks(tmp_path, pool):
+    obj, _ = lazy_object(tmp_path, pool, b"old!")
+    obj.read(0, 4)
+    fs = StubS3({"bucket/a": b"new!"})
+    changed, _ = lazy_object(tmp_path, pool, b"new!", fs=fs)
+    assert changed.read(0, 4) == b"new!"
+
+
+def test_sequential_reads_prefetch_ahead(tmp_path, pool):
+    obj, fs = lazy_object(tmp_path, pool, bytes(40), read_ahead=2)
+    obj.read(0, 4)
+    obj.read(4, 4)
+    pool.shutdown(wait=True)
+    assert sorted(start for _, start, _ in fs.reads) == [0, 4, 8, 12]
+
+
+def test_random_reads_do_not_prefetch(tmp_path, pool):
+    obj, fs = lazy_object(tmp_path, pool, bytes(40), read_ahead=2)
+    obj.read(20, 4)
+    obj.read(4, 4)
+    pool.shutdown(wait=True)
+    assert sorted(start for _, start, _ in fs.reads) == [4, 20]
+
+
+def test_concurrent_reads_fetch_a_block_once(tmp_path, pool):
+    class SlowS3(StubS3):
+        def cat_file(self, path, start=None, end=None):
+            time.sleep(0.05)
+            return super().cat_file(path, start, end)
+
+    data = os.urandom(16)
+    obj, fs = lazy_object(tmp_path, pool, data, fs=SlowS3({"bucket/a": data}))
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(obj.read(0, 4))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [data[:4]] * 8
+    assert len(fs.reads) == 1
+
+
+def test_short_read_fails(tmp_path, pool):
+    class TruncatingS3(StubS3):
+        def cat_file(self, path, start=None, end=None):
+            return super().cat_file(path, start, end)[:-1]
+
+    data = bytes(8)
+    obj, _ = lazy_object(tmp_path, pool, data, fs=TruncatingS3({"bucket/a": data}))
+    with pytest.raises(IOError):
+        obj.read(0, 4)
+
+
+def test_wait_for_the_mounts(tmp_path, monkeypatch):
+    lazy = [S3Data("http://s3", "key", "secret", "bucket", name, str(tmp_path / name), lazy=True) for name in "ab"]
+    eager = S3Data("http://s3", "key", "secret", "bucket", "c", str(tmp_path / "c"))
+    params = AioneParams(id="i", owner="o", tenant="t", image="img", s3datas=[*lazy, eager])
+    monkeypatch.setenv(lazyfs.PARAMS_ENV, encode_params(params, compact=True))
+    monkeypatch.setattr(lazyfs, "MOUNT_CHECK_SECONDS", 0.01)
+    mounted = set()
+    monkeypatch.setattr(lazyfs.os.path, "ismount", lambda path: path in mounted)
+
+    assert lazyfs.main(["--wait", "--timeout", "0.05"]) == 1
+    mounted.add(str(tmp_path / "a"))
+    threading.Timer(0.05, mounted.add, [str(tmp_path / "b")]).start()
+    # Only the lazy entries are waited for
+    assert lazyfs.main(["--wait", "--timeout", "5"]) == 0
@@ -0,0 +1,132 @@
+from unittest import mock
+
+import pytest
+from kubernetes.client import ApiException
+
+import podspec
+from params import GitData, S3Data, decode_params
+from podspec import InstanceSpec, WorkflowInputs, build_pod_template
+
+
+def instance(**inputs) -> InstanceSpec:
+    return InstanceSpec(instance_id="ins-1", owner="alice", tenant="opo-1", inputs=WorkflowInputs(**inputs))
+
+
+def test_params_only_reach_the_init_containers():
+    template = build_pod_template(instance())
+    [download] = template.pod_spec.init_containers
+    [env] = download.env
+    assert env.value_from.field_ref.field_path == f"metadata.annotations['{podspec.PARAMS_ANNOTATION}']"
+    assert not template.pod_spec.containers[0].env
+    assert decode_params(template.annotations[podspec.PARAMS_ANNOTATION]).id == "ins-1"
+    assert podspec.PREFETCH_PARAMS_ANNOTATION not in template.annotations
+
+
+def test_prefetch_container():
+    git = GitData("https://git.example.com/a.git", "/root/a", "token", "main")
+    data = S3Data("http://s3", "key", "secret", "bucket", "data", "/data")
+    template = build_pod_template(instance(codes=[git], s3datas=[data]))
+    pod_spec = template.pod_spec
+
+    download, prefetch = pod_spec.init_containers
+    assert prefetch.name == podspec.PREFETCH_CONTAINER_NAME
+    assert prefetch.env[0].value_from.field_ref.field_path.endswith(f"['{podspec.PREFETCH_PARAMS_ANNOTATION}']")
+    main = pod_spec.containers[0]
+    data_mounts = {(mount.mount_path, mount.name, mount.sub_path_expr) for mount in main.volume_mounts}
+    # Both target directories live on the workspace claim, under the directory of the instance
+    assert data_mounts == {
+        ("/data", podspec.WORKSPACE_VOLUME_NAME, "$(AIONE_ID)/data"),
+        ("/root/a", podspec.WORKSPACE_VOLUME_NAME, "$(AIONE_ID)/root/a"),
+    }
+    assert data_mounts < {(mount.mount_path, mount.name, mount.sub_path_expr) for mount in prefetch.volume_mounts}
+    for container in (main, prefetch):
+        [instance_id] = [env for env in container.env if env.name == podspec.INSTANCE_ID_ENV]
+        assert instance_id.value_from.field_ref.field_path == "metadata.labels['aione_id']"
+    assert template.labels == {"aione_id": "ins-1"}
+    workspace = next(volume for volume in pod_spec.volumes if volume.name == podspec.WORKSPACE_VOLUME_NAME)
+    assert workspace.persistent_volume_claim.claim_name == podspec.WORKSPACE_CLAIM_NAME
+    assert not [volume for volume in pod_spec.volumes if volume.empty_dir]
+    scripts = next(volume for volume in pod_spec.volumes if volume.name == podspec.SCRIPTS_VOLUME_NAME)
+    assert scripts.config_map.name == podspec.scripts_config_map().metadata.name
+
+    # The repositories and data are fetched by the prefetch container only
+    downloaded = decode_params(template.annotations[podspec.PARAMS_ANNOTATION])
+    assert not downloaded.codes and not downloaded.s3datas
+    prefetched = decode_params(template.annotations[podspec.PREFETCH_PARAMS_ANNOTATION])
+    assert prefetched.codes == [git] and prefetched.s3datas == [data]
+
+
+def test_template_version_depends_on_data_dirs():
+    data = S3Data("http://s3", "key", "secret", "bucket", "data", "/data")
+    assert podspec.template_version(instance()) != podspec.template_version(instance(s3datas=[data]))
+
+
+def test_image_pull_secret_is_part_of_the_base_template():
+    spec = instance()
+    spec.image_pull_secret = "registry"
+    base = podspec.base_pod_spec(*spec.base_key)
+    assert [secret.name for secret in base.image_pull_secrets] == ["registry"]
+    assert build_pod_template(spec).pod_spec.image_pull_secrets == base.image_pull_secrets
+    assert podspec.template_version(spec) != podspec.template_version(instance())
+
+
+def test_ensure_scripts_config_map_exists():
+    api = mock.Mock()
+    api.create_namespaced_config_map.side_effect = ApiException(status=409)
+    assert podspec.ensure_scripts_config_map(api, "ns") == podspec.scripts_config_map().metadata.name
+    assert set(podspec.scripts_config_map().data) == set(podspec.SCRIPT_FILES)
+
+
+def test_ensure_workspace_claim():
+    api = mock.Mock()
+    assert podspec.ensure_workspace_claim(api, "ns", "cephfs", "10Gi") == podspec.WORKSPACE_CLAIM_NAME
+    [(namespace, claim), _] = api.create_namespaced_persistent_volume_claim.call_args
+    assert namespace == "ns"
+    assert claim.spec.access_modes == ["ReadWriteMany"]
+    assert (claim.spec.storage_class_name, claim.spec.resources.requests) == ("cephfs", {"storage": "10Gi"})
+    api.create_namespaced_persistent_volume_claim.side_effect = ApiException(status=409)
+    assert podspec.ensure_workspace_claim(api, "ns") == podspec.WORKSPACE_CLAIM_NAME
+
+
+def test_lazy_data_is_mounted_by_the_lazyfs_container():
+    git = GitData("https://git.example.com/a.git", "/root/a", "token", "main")
+    lazy = S3Data("http://s3", "key", "secret", "bucket", "data", "/data", lazy=True)
+    spec = instance(codes=[git], s3datas=[lazy])
+    assert (spec.data_dirs, spec.lazy_dirs) == (("/root/a",), ("/data",))
+    template = build_pod_template(spec)
+    pod_spec = template.pod_spec
+
+    lazyfs, main = pod_spec.containers
+    assert lazyfs.name == podspec.LAZYFS_CONTAINER_NAME and main.name == podspec.PRIMARY_CONTAINER_NAME
+    assert lazyfs.command[-1].endswith("/lazyfs.py")
+    assert lazyfs.lifecycle.post_start._exec.command[-2:] == [f"{podspec.SCRIPTS_MOUNT_DIR}/lazyfs.py", "--wait"]
+    assert lazyfs.security_context.privileged
+    assert lazyfs.env[0].value_from.field_ref.field_path.endswith(f"['{podspec.PREFETCH_PARAMS_ANNOTATION}']")
+    [(volume, propagation)] = [(m.name, m.mount_propagation) for m in lazyfs.volume_mounts if m.mount_path == "/data"]
+    assert propagation == "Bidirectional"
+    [main_mount] = [mount for mount in main.volume_mounts if mount.mount_path == "/data"]
+    assert (main_mount.name, main_mount.mount_propagation, main_mount.read_only) == (volume, "HostToContainer", True)
+    assert next(v for v in pod_spec.volumes if v.name == volume).empty_dir is not None
+
+    # The prefetch container only fetches the repository, the lazy data reaches the lazyfs container too
+    _, prefetch = pod_spec.init_containers
+    assert "/data" not in {mount.mount_path for mount in prefetch.volume_mounts}
+    assert decode_params(template.annotations[podspec.PREFETCH_PARAMS_ANNOTATION]).s3datas == [lazy]
+    assert podspec.template_version(spec) != podspec.template_version(instance(codes=[git]))
+
+
+def test_lazy_data_only():
+    lazy = S3Data("http://s3", "key", "secret", "bucket", "data", "/data", lazy=True)
+    pod_spec = build_pod_template(instance(s3datas=[lazy])).pod_spec
+    assert [container.name for container in pod_spec.init_containers] == [podspec.DOWNLOAD_CONTAINER_NAME]
+    assert podspec.WORKSPACE_VOLUME_NAME not in {volume.name for volume in pod_spec.volumes}
+    assert podspec.SCRIPTS_VOLUME_NAME in {volume.name for volume in pod_spec.volumes}
+
+
+@pytest.mark.parametrize("target_dir", ["/data", "/data/sub", "/"])
+def test_lazy_data_needs_its_own_target_dir(target_dir):
+    lazy = S3Data("http://s3", "key", "secret", "bucket", "data", "/data", lazy=True)
+    other = S3Data("http://s3", "key", "secret", "bucket", "other", target_dir)
+    with pytest.raises(ValueError, match="of its own"):
+        build_pod_template(instance(s3datas=[lazy, other]))
+    build_pod_template(instance(s3datas=[lazy, S3Data("http://s3", "key", "secret", "bucket", "other", "/data2")]))
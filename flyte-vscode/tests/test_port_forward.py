@@ -0,0 +1,158 @@
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from kubernetes.client import V1ObjectMeta, V1Pod, V1PodList, V1PodStatus
+
+import port_forward
+from port_forward import ForwardSpec, StreamPool, resolve_pod
+
+START = datetime(2025, 9, 1, tzinfo=timezone.utc)
+
+
+def pod(name, phase="Running", age=0, deleting=False, execution_id="exec"):
+    return V1Pod(
+        metadata=V1ObjectMeta(
+            name=name,
+            labels={port_forward.EXECUTION_ID_LABEL: execution_id},
+            creation_timestamp=START + timedelta(minutes=age),
+            deletion_timestamp=START + timedelta(hours=1) if deleting else None,
+        ),
+        status=V1PodStatus(phase=phase),
+    )
+
+
+class FakeCoreV1Api:
+    """
+    The pod listing of a CoreV1Api, answering from pods that tests replace to simulate a restarted pod.
+    """
+
+    def __init__(self, *pods):
+        self.pods = list(pods)
+
+    def list_namespaced_pod(self, namespace, label_selector):
+        label, value = label_selector.split("=")
+        return V1PodList(items=[pod for pod in self.pods if pod.metadata.labels.get(label) == value])
+
+    def connect_get_namespaced_pod_portforward(self, *args, **kwargs):
+        raise AssertionError("only called by the stubbed portforward")
+
+
+class FakeStream:
+    def __init__(self, pod):
+        self.pod = pod
+        self.connected = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        self.connected = False
+
+
+@pytest.fixture
+def streams(monkeypatch):
+    """
+    Replace kubernetes.stream.portforward, the streams it opened are returned in order.
+    """
+    opened = []
+
+    def portforward(method, name, namespace, ports):
+        assert ports == "8080"
+        stream = FakeStream(name)
+        opened.append(stream)
+        return stream
+
+    monkeypatch.setattr(port_forward, "portforward", portforward)
+    monkeypatch.setattr(port_forward, "RECONNECT_BACKOFF_SECONDS", 0.01)
+    return opened
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        time.sleep(0.01)
+
+
+@pytest.mark.parametrize(
+    "value, spec",
+    [
+        ("exec:9000", ForwardSpec("exec", 9000, 8080)),
+        ("exec:9000:8888", ForwardSpec("exec", 9000, 8888)),
+    ],
+)
+def test_parse_forward_spec(value, spec):
+    assert ForwardSpec.parse(value) == spec
+
+
+@pytest.mark.parametrize("value", ["exec", ":9000", "exec:port", "exec:9000:8080:1"])
+def test_parse_invalid_forward_spec(value):
+    with pytest.raises(argparse.ArgumentTypeError, match="EXECUTION_ID:LOCAL_PORT"):
+        ForwardSpec.parse(value)
+
+
+def test_resolve_pod_picks_the_newest_running_pod():
+    api = FakeCoreV1Api(
+        pod("retry-0", age=0),
+        pod("retry-1", age=5),
+        pod("retry-2", age=10, deleting=True),
+        pod("retry-3", phase="Pending", age=15),
+        pod("other", age=20, execution_id="other"),
+    )
+    assert resolve_pod(api, "ns", "exec") == "retry-1"
+
+
+def test_resolve_pod_without_running_pod():
+    api = FakeCoreV1Api(pod("exec-0", phase="Pending"), pod("exec-1", deleting=True))
+    with pytest.raises(LookupError, match="exec has no running pod"):
+        resolve_pod(api, "ns", "exec")
+
+
+def test_pool_opens_streams_ahead_of_time(streams):
+    pool = StreamPool(FakeCoreV1Api(pod("exec-0")), "ns", ForwardSpec("exec", 9000), size=2)
+    wait_for(lambda: len(pool._idle) == 2)
+    assert [stream.pod for stream in streams] == ["exec-0", "exec-0"]
+
+    # A pooled stream is handed out and replaced
+    assert pool.acquire() is streams[0]
+    wait_for(lambda: len(streams) == 3 and len(pool._idle) == 2)
+
+
+def test_acquire_skips_closed_streams(streams):
+    pool = StreamPool(FakeCoreV1Api(pod("exec-0")), "ns", ForwardSpec("exec", 9000), size=2)
+    wait_for(lambda: len(pool._idle) == 2)
+    streams[0].connected = False
+    assert pool.acquire() is streams[1]
+    assert streams[0].closed
+
+
+def test_acquire_opens_a_stream_when_the_pool_is_empty(streams):
+    pool = StreamPool(FakeCoreV1Api(pod("exec-0")), "ns", ForwardSpec("exec", 9000), size=0)
+    stream = pool.acquire()
+    assert stream.pod == "exec-0" and streams == [stream]
+
+
+def test_invalidate_follows_the_replaced_pod(streams):
+    api = FakeCoreV1Api(pod("exec-0"))
+    pool = StreamPool(api, "ns", ForwardSpec("exec", 9000), size=2)
+    wait_for(lambda: len(pool._idle) == 2)
+    old = list(streams)
+
+    api.pods = [pod("exec-0", deleting=True), pod("exec-1", age=1)]
+    pool.invalidate()
+    assert all(stream.closed for stream in old)
+    wait_for(lambda: len(pool._idle) == 2)
+    assert pool.pod == "exec-1"
+    assert pool.acquire().pod == "exec-1"
+
+
+def test_fill_retries_until_the_pod_runs(streams):
+    api = FakeCoreV1Api(pod("exec-0", phase="Pending"))
+    pool = StreamPool(api, "ns", ForwardSpec("exec", 9000), size=1)
+    time.sleep(0.05)
+    assert not streams and pool.pod is None
+
+    api.pods = [pod("exec-0")]
+    wait_for(lambda: len(pool._idle) == 1)
+    assert pool.pod == "exec-0"
@@ -0,0 +1,262 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from conftest import StubS3
+
+import prefetch
+from params import GitData, S3Data
+from prefetch import S3Object, download_object, list_objects, verify_etag
+
+MIB = 1024 * 1024
+
+
+def multipart_etag(data: bytes, part_size: int) -> str:
+    digests = b"".join(hashlib.md5(data[i : i + part_size]).digest() for i in range(0, len(data), part_size))
+    return f"{hashlib.md5(digests).hexdigest()}-{-(-len(data) // part_size)}"
+
+
+def s3data(target_dir, path="data", lazy=False):
+    return S3Data("http://s3", "key", "secret", "bucket", path, str(target_dir), lazy=lazy)
+
+
+@pytest.fixture
+def part_pool():
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        yield pool
+
+
+def test_list_objects(tmp_path):
+    fs = StubS3({"bucket/data/a.txt": b"a", "bucket/data/sub/b.txt": b"bb", "bucket/other/c.txt": b"c"})
+    objects = sorted(list_objects(fs, s3data(tmp_path)), key=lambda obj: obj.path)
+    assert [(obj.path, obj.size, obj.target) for obj in objects] == [
+        ("bucket/data/a.txt", 1, str(tmp_path / "a.txt")),
+        ("bucket/data/sub/b.txt", 2, str(tmp_path / "sub" / "b.txt")),
+    ]
+    assert objects[0].etag == hashlib.md5(b"a").hexdigest()
+
+
+def test_list_single_object(tmp_path):
+    fs = StubS3({"bucket/data/a.txt": b"a"})
+    [obj] = list_objects(fs, s3data(tmp_path, "data/a.txt"))
+    assert obj.target == str(tmp_path / "a.txt")
+
+
+def test_download_object_in_parts(tmp_path, part_pool):
+    data = os.urandom(10 * 1024 + 7)
+    fs = StubS3({"bucket/a": data})
+    obj = S3Object("bucket/a", len(data), fs.etags["bucket/a"], str(tmp_path / "a"))
+    download_object(fs, obj, part_pool, part_size=1024)
+    assert (tmp_path / "a").read_bytes() == data
+    assert len(fs.reads) == 11
+    assert sorted(os.listdir(tmp_path)) == ["a"]
+
+
+def test_verify_multipart_etag(tmp_path):
+    data = os.urandom(12 * MIB + 5)
+    path = tmp_path / "a"
+    path.write_bytes(data)
+    for part_size in (MIB, 5 * MIB, 8 * MIB):
+        assert verify_etag(str(path), S3Object("bucket/a", len(data), multipart_etag(data, part_size), str(path)))
+
+
+def test_verify_etag_mismatch(tmp_path):
+    path = tmp_path / "a"
+    path.write_bytes(b"corrupt")
+    with pytest.raises(ValueError):
+        verify_etag(str(path), S3Object("bucket/a", 7, hashlib.md5(b"content").hexdigest(), str(path)))
+    with pytest.raises(ValueError):
+        verify_etag(str(path), S3Object("bucket/a", 7, multipart_etag(b"content", MIB), str(path)))
+
+
+def test_verify_etag_unverifiable(tmp_path):
+    path = tmp_path / "a"
+    path.write_bytes(b"content")
+    assert not verify_etag(str(path), S3Object("bucket/a", 7, "", str(path)))
+    assert not verify_etag(str(path), S3Object("bucket/a", 7, "kms-etag", str(path)))
+
+
+@pytest.mark.parametrize("multipart", [False, True])
+def test_download_refetches_corrupt_object(tmp_path, part_pool, multipart):
+    data = os.urandom(4096)
+    fs = StubS3({"bucket/a": data})
+    etag = multipart_etag(data, MIB) if multipart else fs.etags["bucket/a"]
+    fs.corrupt["bucket/a"] = [b"x" * len(data)]
+    obj = S3Object("bucket/a", len(data), etag, str(tmp_path / "a"))
+    download_object(fs, obj, part_pool)
+    assert (tmp_path / "a").read_bytes() == data
+    assert len(fs.reads) == 2
+
+
+def test_download_gives_up_on_persistent_mismatch(tmp_path, part_pool):
+    fs = StubS3({"bucket/a": b"content"})
+    obj = S3Object("bucket/a", 7, hashlib.md5(b"expected").hexdigest(), str(tmp_path / "a"))
+    with pytest.raises(ValueError):
+        download_object(fs, obj, part_pool)
+    assert len(fs.reads) == prefetch.DOWNLOAD_ATTEMPTS
+    assert os.listdir(tmp_path) == []
+
+
+def test_prefetch(tmp_path, monkeypatch):
+    fs = StubS3({"bucket/data/a.txt": b"a", "bucket/data/sub/b.txt": b"bb"})
+    monkeypatch.setattr(prefetch, "s3_filesystem", lambda s3data: fs)
+    cloned = []
+    monkeypatch.setattr(prefetch, "clone_repo", cloned.append)
+    git = GitData("https://git.example.com/a.git", str(tmp_path / "repo"), "", "main")
+    params = prefetch.AioneParams(id="i", owner="o", tenant="t", image="img", codes=[git], s3datas=[s3data(tmp_path / "d")])
+
+    results = prefetch.prefetch(params)
+
+    assert not [result for result in results if result.error]
+    assert cloned == [git]
+    assert (tmp_path / "d" / "a.txt").read_bytes() == b"a"
+    assert (tmp_path / "d" / "sub" / "b.txt").read_bytes() == b"bb"
+
+
+def test_prefetch_reports_listing_errors(tmp_path, monkeypatch):
+    class Unreachable(StubS3):
+        def find(self, prefix, detail=False):
+            raise OSError("unreachable")
+
+    monkeypatch.setattr(prefetch, "s3_filesystem", lambda s3data: Unreachable({}))
+    params = prefetch.AioneParams(id="i", owner="o", tenant="t", image="img", s3datas=[s3data(tmp_path)])
+    [result] = prefetch.prefetch(params)
+    assert result.error
+
+
+def test_sync_skips_current_objects(tmp_path, monkeypatch):
+    fs = StubS3({"bucket/data/a.txt": b"a", "bucket/data/b.txt": b"b", "bucket/data/c.txt": b"c"})
+    monkeypatch.setattr(prefetch, "s3_filesystem", lambda s3data: fs)
+    params = prefetch.AioneParams(id="i", owner="o", tenant="t", image="img", s3datas=[s3data(tmp_path)])
+    prefetch.prefetch(params)
+
+    fs.reads.clear()
+    fs.objects["bucket/data/b.txt"] = b"changed"
+    fs.etags["bucket/data/b.txt"] = hashlib.md5(b"changed").hexdigest()
+    del fs.objects["bucket/data/c.txt"]
+    results = prefetch.prefetch(params)
+
+    assert {result.source for result in results if result.skipped} == {"s3://bucket/data/a.txt"}
+    assert [path for path, _, _ in fs.reads] == ["bucket/data/b.txt"]
+    assert (tmp_path / "b.txt").read_bytes() == b"changed"
+    assert set(prefetch.SyncManifest(str(tmp_path)).entries) == {"bucket/data/a.txt", "bucket/data/b.txt"}
+
+
+def test_sync_downloads_modified_local_files(tmp_path, monkeypatch):
+    fs = StubS3({"bucket/data/a.txt": b"a"})
+    monkeypatch.setattr(prefetch, "s3_filesystem", lambda s3data: fs)
+    params = prefetch.AioneParams(id="i", owner="o", tenant="t", image="img", s3datas=[s3data(tmp_path)])
+    prefetch.prefetch(params)
+
+    (tmp_path / "a.txt").write_bytes(b"x")
+    fs.reads.clear()
+    prefetch.prefetch(params)
+    assert len(fs.reads) == 1
+    assert (tmp_path / "a.txt").read_bytes() == b"a"
+
+    fs.reads.clear()
+    prefetch.prefetch(params, sync=False)
+    assert len(fs.reads) == 1
+
+
+def write_partial(tmp_path, data: bytes, etag: str, parts, part_size: int):
+    with open(tmp_path / f"a{prefetch.PART_SUFFIX}", "wb") as f:
+        f.truncate(len(data))
+        for start in parts:
+            f.seek(start)
+            f.write(data[start : start + part_size])
+    prefetch._write_json(
+        str(tmp_path / f"a{prefetch.PART_STATE_SUFFIX}"),
+        {"etag": etag, "size": len(data), "part_size": part_size, "parts": list(parts)},
+    )
+
+
+def test_download_resumes_finished_parts(tmp_path, part_pool):
+    data = os.urandom(4096)
+    fs = StubS3({"bucket/a": data})
+    obj = S3Object("bucket/a", len(data), fs.etags["bucket/a"], str(tmp_path / "a"))
+    write_partial(tmp_path, data, obj.etag, [0, 1024], 1024)
+
+    download_object(fs, obj, part_pool, part_size=1024)
+
+    assert sorted(start for _, start, _ in fs.reads) == [2048, 3072]
+    assert (tmp_path / "a").read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ["a"]
+
+
+def test_download_restarts_if_object_changed(tmp_path, part_pool):
+    data = os.urandom(4096)
+    fs = StubS3({"bucket/a": data})
+    obj = S3Object("bucket/a", len(data), fs.etags["bucket/a"], str(tmp_path / "a"))
+    write_partial(tmp_path, b"x" * len(data), "0" * 32, [0, 1024], 1024)
+
+    download_object(fs, obj, part_pool, part_size=1024)
+
+    assert len(fs.reads) == 4
+    assert (tmp_path / "a").read_bytes() == data
+
+
+def test_download_refetches_corrupt_resumed_part(tmp_path, part_pool):
+    data = os.urandom(4096)
+    fs = StubS3({"bucket/a": data})
+    obj = S3Object("bucket/a", len(data), fs.etags["bucket/a"], str(tmp_path / "a"))
+    # A part recorded as finished whose bytes never reached the disk
+    write_partial(tmp_path, b"\0" * len(data), obj.etag, [0], 1024)
+
+    download_object(fs, obj, part_pool, part_size=1024)
+
+    assert len(fs.reads) == 3 + 4
+    assert (tmp_path / "a").read_bytes() == data
+
+
+def test_prefetch_skips_lazy_data(tmp_path, monkeypatch):
+    fs = StubS3({"bucket/data/a.txt": b"a"})
+    monkeypatch.setattr(prefetch, "s3_filesystem", lambda s3data: fs)
+    s3datas = [s3data(tmp_path / "lazy", lazy=True), s3data(tmp_path / "d")]
+    params = prefetch.AioneParams(id="i", owner="o", tenant="t", image="img", s3datas=s3datas)
+    [result] = prefetch.prefetch(params)
+    assert result.target == str(tmp_path / "d" / "a.txt")
+    assert not (tmp_path / "lazy").exists()
+
+
+def test_sync_resumes_in_the_next_pod(tmp_path, monkeypatch):
+    """
+    Two pods of one instance, each mounting the instance's directory on the workspace claim at its own target path.
+    The first is killed in the middle of a download, the second starts with fresh state apart from the claim.
+    """
+    data = os.urandom(8 * 1024)
+    fs = StubS3({"bucket/data/a.txt": b"a", "bucket/data/sub/b.txt": b"bb", "bucket/data/big": data})
+    monkeypatch.setattr(prefetch, "s3_filesystem", lambda s3data: fs)
+    claim_dir = tmp_path / "claim" / "ins-1" / "data"
+    claim_dir.mkdir(parents=True)
+
+    def pod(name):
+        target_dir = tmp_path / name / "data"
+        target_dir.parent.mkdir()
+        target_dir.symlink_to(claim_dir)
+        params = prefetch.AioneParams(id="ins-1", owner="o", tenant="t", image="img", s3datas=[s3data(target_dir)])
+        return prefetch.prefetch(params, max_objects=1, max_parts=1, part_size=1024)
+
+    cat_file = fs.cat_file
+
+    def killed_after_three_parts(path, start=None, end=None):
+        if path == "bucket/data/big" and start >= 3 * 1024:
+            raise OSError("pod killed")
+        return cat_file(path, start, end)
+
+    monkeypatch.setattr(fs, "cat_file", killed_after_three_parts)
+    [failed] = [result for result in pod("pod-1") if result.error]
+    assert failed.source == "s3://bucket/data/big"
+
+    monkeypatch.setattr(fs, "cat_file", cat_file)
+    fs.reads.clear()
+    results = pod("pod-2")
+
+    assert not [result for result in results if result.error]
+    skipped = {result.source for result in results if result.skipped}
+    assert skipped == {"s3://bucket/data/a.txt", "s3://bucket/data/sub/b.txt"}
+    # Only the parts the first pod did not finish are downloaded again
+    assert sorted(start for path, start, _ in fs.reads) == [3072, 4096, 5120, 6144, 7168]
+    assert (claim_dir / "big").read_bytes() == data
+    assert sorted(os.listdir(claim_dir)) == [prefetch.MANIFEST_NAME, "a.txt", "big", "sub"]
@@ -0,0 +1,153 @@
+import http.server
+import socket
+import threading
+from unittest import mock
+
+import pytest
+
+import run_ide
+from run_ide import PodProbe, http_status, readiness_probe, wait_until_ready
+
+CONSOLE_URL = "http://flyte.example.com/console/projects/flytesnacks/domains/development/executions/f8a2b1c3d4"
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(run_ide, "POLL_INTERVAL_SECONDS", 0.01)
+
+
+@pytest.fixture
+def server():
+    """
+    A local HTTP server answering with the queued status codes, then with the last one.
+    """
+    statuses = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+            self.send_response(status)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+
+        def log_message(self, *args):
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/", statuses
+    httpd.shutdown()
+
+
+def test_errors_are_not_ready(server):
+    url, statuses = server
+    statuses.extend([502, 404, 200])
+    assert wait_until_ready(lambda: http_status(url), timeout=5) is not None
+    assert statuses == [200]
+
+
+def test_never_ready(server):
+    url, statuses = server
+    statuses.append(503)
+    assert wait_until_ready(lambda: http_status(url), timeout=0.2) is None
+
+
+def test_unreachable_is_not_ready():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    assert wait_until_ready(lambda: http_status(f"http://127.0.0.1:{port}/"), timeout=0.2) is None
+
+
+def test_console_url_probes_the_execution_pod():
+    with mock.patch.object(run_ide, "load_api") as load_api:
+        target, probe = readiness_probe(CONSOLE_URL)
+    assert isinstance(probe, PodProbe)
+    assert (probe.api, probe.namespace, probe.execution_id, probe.port) == (
+        load_api.return_value,
+        "flytesnacks-development",
+        "f8a2b1c3d4",
+        run_ide.DEFAULT_VSCODE_PORT,
+    )
+    assert "f8a2b1c3d4" in target
+
+
+def test_probe_url_overrides_console_url():
+    target, _ = readiness_probe(CONSOLE_URL, probe_url="http://localhost:9000/")
+    assert target == "http://localhost:9000/"
+
+
+class FakePortForward:
+    def __init__(self, response: bytes):
+        self.local, self.remote = socket.socketpair()
+        self.remote.sendall(response)
+        self.closed = False
+
+    def socket(self, port):
+        return self.local
+
+    def close(self):
+        self.closed = True
+        self.local.close()
+        self.remote.close()
+
+
+def test_pod_probe_reads_status():
+    stream = FakePortForward(b"HTTP/1.1 302 Found\r\nLocation: ./login\r\n\r\n")
+    with mock.patch.object(run_ide, "resolve_pod", return_value="pod-0") as resolve_pod, mock.patch.object(
+        run_ide, "portforward", return_value=stream
+    ) as portforward:
+        assert PodProbe(mock.Mock(), "ns", "exec")() == 302
+    resolve_pod.assert_called_once()
+    assert portforward.call_args.kwargs["ports"] == "8080"
+    assert stream.closed
+
+
+def test_pod_probe_without_response():
+    stream = FakePortForward(b"")
+    stream.remote.close()
+    with mock.patch.object(run_ide, "resolve_pod", return_value="pod-0"), mock.patch.object(
+        run_ide, "portforward", return_value=stream
+    ):
+        with pytest.raises(OSError):
+            PodProbe(mock.Mock(), "ns", "exec")()
+
+
+def test_pending_pod_is_not_ready():
+    with mock.patch.object(run_ide, "resolve_pod", side_effect=LookupError("no running pod")):
+        assert wait_until_ready(PodProbe(mock.Mock(), "ns", "exec"), timeout=0.1) is None
+
+
+def run_script(tmp_path, *lines, **kwargs):
+    script = tmp_path / "ide.py"
+    script.write_text("".join(f"print({line!r})\n" for line in lines))
+    return run_ide.run_ide_script(str(script), timeout=5, **kwargs)
+
+
+def test_console_line_probes_the_execution_pod(tmp_path, capsys):
+    line = "Go to https://flyte.fzyun.io/console/projects/p/domains/d/executions/abc to see execution in the console."
+    stream = FakePortForward(b"HTTP/1.1 200 OK\r\n\r\n")
+    with mock.patch.object(run_ide, "load_api") as load_api, mock.patch.object(
+        run_ide, "resolve_pod", return_value="pod-0"
+    ) as resolve_pod, mock.patch.object(run_ide, "portforward", return_value=stream):
+        assert run_script(tmp_path, "Running Execution on Remote.", line) == 0
+    resolve_pod.assert_called_once_with(load_api.return_value, "p-d", "abc")
+    output = capsys.readouterr().out
+    assert "VSCode access URL: https://flyte.fzyun.io/console/projects/p/domains/d/executions/abc " in output
+    assert "is ready after" in output
+
+
+def test_vscode_url_wins_over_an_earlier_port_url(tmp_path, server, capsys):
+    url, statuses = server
+    statuses.append(200)
+    assert run_script(tmp_path, "Registry at http://registry.local:5000/v2/", f"Open {url}vscode/") == 0
+    assert f"VSCode access URL: {url}vscode/ " in capsys.readouterr().out
+
+
+def test_port_url_is_a_fallback(tmp_path, server, capsys):
+    url, statuses = server
+    statuses.append(200)
+    assert run_script(tmp_path, f"Serving at {url}", "done") == 0
+    output = capsys.readouterr().out
+    assert f"VSCode access URL: {url} " in output and "is ready after" in output
@@ -19,23 +19,70 @@ This package contains flyteinteractive plugin for Flytekit.
    COPILOT_CONFIG
    CODE_TOGETHER_CONFIG
    jupyter
+   IdleReaperConfig
+   LazyTaskInputs
+   StartupProfilerConfig
    get_task_inputs
 """
 
-from .jupyter_lib.decorator import jupyter
-from .utils import get_task_inputs
-from .vscode_lib.config import (
-    CODE_TOGETHER_CONFIG,
-    CODE_TOGETHER_EXTENSION,
-    COPILOT_CONFIG,
-    COPILOT_EXTENSION,
-    VIM_CONFIG,
-    VIM_EXTENSION,
-    VscodeConfig,
-)
-from .vscode_lib.decorator import vscode
-from .vscode_lib.vscode_constants import (
-    DEFAULT_CODE_SERVER_DIR_NAMES,
-    DEFAULT_CODE_SERVER_EXTENSIONS,
-    DEFAULT_CODE_SERVER_REMOTE_PATHS,
-)
+import importlib
+from typing import TYPE_CHECKING
+
+# The public attributes are imported on first access (PEP 562), so that a task using only @vscode
+# does not pay for importing nbformat and the jupyter decorator, and vice versa.
+_LAZY_ATTRIBUTES = {
+    "jupyter": ".jupyter_lib.decorator",
+    "LazyTaskInputs": ".jupyter_lib.inputs",
+    "IdleReaperConfig": ".jupyter_lib.reaper",
+    "StartupProfilerConfig": ".profiler",
+    "get_task_inputs": ".utils",
+    "CODE_TOGETHER_CONFIG": ".vscode_lib.config",
+    "CODE_TOGETHER_EXTENSION": ".vscode_lib.config",
+    "COPILOT_CONFIG": ".vscode_lib.config",
+    "COPILOT_EXTENSION": ".vscode_lib.config",
+    "VIM_CONFIG": ".vscode_lib.config",
+    "VIM_EXTENSION": ".vscode_lib.config",
+    "VscodeConfig": ".vscode_lib.config",
+    "vscode": ".vscode_lib.decorator",
+    "DEFAULT_CODE_SERVER_DIR_NAMES": ".vscode_lib.vscode_constants",
+    "DEFAULT_CODE_SERVER_EXTENSIONS": ".vscode_lib.vscode_constants",
+    "DEFAULT_CODE_SERVER_REMOTE_PATHS": ".vscode_lib.vscode_constants",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRIBUTES[name], __name__), name)
+    # Cache the attribute, so later accesses do not go through __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+if TYPE_CHECKING:
+    from .jupyter_lib.decorator import jupyter
+    from .jupyter_lib.inputs import LazyTaskInputs
+    from .jupyter_lib.reaper import IdleReaperConfig
+    from .profiler import StartupProfilerConfig
+    from .utils import get_task_inputs
+    from .vscode_lib.config import (
+        CODE_TOGETHER_CONFIG,
+        CODE_TOGETHER_EXTENSION,
+        COPILOT_CONFIG,
+        COPILOT_EXTENSION,
+        VIM_CONFIG,
+        VIM_EXTENSION,
+        VscodeConfig,
+    )
+    from .vscode_lib.decorator import vscode
+    from .vscode_lib.vscode_constants import (
+        DEFAULT_CODE_SERVER_DIR_NAMES,
+        DEFAULT_CODE_SERVER_EXTENSIONS,
+        DEFAULT_CODE_SERVER_REMOTE_PATHS,
+    )
@@ -1,3 +1,16 @@
 # This file has been moved to flytekit.interactive.constants
 # Import flytekit.interactive module to keep backwards compatibility
 from flytekit.interactive.constants import EXIT_CODE_SUCCESS, HOURS_TO_SECONDS, MAX_IDLE_SECONDS  # noqa: F401
+
+# Duration in which repeats of the same message are collapsed into one line
+LOG_DEDUP_WINDOW_SECONDS = 60
+# Sustained number of lines per second passed through, and the burst allowed on top of it
+LOG_RATE_LIMIT_LINES_PER_SECOND = 20
+LOG_RATE_LIMIT_BURST = 200
+# Number of distinct messages remembered for deduplication
+LOG_DEDUP_MAX_MESSAGES = 1024
+
+# Startup profiler: where the trace goes by default, and how long and how often the server port is checked
+DEFAULT_STARTUP_TRACE_PATH = "/tmp/flyteinteractive-startup-trace.json"
+STARTUP_READY_TIMEOUT_SECONDS = 600
+STARTUP_READY_CHECK_SECONDS = 0.5
@@ -1,9 +1,13 @@
+import hashlib
 import inspect
-import multiprocessing
-from typing import Callable, Optional
+import json
+import os
+import shutil
+import sys
+import tempfile
+from typing import Callable, List, Optional, Tuple
 
 import nbformat as nbf
-from flytekitplugins.flyteinteractive.utils import execute_command
 
 import flytekit
 from flytekit.core.context_manager import FlyteContextManager
@@ -11,53 +15,189 @@ from flytekit.core.utils import ClassDecorator
 from flytekit.loggers import logger
 
 from ..constants import MAX_IDLE_SECONDS
-from .jupyter_constants import EXAMPLE_JUPYTER_NOTEBOOK_NAME
+from ..profiler import StartupProfiler, StartupProfilerConfig
+from .jupyter_constants import EXAMPLE_JUPYTER_NOTEBOOK_NAME, NOTEBOOK_METADATA_KEY, WORKING_DIR_ENV
+from .metrics import JupyterServerMonitor, MetricsReporter
+from .reaper import IdleReaperConfig
+from .supervisor import JupyterServerSupervisor
 
 
-def write_example_notebook(task_function: Optional[Callable], notebook_dir: str):
+def _source_hash(source: str) -> str:
+    return hashlib.sha256(source.encode()).hexdigest()
+
+
+def generate_example_cells(task_function: Optional[Callable], with_inputs: bool = False) -> List[Tuple[str, str, str]]:
+    """
+    Generate the cells of the example notebook.
+
+    Args:
+        task_function (function): User's task function.
+        with_inputs (bool, optional): Whether the notebook loads the task inputs lazily and passes them to the task call.
+            The kernel finds them in the directory given by the FLYTE_INTERACTIVE_WORKING_DIR environment variable, so
+            the cells stay the same across launches.
+
+    Returns:
+        List[Tuple[str, str, str]]: The (role, cell type, source) of each cell. The role identifies the cell across launches.
+    """
+    cells = [
+        ("header", "markdown", "### This file is auto-generated by flyteinteractive"),
+        (
+            "imports",
+            "code",
+            """from flytekit import task
+from flytekitplugins.flyteinteractive import jupyter""",
+        ),
+        ("task_source", "code", inspect.getsource(task_function)),
+    ]
+    if not with_inputs:
+        cells.append(("task_call", "code", f"{task_function.__name__}()"))
+    else:
+        cells.append(
+            (
+                "inputs",
+                "code",
+                f"""# Each input is loaded on first access, e.g. inputs.a or inputs["a"].
+# Use inputs.handle("name") or inputs.mmap("name") to stream large files and datasets instead of loading them.
+from flytekitplugins.flyteinteractive import LazyTaskInputs
+
+inputs = LazyTaskInputs(
+    task_module_name="{task_function.__module__.split('.')[-1]}",
+    task_name="{task_function.__name__}",
+)""",
+            )
+        )
+        cells.append(("task_call", "code", f"{task_function.__name__}(**inputs)"))
+    cells.append(("footer", "markdown", "### Resume task by shutting down Jupyter: File -> Shut Down"))
+    return cells
+
+
+def _new_example_cell(role: str, cell_type: str, source: str):
+    metadata = {NOTEBOOK_METADATA_KEY: {"role": role, "source_hash": _source_hash(source)}}
+    if cell_type == "markdown":
+        return nbf.v4.new_markdown_cell(source, metadata=metadata)
+    return nbf.v4.new_code_cell(source, metadata=metadata)
+
+
+def merge_example_cells(nb, cells: List[Tuple[str, str, str]]):
+    """
+    Merge generated cells into an existing notebook without discarding the user's work.
+    A generated cell the user has not edited is updated in place. If the user has edited it, the new version is
+    inserted right after it instead. Generated cells missing from the notebook are appended, and cells the user added
+    are kept as they are.
+
+    Args:
+        nb (nbformat.NotebookNode): The existing notebook, modified in place.
+        cells (List[Tuple[str, str, str]]): The generated cells from generate_example_cells.
+    """
+    for role, cell_type, source in cells:
+        index = next(
+            (i for i, c in enumerate(nb.cells) if c.metadata.get(NOTEBOOK_METADATA_KEY, {}).get("role") == role),
+            None,
+        )
+        if index is None:
+            nb.cells.append(_new_example_cell(role, cell_type, source))
+            continue
+
+        cell = nb.cells[index]
+        recorded_hash = cell.metadata[NOTEBOOK_METADATA_KEY].get("source_hash")
+        if cell.source == source:
+            continue
+        if _source_hash(cell.source) == recorded_hash:
+            cell.source = source
+            cell.metadata[NOTEBOOK_METADATA_KEY]["source_hash"] = _source_hash(source)
+        else:
+            # The user edited this cell: keep the edit and hand over ownership of the role to the new cell.
+            del cell.metadata[NOTEBOOK_METADATA_KEY]
+            nb.cells.insert(index + 1, _new_example_cell(role, cell_type, source))
+
+
+def write_example_notebook(task_function: Optional[Callable], notebook_dir: str, with_inputs: bool = False):
     """
     Create an example notebook with markdown and code cells that show instructions to resume task & jupyter task code.
+    The write is skipped if the generated cells are unchanged since the last launch, and an existing notebook is merged
+    instead of overwritten, so edits made in earlier sessions survive a restart.
 
     Args:
         task_function (function): User's task function.
         notebook_dir (str): Local path to write the example notebook to
+        with_inputs (bool, optional): Whether the notebook loads the task inputs, see generate_example_cells.
     """
-    nb = nbf.v4.new_notebook()
-
-    first_cell = "### This file is auto-generated by flyteinteractive"
-    second_cell = """from flytekit import task
-from flytekitplugins.flyteinteractive import jupyter"""
-    third_cell = inspect.getsource(task_function)
-    fourth_cell = f"{task_function.__name__}()"
-    fifth_cell = "### Resume task by shutting down Jupyter: File -> Shut Down"
-
-    nb["cells"] = [
-        nbf.v4.new_markdown_cell(first_cell),
-        nbf.v4.new_code_cell(second_cell),
-        nbf.v4.new_code_cell(third_cell),
-        nbf.v4.new_code_cell(fourth_cell),
-        nbf.v4.new_markdown_cell(fifth_cell),
-    ]
-    nbf.write(nb, f"{notebook_dir}/{EXAMPLE_JUPYTER_NOTEBOOK_NAME}")
+    cells = generate_example_cells(task_function, with_inputs)
+    content_hash = _source_hash(json.dumps(cells))
+    notebook_path = os.path.join(notebook_dir, EXAMPLE_JUPYTER_NOTEBOOK_NAME)
+
+    nb = None
+    if os.path.exists(notebook_path):
+        try:
+            nb = nbf.read(notebook_path, as_version=4)
+        except Exception as e:
+            logger.warning(f"Failed to read existing notebook {notebook_path}, rewriting it: {e}")
+
+    if nb is None:
+        nb = nbf.v4.new_notebook()
+        nb["cells"] = [_new_example_cell(*cell) for cell in cells]
+    elif nb.metadata.get(NOTEBOOK_METADATA_KEY, {}).get("content_hash") == content_hash:
+        logger.info(f"Example notebook {notebook_path} is up to date")
+        return
+    else:
+        merge_example_cells(nb, cells)
+    nb.metadata[NOTEBOOK_METADATA_KEY] = {"content_hash": content_hash}
+
+    # Write to a temporary file and rename it, so the notebook is never left half written.
+    fd, tmp_path = tempfile.mkstemp(dir=notebook_dir, prefix=".", suffix=".ipynb.tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            nbf.write(nb, file)
+        os.replace(tmp_path, notebook_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def prepare_task_inputs(task_function: Callable) -> Optional[str]:
+    """
+    Copy the task's module file next to its inputs.pb, so the notebook kernel can decode the inputs with the original
+    task interface even if the user changes the task later.
+
+    Args:
+        task_function (function): User's task function.
+
+    Returns:
+        str: The context working directory, or None if the task has no inputs.pb to load.
+    """
+    context_working_dir = FlyteContextManager.current_context().execution_state.working_dir
+    if context_working_dir is None or not os.path.exists(os.path.join(context_working_dir, "inputs.pb")):
+        return None
+
+    task_function_source_path = inspect.getsourcefile(task_function)
+    shutil.copy(
+        task_function_source_path,
+        os.path.join(context_working_dir, os.path.basename(task_function_source_path)),
+    )
+    return context_working_dir
 
 
 def exit_handler(
-    child_process: multiprocessing.Process,
+    supervisor: JupyterServerSupervisor,
     task_function,
     args,
     kwargs,
     post_execute: Optional[Callable] = None,
 ):
     """
-    1. Wait for the child process to finish. This happens when the user clicks "Shut Down" in Jupyter
+    1. Wait for the supervisor to finish. This happens when the user clicks "Shut Down" in Jupyter or the server is idle.
     2. Execute post function, if given.
     3. Executes the task function, when the Jupyter Notebook Server is terminated.
+    The task exits without running the task function if the server was shut down because the container received a signal.
 
     Args:
-        child_process (multiprocessing.Process, optional): The process to be terminated.
+        supervisor (JupyterServerSupervisor): The supervisor running the Jupyter Notebook server.
         post_execute (function, optional): The function to be executed before the jupyter notebook server is terminated.
     """
-    child_process.join()
+    supervisor.wait()
+    if supervisor.received_signal is not None:
+        logger.info("Jupyter Notebook server was shut down by a signal, the task function is not resumed")
+        sys.exit(128 + supervisor.received_signal)
 
     if post_execute is not None:
         post_execute()
@@ -86,6 +226,11 @@ class jupyter(ClassDecorator):
         notebook_dir: Optional[str] = "/root",
         pre_execute: Optional[Callable] = None,
         post_execute: Optional[Callable] = None,
+        prefork: bool = False,
+        metrics_port: Optional[int] = None,
+        metrics_path: Optional[str] = None,
+        idle_reaper: Optional[IdleReaperConfig] = None,
+        startup_profiler: Optional[StartupProfilerConfig] = None,
     ):
         """
         jupyter decorator modifies a container to run a Jupyter Notebook server:
@@ -101,6 +246,15 @@ class jupyter(ClassDecorator):
             run_task_first (bool, optional): Executes the user's task first when True. Launches the Jupyter Notebook server only if the user's task fails. Defaults to False.
             pre_execute (function, optional): The function to be executed before the jupyter setup function.
             post_execute (function, optional): The function to be executed before the jupyter is self-terminated.
+            prefork (bool, optional): Launches the Jupyter Notebook server before pre_execute runs, so that the server
+                starts up while pre_execute and the example notebook generation are still in progress. Defaults to False.
+            metrics_port (int, optional): The port to serve Prometheus metrics of the server on at /metrics.
+            metrics_path (str, optional): The local path of a JSON file the server metrics are periodically written to.
+            idle_reaper (IdleReaperConfig, optional): Decides the idle shutdown on kernel busy state and the CPU/GPU usage
+                of the server instead of its HTTP activity, so running cells keep the server alive and idle browser tabs
+                do not. Only takes effect if max_idle_seconds is set.
+            startup_profiler (StartupProfilerConfig, optional): Times the startup phases until the server answers,
+                writes them to a JSON trace and logs a summary.
         """
         self.max_idle_seconds = max_idle_seconds
         self.port = port
@@ -109,6 +263,12 @@ class jupyter(ClassDecorator):
         self.notebook_dir = notebook_dir
         self._pre_execute = pre_execute
         self._post_execute = post_execute
+        self.prefork = prefork
+        self.metrics_port = metrics_port
+        self.metrics_path = metrics_path
+        self.idle_reaper = idle_reaper
+        self.startup_profiler = startup_profiler
+        self._monitor = JupyterServerMonitor(port=port, max_idle_seconds=max_idle_seconds)
 
         # arguments are required to be passed in order to access from _wrap_call
         super().__init__(
@@ -120,6 +280,11 @@ class jupyter(ClassDecorator):
             notebook_dir=notebook_dir,
             pre_execute=pre_execute,
             post_execute=post_execute,
+            prefork=prefork,
+            metrics_port=metrics_port,
+            metrics_path=metrics_path,
+            idle_reaper=idle_reaper,
+            startup_profiler=startup_profiler,
         )
 
     def execute(self, *args, **kwargs):
@@ -140,12 +305,70 @@ class jupyter(ClassDecorator):
                 logger.error(f"Task Error: {e}")
                 logger.info("Launching Jupyter Notebook Server")
 
-        # 0. Executes the pre_execute function if provided.
-        if self._pre_execute is not None:
-            self._pre_execute()
-            logger.info("Pre execute function executed successfully!")
+        profiler = StartupProfiler(self.startup_profiler, self.get_extra_config())
+
+        # The notebook kernels inherit the environment of the server, and read the task inputs from this directory.
+        if ctx.execution_state.working_dir is not None:
+            os.environ[WORKING_DIR_ENV] = str(ctx.execution_state.working_dir)
+
+        supervisor = None
+        reporter = None
+        try:
+            # In prefork mode, the server starts before pre_execute so that both run concurrently.
+            if self.prefork:
+                supervisor = self._start_server(profiler)
 
-        # 1. Launches and monitors the Jupyter Notebook server.
+            # 0. Executes the pre_execute function if provided.
+            if self._pre_execute is not None:
+                with profiler.phase("pre_execute"):
+                    self._pre_execute()
+                logger.info("Pre execute function executed successfully!")
+
+            # 1. Launches and monitors the Jupyter Notebook server.
+            if supervisor is None:
+                supervisor = self._start_server(profiler)
+
+            # 2. Write the example notebook while the server is starting up.
+            with profiler.phase("example_notebook"):
+                write_example_notebook(
+                    task_function=self.task_function,
+                    notebook_dir=self.notebook_dir,
+                    with_inputs=prepare_task_inputs(self.task_function) is not None,
+                )
+            profiler.end_startup()
+
+            # 3. Exposes the server metrics if requested.
+            if self.metrics_port is not None or self.metrics_path is not None:
+                reporter = MetricsReporter(self._monitor, port=self.metrics_port, path=self.metrics_path)
+                reporter.start()
+
+            return exit_handler(
+                supervisor=supervisor,
+                task_function=self.task_function,
+                args=args,
+                kwargs=kwargs,
+                post_execute=self._post_execute,
+            )
+        finally:
+            profiler.finish()
+            if supervisor is not None:
+                # Also restores the signal handlers if pre_execute or the notebook generation failed
+                supervisor.stop()
+                supervisor.wait()
+            if reporter is not None:
+                reporter.stop()
+
+    def _start_server(self, profiler: StartupProfiler) -> JupyterServerSupervisor:
+        """
+        Launch the Jupyter Notebook server under a supervisor, which streams its output, probes its readiness,
+        decides the idle shutdown if the idle reaper is enabled and restarts the server if it crashes.
+
+        Args:
+            profiler (StartupProfiler): The startup profiler, which times the launch and the readiness of the server.
+
+        Returns:
+            JupyterServerSupervisor: The supervisor running the Jupyter Notebook server.
+        """
         # The following line starts a Jupyter Notebook server with specific configurations:
         #   - '--port': Specifies the port number on which the server will listen for connections.
         #   - '--ip': *: Listen on all interfaces.
@@ -153,28 +376,37 @@ class jupyter(ClassDecorator):
         #   - '--notebook-dir': Sets the directory where Jupyter Notebook will look for notebooks.
         #   - '--NotebookApp.token='': Disables token-based authentication by setting an empty token.
         logger.info("Start the jupyter notebook server...")
-        cmd = f"jupyter notebook --ip='*' --port {self.port} --no-browser --notebook-dir={self.notebook_dir} --NotebookApp.token=''"
+        cmd = [
+            "jupyter",
+            "notebook",
+            "--ip=*",
+            f"--port={self.port}",
+            "--no-browser",
+            f"--notebook-dir={self.notebook_dir}",
+            "--NotebookApp.token=",
+        ]
 
         #   - '--NotebookApp.shutdown_no_activity_timeout': Sets the maximum duration of inactivity
         #     before shutting down the Jupyter Notebook server automatically.
         # When shutdown_no_activity_timeout is 0, it means there is no idle timeout and it is always running.
-        if self.max_idle_seconds:
-            cmd += f" --NotebookApp.shutdown_no_activity_timeout={self.max_idle_seconds}"
-        child_process = multiprocessing.Process(
-            target=execute_command,
-            kwargs={"cmd": cmd},
-        )
-        child_process.start()
-
-        write_example_notebook(task_function=self.task_function, notebook_dir=self.notebook_dir)
+        # The idle reaper replaces it, since the server would otherwise shut down while a long cell is running.
+        if self.max_idle_seconds and self.idle_reaper is None:
+            cmd.append(f"--NotebookApp.shutdown_no_activity_timeout={self.max_idle_seconds}")
 
-        return exit_handler(
-            child_process=child_process,
-            task_function=self.task_function,
-            args=args,
-            kwargs=kwargs,
-            post_execute=self._post_execute,
+        # The server output is streamed as structured lines tagged with the server type and port.
+        supervisor = JupyterServerSupervisor(
+            cmd=cmd,
+            port=self.port,
+            labels=self.get_extra_config(),
+            monitor=self._monitor,
+            max_idle_seconds=self.max_idle_seconds,
+            idle_reaper=self.idle_reaper,
+            # The readiness probe of the supervisor also ends the server_ready phase of the startup trace
+            on_ready=profiler.expect("server_ready"),
         )
+        with profiler.phase("server_launch"):
+            supervisor.start()
+        return supervisor
 
     def get_extra_config(self):
         return {self.LINK_TYPE_KEY: JUPYTER_TYPE_VALUE, self.PORT_KEY: str(self.port)}
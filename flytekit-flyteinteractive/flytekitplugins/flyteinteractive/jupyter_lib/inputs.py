@@ -0,0 +1,134 @@
+import mmap
+import os
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, Optional, Union
+
+from flyteidl.core import literals_pb2 as _literals_pb2
+from flytekitplugins.flyteinteractive.utils import load_module_from_path
+
+from flytekit.core import utils
+from flytekit.core.context_manager import FlyteContextManager
+from flytekit.core.type_engine import TypeEngine
+from flytekit.models import literals as _literal_models
+from flytekit.models.core.types import BlobType
+from flytekit.types.directory import FlyteDirectory
+from flytekit.types.file import FlyteFile
+from flytekit.types.structured import StructuredDataset
+
+from .jupyter_constants import WORKING_DIR_ENV
+
+
+class LazyTaskInputs(Mapping):
+    """
+    LazyTaskInputs gives access to the inputs of a task like get_task_inputs, but converts each input into its Python
+    value only when it is first accessed, either as an attribute (inputs.a) or as a key (inputs["a"]).
+    Nothing is read from disk until then, so creating it in a notebook costs nothing even for large inputs.
+
+    Blob and dataset inputs can also be opened without loading them into memory, see handle and mmap.
+
+    Args:
+        task_module_name (str): The name of the Python module containing the task function.
+        task_name (str): The name of the task function within the module.
+        context_working_dir (str, optional): The directory path where the input file and module file are located.
+            Defaults to the directory the jupyter decorator passes to the notebook kernel.
+    """
+
+    def __init__(self, task_module_name: str, task_name: str, context_working_dir: Optional[str] = None):
+        if context_working_dir is None:
+            context_working_dir = os.environ.get(WORKING_DIR_ENV)
+            if context_working_dir is None:
+                raise ValueError(f"context_working_dir is not given and {WORKING_DIR_ENV} is not set")
+        self._task_module_name = task_module_name
+        self._task_name = task_name
+        self._context_working_dir = context_working_dir
+        self._literals: Optional[Dict[str, _literal_models.Literal]] = None
+        self._python_types: Optional[Dict[str, type]] = None
+        self._values: Dict[str, Any] = {}
+
+    def _load(self):
+        if self._literals is not None:
+            return
+        local_inputs_file = os.path.join(self._context_working_dir, "inputs.pb")
+        input_proto = utils.load_proto_from_file(_literals_pb2.LiteralMap, local_inputs_file)
+        self._literals = _literal_models.LiteralMap.from_flyte_idl(input_proto).literals
+
+        task_module = load_module_from_path(
+            self._task_module_name, os.path.join(self._context_working_dir, f"{self._task_module_name}.py")
+        )
+        self._python_types = getattr(task_module, self._task_name).python_interface.inputs
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._values:
+            self._load()
+            if name not in self._literals:
+                raise KeyError(name)
+            self._values[name] = TypeEngine.to_python_value(
+                FlyteContextManager.current_context(), self._literals[name], self._python_types[name]
+            )
+        return self._values[name]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(f"Task {self._task_name} has no input {name}") from None
+
+    def __iter__(self) -> Iterator[str]:
+        self._load()
+        return iter(self._literals)
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._literals)
+
+    def __dir__(self):
+        return list(super().__dir__()) + list(self)
+
+    def __repr__(self) -> str:
+        loaded = ", ".join(self._values)
+        return f"LazyTaskInputs(task={self._task_name}, loaded=[{loaded}])"
+
+    def handle(self, name: str) -> Any:
+        """
+        Get an input without materializing its data.
+        Blob inputs are returned as FlyteFile or FlyteDirectory, which download only when opened, and dataset inputs as
+        StructuredDataset, which can be streamed with dataset.open(pd.DataFrame).iter(). Other inputs are returned as
+        their Python value.
+
+        Args:
+            name (str): The name of the input.
+        """
+        self._load()
+        if name not in self._literals:
+            raise KeyError(name)
+        scalar = self._literals[name].scalar
+        if scalar is not None and scalar.blob is not None:
+            if scalar.blob.metadata.type.dimensionality == BlobType.BlobDimensionality.MULTIPART:
+                handle_type = FlyteDirectory
+            else:
+                handle_type = FlyteFile
+        elif scalar is not None and scalar.structured_dataset is not None:
+            handle_type = StructuredDataset
+        else:
+            return self[name]
+        return TypeEngine.to_python_value(FlyteContextManager.current_context(), self._literals[name], handle_type)
+
+    def mmap(self, name: str) -> Union[mmap.mmap, memoryview]:
+        """
+        Memory-map a single file input. The file is downloaded once into the local cache, and pages are read from
+        disk on access, so the input is never fully copied into memory. An empty file, which cannot be mapped, gives
+        an empty memoryview.
+
+        Args:
+            name (str): The name of a file input.
+        """
+        file = self.handle(name)
+        if not isinstance(file, FlyteFile):
+            raise TypeError(f"Input {name} is not a file and cannot be memory-mapped")
+        local_path = file.download()
+        with open(local_path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return memoryview(b"")
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
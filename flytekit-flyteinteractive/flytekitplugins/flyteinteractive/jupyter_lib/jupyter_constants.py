@@ -1 +1,39 @@
 EXAMPLE_JUPYTER_NOTEBOOK_NAME = "flyteinteractive-notebook.ipynb"
+# Metadata key of the example notebook and its generated cells, used to detect changes across launches
+NOTEBOOK_METADATA_KEY = "flyteinteractive"
+# Environment variable passed to the notebook kernels with the directory of the task's inputs.pb, which changes on every
+# launch and is therefore not written into the example notebook
+WORKING_DIR_ENV = "FLYTE_INTERACTIVE_WORKING_DIR"
+
+# Maximum duration to wait for the Jupyter Notebook server to accept connections
+SERVER_READY_TIMEOUT_SECONDS = 300
+# Duration to pause between two readiness probes of the Jupyter Notebook server port
+SERVER_READY_CHECK_SECONDS = 0.5
+
+# Metric name prefix of the Prometheus metrics exposed by the jupyter decorator
+METRICS_PREFIX = "flyteinteractive_jupyter"
+# Duration to pause between two updates of the metrics JSON file
+METRICS_INTERVAL_SECONDS = 15
+# Maximum duration to wait for the status API of the Jupyter Notebook server
+SERVER_STATUS_TIMEOUT_SECONDS = 2
+# Duration to pause between two activity samples of the idle reaper
+REAPER_CHECK_SECONDS = 60
+
+# Number of consecutive crashes after which the supervisor gives up restarting the Jupyter Notebook server
+SUPERVISOR_MAX_RESTARTS = 5
+# Duration to pause before the first restart of a crashed server, doubled after every further crash
+SUPERVISOR_BACKOFF_SECONDS = 1
+SUPERVISOR_MAX_BACKOFF_SECONDS = 60
+# Duration to pause between two heartbeat requests to the status API of the server
+HEARTBEAT_INTERVAL_SECONDS = 30
+# Number of consecutive missed heartbeats after which a ready server is considered hung and restarted
+HEARTBEAT_MAX_MISSES = 4
+# Duration the server gets to shut its kernels down after SIGTERM before it is killed
+SERVER_STOP_TIMEOUT_SECONDS = 10
+# Maximum duration to read the remaining server output after it exited, since kernels it left behind may keep the
+# pipes open
+SERVER_OUTPUT_DRAIN_TIMEOUT_SECONDS = 5
+# Duration to pause between two checks whether the server process has exited
+SERVER_EXIT_CHECK_SECONDS = 0.1
+# Maximum length of a line of server output, longer lines are dropped
+SERVER_OUTPUT_LINE_LIMIT_BYTES = 1024 * 1024
@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from flytekit.loggers import logger
+
+from .jupyter_constants import METRICS_INTERVAL_SECONDS, METRICS_PREFIX, SERVER_STATUS_TIMEOUT_SECONDS
+
+if TYPE_CHECKING:
+    from .reaper import IdleReaper
+
+# Sysconf values used to convert /proc counters into seconds and bytes
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_METRIC_HELP = {
+    "server_up": ("gauge", "Whether the Jupyter Notebook server answers its status API."),
+    "server_ready_seconds": ("gauge", "Seconds from server launch until its port accepted connections."),
+    "kernels": ("gauge", "Number of live kernels."),
+    "connections": ("gauge", "Number of open client connections."),
+    "last_activity_timestamp_seconds": ("gauge", "Unix time of the last server or kernel activity."),
+    "idle_seconds_remaining": ("gauge", "Seconds left before the server is shut down for inactivity."),
+    "process_cpu_seconds_total": ("counter", "Total CPU seconds used by the server process tree."),
+    "process_resident_memory_bytes": ("gauge", "Resident memory of the server process tree in bytes."),
+}
+
+
+def get_process_tree(pid: int) -> List[int]:
+    """
+    Get the pid and the pids of all descendants of a process by scanning /proc.
+
+    Args:
+        pid (int): The pid of the root process.
+
+    Returns:
+        List[int]: The pids of the process tree, or an empty list if /proc is unavailable.
+    """
+    children: Dict[int, List[int]] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return []
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name is wrapped in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def get_process_tree_usage(pid: int) -> Tuple[float, int]:
+    """
+    Sum the CPU time and resident memory of a process and all its descendants.
+
+    Args:
+        pid (int): The pid of the root process.
+
+    Returns:
+        Tuple[float, int]: The total CPU seconds (user + system) and the total resident memory in bytes.
+    """
+    cpu_seconds, rss_bytes = 0.0, 0
+    for p in get_process_tree(pid):
+        try:
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        # utime and stime are the 14th and 15th fields of /proc/[pid]/stat, rss is the 24th
+        cpu_seconds += (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS
+        rss_bytes += int(fields[21]) * _PAGE_SIZE
+    return cpu_seconds, rss_bytes
+
+
+def get_server_status(port: int, timeout_seconds: float = SERVER_STATUS_TIMEOUT_SECONDS) -> Optional[dict]:
+    """
+    Query the status API of the Jupyter Notebook server.
+
+    Args:
+        port (int): The port the Jupyter Notebook server listens on.
+        timeout_seconds (float, optional): The duration in seconds to wait for the response.
+
+    Returns:
+        dict: The decoded /api/status response, or None if the server does not answer.
+    """
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/status", timeout=timeout_seconds) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """
+    Convert an ISO 8601 timestamp reported by the Jupyter API into Unix time.
+    """
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+class JupyterServerMonitor:
+    """
+    JupyterServerMonitor tracks readiness, activity and resource usage of a running Jupyter Notebook server.
+
+    Args:
+        port (int): The port the Jupyter Notebook server listens on.
+        max_idle_seconds (int, optional): The duration in seconds the server lives after no activity detected.
+        pid (int, optional): The pid of the child process running the server.
+    """
+
+    def __init__(self, port: int, max_idle_seconds: Optional[int] = None, pid: Optional[int] = None):
+        self.port = port
+        self.max_idle_seconds = max_idle_seconds
+        self.pid = pid
+        self.ready_seconds: Optional[float] = None
+        # When an idle reaper decides shutdown, the idle budget is measured from its last active time instead
+        self.reaper: Optional["IdleReaper"] = None
+
+    def collect(self) -> Dict[str, float]:
+        """
+        Take one sample of all metrics. Metrics that cannot be determined are left out.
+
+        Returns:
+            Dict[str, float]: The metric values keyed by metric name without prefix.
+        """
+        metrics: Dict[str, float] = {}
+        if self.ready_seconds is not None:
+            metrics["server_ready_seconds"] = self.ready_seconds
+
+        status = get_server_status(self.port)
+        metrics["server_up"] = 0 if status is None else 1
+        if status is not None:
+            metrics["kernels"] = status.get("kernels", 0)
+            metrics["connections"] = status.get("connections", 0)
+            last_activity = parse_timestamp(status.get("last_activity"))
+            if last_activity is not None:
+                metrics["last_activity_timestamp_seconds"] = last_activity
+            idle_since = self.reaper.last_active_time if self.reaper is not None else last_activity
+            if self.max_idle_seconds and idle_since is not None:
+                metrics["idle_seconds_remaining"] = max(0.0, self.max_idle_seconds - (time.time() - idle_since))
+
+        if self.pid is not None:
+            cpu_seconds, rss_bytes = get_process_tree_usage(self.pid)
+            metrics["process_cpu_seconds_total"] = cpu_seconds
+            metrics["process_resident_memory_bytes"] = rss_bytes
+        return metrics
+
+    def to_prometheus(self, metrics: Optional[Dict[str, float]] = None) -> str:
+        """
+        Render metrics in the Prometheus text exposition format.
+
+        Args:
+            metrics (Dict[str, float], optional): The metrics to render. Collects a new sample if not given.
+        """
+        if metrics is None:
+            metrics = self.collect()
+        lines = []
+        for name, value in metrics.items():
+            metric_type, help_text = _METRIC_HELP[name]
+            lines.append(f"# HELP {METRICS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {metric_type}")
+            lines.append(f"{METRICS_PREFIX}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_json(self, path: str, metrics: Optional[Dict[str, float]] = None):
+        """
+        Atomically write metrics as a JSON file, so readers never see a partially written file.
+
+        Args:
+            path (str): The local path of the JSON file.
+            metrics (Dict[str, float], optional): The metrics to write. Collects a new sample if not given.
+        """
+        if metrics is None:
+            metrics = self.collect()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump({"timestamp": time.time(), "port": self.port, **metrics}, file)
+        os.replace(tmp_path, path)
+
+
+class MetricsReporter:
+    """
+    MetricsReporter exposes the samples of a JupyterServerMonitor on a side port and/or in a JSON file.
+
+    Args:
+        monitor (JupyterServerMonitor): The monitor to sample metrics from.
+        port (int, optional): The port to serve Prometheus metrics on at /metrics.
+        path (str, optional): The local path of the JSON file to rewrite periodically.
+        interval_seconds (float, optional): The duration in seconds between two JSON file updates.
+    """
+
+    def __init__(
+        self,
+        monitor: JupyterServerMonitor,
+        port: Optional[int] = None,
+        path: Optional[str] = None,
+        interval_seconds: float = METRICS_INTERVAL_SECONDS,
+    ):
+        self.monitor = monitor
+        self.port = port
+        self.path = path
+        self.interval_seconds = interval_seconds
+        self._stop_event = threading.Event()
+        self._http_server: Optional[ThreadingHTTPServer] = None
+
+    def start(self):
+        if self.port is not None:
+            monitor = self.monitor
+
+            class _Handler(BaseHTTPRequestHandler):
+                def do_GET(self):
+                    if self.path.rstrip("/") != "/metrics":
+                        self.send_error(404)
+                        return
+                    body = monitor.to_prometheus().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):
+                    # Scrapes are frequent, keep them out of the task log
+                    pass
+
+            self._http_server = ThreadingHTTPServer(("0.0.0.0", self.port), _Handler)
+            threading.Thread(target=self._http_server.serve_forever, daemon=True).start()
+            logger.info(f"Serving Jupyter metrics on port {self.port} at /metrics")
+
+        if self.path is not None:
+            threading.Thread(target=self._write_loop, daemon=True).start()
+            logger.info(f"Writing Jupyter metrics to {self.path} every {self.interval_seconds} seconds")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._http_server is not None:
+            self._http_server.shutdown()
+            self._http_server.server_close()
+
+    def _write_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.monitor.write_json(self.path)
+            except OSError as e:
+                logger.warning(f"Failed to write Jupyter metrics to {self.path}: {e}")
+            self._stop_event.wait(self.interval_seconds)
@@ -0,0 +1,129 @@
+import json
+import subprocess
+import time
+import urllib.request
+from dataclasses import dataclass
+from typing import List, Optional
+
+from flytekit.loggers import logger
+
+from ..constants import EXIT_CODE_SUCCESS
+from .jupyter_constants import REAPER_CHECK_SECONDS, SERVER_STATUS_TIMEOUT_SECONDS
+from .metrics import get_process_tree_usage
+
+
+@dataclass
+class IdleReaperConfig:
+    """
+    IdleReaperConfig contains the thresholds the idle reaper uses to decide whether the Jupyter server is in use.
+    The server counts as active while any kernel is busy, or while the CPU or GPU usage is above its threshold.
+    Browser traffic alone does not count as activity.
+
+    Args:
+        cpu_threshold (float, optional): CPU usage of the server process tree, in cores, above which the server is active.
+        gpu_threshold (float, optional): GPU utilization in percent above which the server is active.
+        check_interval_seconds (float, optional): The duration in seconds between two samples.
+    """
+
+    cpu_threshold: float = 0.1
+    gpu_threshold: float = 5.0
+    check_interval_seconds: float = REAPER_CHECK_SECONDS
+
+
+def get_kernels(port: int, timeout_seconds: float = SERVER_STATUS_TIMEOUT_SECONDS) -> Optional[List[dict]]:
+    """
+    List the kernels of the Jupyter Notebook server, including their execution_state.
+
+    Returns:
+        List[dict]: The decoded /api/kernels response, or None if the server does not answer.
+    """
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/api/kernels", timeout=timeout_seconds) as response:
+            return json.loads(response.read())
+    except (OSError, ValueError):
+        return None
+
+
+def get_gpu_utilization() -> Optional[float]:
+    """
+    Get the highest utilization in percent over the GPUs visible to the container.
+
+    Returns:
+        float: The GPU utilization, or None if nvidia-smi is unavailable or reports no GPU.
+    """
+    try:
+        result = subprocess.run(
+            ["nvidia-smi", "--query-gpu=utilization.gpu", "--format=csv,noheader,nounits"],
+            capture_output=True,
+            text=True,
+            timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != EXIT_CODE_SUCCESS:
+        return None
+    values = []
+    for line in result.stdout.splitlines():
+        try:
+            values.append(float(line))
+        except ValueError:
+            continue
+    return max(values) if values else None
+
+
+class IdleReaper:
+    """
+    IdleReaper shuts the Jupyter Notebook server down once it has done no work for max_idle_seconds.
+
+    Args:
+        port (int): The port the Jupyter Notebook server listens on.
+        pid (int): The pid of the child process running the server.
+        max_idle_seconds (int): The duration in seconds to live after no activity detected.
+        config (IdleReaperConfig): The activity thresholds.
+    """
+
+    def __init__(self, port: int, pid: int, max_idle_seconds: int, config: IdleReaperConfig):
+        self.port = port
+        self.pid = pid
+        self.max_idle_seconds = max_idle_seconds
+        self.config = config
+        self.last_active_time = time.time()
+        self._last_cpu_sample: Optional[tuple] = None
+
+    def is_active(self) -> bool:
+        """
+        Take one sample and tell whether the server is doing work right now.
+        """
+        kernels = get_kernels(self.port) or []
+        busy_kernels = [k for k in kernels if k.get("execution_state") == "busy"]
+        if busy_kernels:
+            logger.debug(f"{len(busy_kernels)} kernels are busy")
+            return True
+
+        now = time.monotonic()
+        cpu_seconds, _ = get_process_tree_usage(self.pid)
+        previous, self._last_cpu_sample = self._last_cpu_sample, (now, cpu_seconds)
+        if previous is not None and now > previous[0]:
+            cpu_cores = (cpu_seconds - previous[1]) / (now - previous[0])
+            if cpu_cores > self.config.cpu_threshold:
+                logger.debug(f"Server process tree uses {cpu_cores:.2f} cores")
+                return True
+
+        gpu_utilization = get_gpu_utilization()
+        if gpu_utilization is not None and gpu_utilization > self.config.gpu_threshold:
+            logger.debug(f"GPU utilization is {gpu_utilization}%")
+            return True
+
+        return False
+
+    def check(self) -> bool:
+        """
+        Sample activity and update the last active time.
+
+        Returns:
+            bool: True if the server has been idle for longer than max_idle_seconds.
+        """
+        if self.is_active():
+            self.last_active_time = time.time()
+            return False
+        return time.time() - self.last_active_time > self.max_idle_seconds
@@ -0,0 +1,315 @@
+import asyncio
+import signal
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from flytekit.loggers import logger
+
+from ..constants import EXIT_CODE_SUCCESS
+from ..logs import LogMultiplexer
+from .jupyter_constants import (
+    HEARTBEAT_INTERVAL_SECONDS,
+    HEARTBEAT_MAX_MISSES,
+    SERVER_EXIT_CHECK_SECONDS,
+    SERVER_OUTPUT_DRAIN_TIMEOUT_SECONDS,
+    SERVER_OUTPUT_LINE_LIMIT_BYTES,
+    SERVER_READY_CHECK_SECONDS,
+    SERVER_READY_TIMEOUT_SECONDS,
+    SERVER_STOP_TIMEOUT_SECONDS,
+    SUPERVISOR_BACKOFF_SECONDS,
+    SUPERVISOR_MAX_BACKOFF_SECONDS,
+    SUPERVISOR_MAX_RESTARTS,
+)
+from .metrics import JupyterServerMonitor, get_server_status
+from .reaper import IdleReaper, IdleReaperConfig
+
+
+async def wait_for_server_ready(
+    port: int,
+    start_time: float,
+    timeout_seconds: float = SERVER_READY_TIMEOUT_SECONDS,
+    check_seconds: float = SERVER_READY_CHECK_SECONDS,
+) -> Optional[float]:
+    """
+    Probe the server port until it accepts TCP connections and log the time it took to become ready.
+
+    Args:
+        port (int): The port the Jupyter Notebook server listens on.
+        start_time (float): The time.monotonic() value recorded right before the server was launched.
+        timeout_seconds (float, optional): The duration in seconds to give up probing after.
+        check_seconds (float, optional): The duration in seconds to pause between two probes.
+
+    Returns:
+        float: The seconds from start_time until the port answered, or None if the server was not ready in time.
+    """
+    deadline = start_time + timeout_seconds
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), check_seconds)
+        except (OSError, asyncio.TimeoutError):
+            await asyncio.sleep(check_seconds)
+            continue
+        writer.close()
+        ready_seconds = time.monotonic() - start_time
+        logger.info(f"Jupyter Notebook server is ready on port {port} after {ready_seconds:.2f} seconds")
+        return ready_seconds
+
+    logger.warning(f"Jupyter Notebook server is not ready on port {port} after {timeout_seconds} seconds")
+    return None
+
+
+class JupyterServerSupervisor:
+    """
+    JupyterServerSupervisor runs the Jupyter Notebook server as a direct child process, driven by an asyncio event
+    loop in a background thread. While the server runs, the supervisor concurrently streams its output, probes its
+    readiness, sends heartbeats to its status API, decides the idle shutdown and handles SIGTERM and SIGINT.
+    A server that exits with an error or stops answering its heartbeats is restarted with exponential backoff.
+
+    Args:
+        cmd (List[str]): The command line of the server.
+        port (int): The port the Jupyter Notebook server listens on.
+        labels (Dict[str, str], optional): The fields added to every line of server output.
+        monitor (JupyterServerMonitor, optional): The monitor to record the pid and readiness of the server in.
+        max_idle_seconds (int, optional): The duration in seconds to live after no activity detected.
+        idle_reaper (IdleReaperConfig, optional): The activity thresholds of the idle shutdown. The idle shutdown is
+            left to the server itself if not set.
+        max_restarts (int, optional): The number of consecutive crashes after which the server is not restarted.
+        backoff_seconds (float, optional): The duration to pause before the first restart, doubled after every crash.
+        heartbeat_seconds (float, optional): The duration to pause between two heartbeats.
+        on_ready (Callable[[bool], None], optional): Called with whether the server became ready whenever a readiness
+            probe ends, e.g. StartupProfiler.expect().
+    """
+
+    def __init__(
+        self,
+        cmd: List[str],
+        port: int,
+        labels: Optional[Dict[str, str]] = None,
+        monitor: Optional[JupyterServerMonitor] = None,
+        max_idle_seconds: Optional[int] = None,
+        idle_reaper: Optional[IdleReaperConfig] = None,
+        max_restarts: int = SUPERVISOR_MAX_RESTARTS,
+        backoff_seconds: float = SUPERVISOR_BACKOFF_SECONDS,
+        heartbeat_seconds: float = HEARTBEAT_INTERVAL_SECONDS,
+        on_ready: Optional[Callable[[bool], None]] = None,
+    ):
+        self.cmd = cmd
+        self.port = port
+        self.labels = labels or {}
+        self.monitor = monitor
+        self.max_idle_seconds = max_idle_seconds
+        self.idle_reaper = idle_reaper
+        self.max_restarts = max_restarts
+        self.backoff_seconds = backoff_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.on_ready = on_ready
+        self.pid: Optional[int] = None
+        self.returncode: Optional[int] = None
+        self.restarts = 0
+        self.received_signal: Optional[int] = None
+        self._stop_requested = False
+        self._stopping: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._previous_handlers = {}
+
+    def start(self):
+        """
+        Launch the server in the background and return right away. Installs the signal handlers when called from
+        the main thread.
+        """
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGTERM, signal.SIGINT):
+                self._previous_handlers[signum] = signal.signal(signum, self._handle_signal)
+        self._thread = threading.Thread(target=asyncio.run, args=(self.run(),), daemon=True)
+        self._thread.start()
+
+    def wait(self) -> Optional[int]:
+        """
+        Block until the server is shut down for good and restore the signal handlers.
+
+        Returns:
+            int: The return code of the last server process, or None if the server could not be launched.
+        """
+        try:
+            self._thread.join()
+        finally:
+            for signum, handler in self._previous_handlers.items():
+                signal.signal(signum, handler)
+            self._previous_handlers = {}
+        return self.returncode
+
+    def stop(self, signum: Optional[int] = None):
+        """
+        Shut the server down without restarting it. Safe to call from any thread.
+
+        Args:
+            signum (int, optional): The signal that caused the shutdown.
+        """
+        if signum is not None:
+            self.received_signal = signum
+        self._stop_requested = True
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def _handle_signal(self, signum, frame):
+        logger.info(f"Received signal {signal.Signals(signum).name}, shutting down the Jupyter Notebook server")
+        self.stop(signum)
+
+    async def run(self):
+        """
+        Run the server until it exits successfully, is stopped or has crashed more than max_restarts times in a row.
+        """
+        self._stopping = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._stop_requested:
+            return
+
+        crashes = 0
+        while True:
+            try:
+                self.returncode, was_ready = await self._run_once()
+            except OSError as e:
+                logger.error(f"Failed to launch the Jupyter Notebook server: {e}")
+                return
+            if self._stop_requested or self.returncode == EXIT_CODE_SUCCESS:
+                return
+
+            # A server that became ready before it crashed starts the backoff over
+            crashes = 1 if was_ready else crashes + 1
+            if crashes > self.max_restarts:
+                logger.error(f"Jupyter Notebook server crashed {crashes} times in a row, giving up")
+                return
+            backoff = min(self.backoff_seconds * 2 ** (crashes - 1), SUPERVISOR_MAX_BACKOFF_SECONDS)
+            logger.warning(
+                f"Jupyter Notebook server exited with return code {self.returncode}, restarting in {backoff} seconds"
+            )
+            try:
+                await asyncio.wait_for(self._stopping.wait(), backoff)
+                return
+            except asyncio.TimeoutError:
+                self.restarts += 1
+
+    async def _run_once(self):
+        logger.info(f"cmd: {' '.join(self.cmd)}")
+        start_time = time.monotonic()
+        process = await asyncio.create_subprocess_exec(
+            *self.cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=SERVER_OUTPUT_LINE_LIMIT_BYTES,
+        )
+        self.pid = process.pid
+        if self.monitor is not None:
+            self.monitor.pid = process.pid
+            self.monitor.ready_seconds = None
+
+        multiplexer = LogMultiplexer(self.labels)
+        readers = [
+            asyncio.ensure_future(self._follow(multiplexer, "stdout", process.stdout)),
+            asyncio.ensure_future(self._follow(multiplexer, "stderr", process.stderr)),
+        ]
+        readiness = asyncio.ensure_future(self._watch_readiness(start_time))
+        watchers = [asyncio.ensure_future(self._watch_heartbeat(process, readiness))]
+        if self.idle_reaper is not None and self.max_idle_seconds:
+            watchers.append(asyncio.ensure_future(self._watch_idle(process)))
+
+        exited = asyncio.ensure_future(self._wait_exit(process))
+        stopping = asyncio.ensure_future(self._stopping.wait())
+        await asyncio.wait([exited, stopping], return_when=asyncio.FIRST_COMPLETED)
+        if not exited.done():
+            await self._terminate(process)
+        for task in [stopping, readiness, *watchers]:
+            task.cancel()
+        try:
+            await asyncio.wait_for(asyncio.gather(*readers), SERVER_OUTPUT_DRAIN_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Jupyter Notebook server output was not closed {SERVER_OUTPUT_DRAIN_TIMEOUT_SECONDS} seconds after exit"
+            )
+            # Close our ends of the pipes, which asyncio.subprocess.Process offers no public way to do
+            process._transport.close()
+        multiplexer.flush()
+
+        was_ready = readiness.done() and not readiness.cancelled() and readiness.result() is not None
+        return process.returncode, was_ready
+
+    @staticmethod
+    async def _wait_exit(process: asyncio.subprocess.Process) -> int:
+        """
+        Wait for the server process to exit. Unlike process.wait, this does not also wait for its output pipes to be
+        closed, which kernels left behind by the server may hold open.
+        """
+        while process.returncode is None:
+            await asyncio.sleep(SERVER_EXIT_CHECK_SECONDS)
+        return process.returncode
+
+    async def _follow(self, multiplexer: LogMultiplexer, stream: str, reader: asyncio.StreamReader):
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                multiplexer.emit("multiplexer", f"Dropped a {stream} line longer than {SERVER_OUTPUT_LINE_LIMIT_BYTES} bytes")
+                continue
+            if not line:
+                return
+            multiplexer.emit(stream, line.decode(errors="replace").rstrip("\n"))
+
+    async def _watch_readiness(self, start_time: float) -> Optional[float]:
+        ready_seconds = await wait_for_server_ready(self.port, start_time)
+        if self.monitor is not None:
+            self.monitor.ready_seconds = ready_seconds
+        if self.on_ready is not None:
+            self.on_ready(ready_seconds is not None)
+        return ready_seconds
+
+    async def _watch_heartbeat(self, process: asyncio.subprocess.Process, readiness: asyncio.Future):
+        """
+        Kill a ready server whose status API stopped answering, so the restart policy brings it back.
+        """
+        if await readiness is None:
+            return
+        loop = asyncio.get_running_loop()
+        misses = 0
+        while True:
+            await asyncio.sleep(self.heartbeat_seconds)
+            status = await loop.run_in_executor(None, get_server_status, self.port)
+            misses = 0 if status is not None else misses + 1
+            if misses >= HEARTBEAT_MAX_MISSES:
+                logger.warning(f"Jupyter Notebook server missed {misses} heartbeats, killing it")
+                process.kill()
+                return
+
+    async def _watch_idle(self, process: asyncio.subprocess.Process):
+        reaper = IdleReaper(
+            port=self.port,
+            pid=process.pid,
+            max_idle_seconds=self.max_idle_seconds,
+            config=self.idle_reaper,
+        )
+        if self.monitor is not None:
+            self.monitor.reaper = reaper
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.idle_reaper.check_interval_seconds)
+            if await loop.run_in_executor(None, reaper.check):
+                logger.info(
+                    f"Jupyter Notebook server did no work for more than {self.max_idle_seconds} seconds. Terminating..."
+                )
+                self.stop()
+                return
+
+    async def _terminate(self, process: asyncio.subprocess.Process):
+        """
+        Send SIGTERM so the server can shut its kernels down, and kill it if it does not exit in time.
+        """
+        if process.returncode is not None:
+            return
+        process.terminate()
+        try:
+            await asyncio.wait_for(self._wait_exit(process), SERVER_STOP_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.warning(f"Jupyter Notebook server did not exit {SERVER_STOP_TIMEOUT_SECONDS} seconds after SIGTERM")
+            process.kill()
+            await self._wait_exit(process)
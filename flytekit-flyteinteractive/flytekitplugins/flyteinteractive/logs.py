@@ -0,0 +1,116 @@
+import json
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import IO, Dict, Optional
+
+from .constants import (
+    LOG_DEDUP_MAX_MESSAGES,
+    LOG_DEDUP_WINDOW_SECONDS,
+    LOG_RATE_LIMIT_BURST,
+    LOG_RATE_LIMIT_LINES_PER_SECOND,
+)
+
+# Timestamps, numbers and hex ids differ between otherwise identical server messages
+_VOLATILE_PATTERN = re.compile(r"0x[0-9a-fA-F]+|[0-9a-fA-F]{8}-[0-9a-fA-F-]{27}|\d+")
+
+
+def normalize_message(message: str) -> str:
+    """
+    Reduce a log message to its pattern, so that repeats differing only in timestamps or ids compare equal.
+    """
+    return _VOLATILE_PATTERN.sub("#", message)
+
+
+class LogMultiplexer:
+    """
+    LogMultiplexer merges the output streams of a server process into structured JSON lines tagged with the server
+    type and port. Repeats of a message within the deduplication window are collapsed and counted, and lines beyond
+    the rate limit are dropped and counted, so idle servers do not flood the pod log with heartbeat messages.
+
+    Args:
+        labels (Dict[str, str]): The fields added to every line, e.g. the decorator's get_extra_config().
+        output (IO, optional): The stream to write the lines to. Defaults to sys.stdout.
+        dedup_window_seconds (float, optional): The duration in which repeats of a message are collapsed.
+        rate_limit (float, optional): The sustained number of lines per second to pass through.
+        burst (int, optional): The number of lines that may exceed the rate limit at once.
+    """
+
+    def __init__(
+        self,
+        labels: Dict[str, str],
+        output: Optional[IO] = None,
+        dedup_window_seconds: float = LOG_DEDUP_WINDOW_SECONDS,
+        rate_limit: float = LOG_RATE_LIMIT_LINES_PER_SECOND,
+        burst: int = LOG_RATE_LIMIT_BURST,
+    ):
+        self.labels = labels
+        self.output = output if output is not None else sys.stdout
+        self.dedup_window_seconds = dedup_window_seconds
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._dropped = 0
+        # pattern -> [time of the last emitted line, number of suppressed repeats since]
+        self._recent: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _take_token(self, now: float) -> bool:
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate_limit)
+        self._last_refill = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _write(self, stream: str, message: str, **fields):
+        record = {"ts": time.time(), **self.labels, "stream": stream, "message": message, **fields}
+        self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+    def emit(self, stream: str, message: str):
+        """
+        Pass one line of server output through deduplication and rate limiting.
+
+        Args:
+            stream (str): The name of the stream the line came from, e.g. stdout or stderr.
+            message (str): The line without its trailing newline.
+        """
+        now = time.monotonic()
+        pattern = normalize_message(message)
+        with self._lock:
+            recent = self._recent.get(pattern)
+            if recent is not None and now - recent[0] < self.dedup_window_seconds:
+                recent[1] += 1
+                return
+            if not self._take_token(now):
+                self._dropped += 1
+                return
+
+            fields = {}
+            if recent is not None and recent[1]:
+                fields["repeated"] = recent[1]
+            if self._dropped:
+                fields["dropped"] = self._dropped
+                self._dropped = 0
+            self._write(stream, message, **fields)
+
+            self._recent[pattern] = [now, 0]
+            self._recent.move_to_end(pattern)
+            if len(self._recent) > LOG_DEDUP_MAX_MESSAGES:
+                self._recent.popitem(last=False)
+
+    def flush(self):
+        """
+        Report the repeats and drops that have not been reported yet.
+        """
+        with self._lock:
+            repeated = sum(recent[1] for recent in self._recent.values())
+            if repeated or self._dropped:
+                self._write("multiplexer", "Suppressed log lines", repeated=repeated, dropped=self._dropped)
+            for recent in self._recent.values():
+                recent[1] = 0
+            self._dropped = 0
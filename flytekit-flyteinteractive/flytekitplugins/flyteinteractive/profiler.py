@@ -0,0 +1,224 @@
+import contextlib
+import cProfile
+import json
+import os
+import socket
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from flytekit.loggers import logger
+
+from .constants import DEFAULT_STARTUP_TRACE_PATH, STARTUP_READY_CHECK_SECONDS, STARTUP_READY_TIMEOUT_SECONDS
+
+
+@dataclass
+class StartupProfilerConfig:
+    """
+    StartupProfilerConfig enables the startup profiler of an interactive task, which times the phases between the start
+    of the task process and the server answering on its port.
+
+    Args:
+        trace_path (str, optional): The local path the JSON trace of the phases is written to.
+        cprofile_path (str, optional): The local path cProfile stats of the Python part of the startup are dumped to,
+            for example to be read with pstats or snakeviz. The startup is not profiled with cProfile if None.
+        ready_timeout_seconds (float, optional): The duration to wait for the server to answer before the trace is
+            written without the server_ready phase. The jupyter decorator relies on the readiness probe of its server
+            supervisor instead.
+    """
+
+    trace_path: str = DEFAULT_STARTUP_TRACE_PATH
+    cprofile_path: Optional[str] = None
+    ready_timeout_seconds: float = STARTUP_READY_TIMEOUT_SECONDS
+
+
+def process_started_at() -> Optional[float]:
+    """
+    Get the time the current process started, in seconds since the epoch.
+
+    Returns:
+        float: The start time, or None if /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # The fields after the command name, which may contain spaces, start with the state (field 3)
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as f:
+            boot_time = next(int(line.split()[1]) for line in f if line.startswith("btime"))
+        return boot_time + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return None
+
+
+class StartupProfiler:
+    """
+    StartupProfiler records the start and duration of the startup phases of an interactive task on the monotonic clock,
+    writes them to a JSON trace once the Python part of the startup has ended and the server answers on its port, and
+    logs a one-line summary. A profiler without a config records nothing, so the decorators can time their phases
+    unconditionally.
+
+    The trace starts with a "process" phase, from the start of the task process to the creation of the profiler,
+    which covers the imports and the flytekit entrypoint. The init containers run before the process, their duration
+    is the difference between process_started_at in the trace and the start of the pod.
+
+    Args:
+        config (StartupProfilerConfig, optional): The profiler config. The profiler is disabled if None.
+        labels (Dict[str, str], optional): The fields added to the trace, e.g. the decorator's get_extra_config().
+    """
+
+    def __init__(self, config: Optional[StartupProfilerConfig] = None, labels: Optional[Dict[str, str]] = None):
+        self.config = config
+        self.labels = labels or {}
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._phases: List[dict] = []
+        self._lock = threading.Lock()
+        self._finished = config is None
+        # The end of the Python part of the startup and the port watches the trace waits for
+        self._pending = 1
+        self._profile = None
+        if config is None:
+            return
+        process_start = process_started_at()
+        if process_start is not None and process_start <= self.started_at:
+            self._phases.append(
+                {"name": "process", "start": process_start - self.started_at, "seconds": self.started_at - process_start}
+            )
+        if config.cprofile_path:
+            # Profiles the thread creating the profiler, i.e. the task's main thread
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config is not None
+
+    @property
+    def phases(self) -> List[dict]:
+        with self._lock:
+            return list(self._phases)
+
+    def _record(self, name: str, start: float, end: float):
+        with self._lock:
+            self._phases.append({"name": name, "start": start - self._start, "seconds": end - start})
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        """
+        Time the body of the with statement as the phase name.
+        """
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self._record(name, start, time.monotonic())
+
+    def end_startup(self):
+        """
+        Mark the end of the Python part of the startup, and stop cProfile and dump its stats. Must be called from the
+        thread that created the profiler, after watch_port.
+        """
+        profile, self._profile = self._profile, None
+        if profile is not None:
+            profile.disable()
+            try:
+                profile.dump_stats(self.config.cprofile_path)
+            except OSError as e:
+                logger.warning(f"Failed to write the startup cProfile stats to {self.config.cprofile_path}: {e}")
+        self._complete()
+
+    def _complete(self):
+        with self._lock:
+            self._pending -= 1
+            done = self._pending == 0
+        if done:
+            self.finish()
+
+    def expect(self, phase: str = "server_ready") -> Callable[[bool], None]:
+        """
+        Time the phase from now until the returned function is called, for a readiness probe that runs elsewhere.
+        The function takes whether the server became ready, and only its first call counts.
+        """
+        if not self.enabled:
+            return lambda ready: None
+        start = time.monotonic()
+        with self._lock:
+            self._pending += 1
+        called = threading.Event()
+
+        def _done(ready: bool):
+            with self._lock:
+                if called.is_set():
+                    return
+                called.set()
+            if ready:
+                self._record(phase, start, time.monotonic())
+            self._complete()
+
+        return _done
+
+    def watch_port(self, port: int, phase: str = "server_ready"):
+        """
+        Time the phase from now until the port accepts connections in a background thread.
+        """
+        if not self.enabled:
+            return
+        done = self.expect(phase)
+        deadline = time.monotonic() + self.config.ready_timeout_seconds
+
+        def _watch():
+            while time.monotonic() < deadline and not self._finished:
+                try:
+                    socket.create_connection(("127.0.0.1", port), timeout=STARTUP_READY_CHECK_SECONDS).close()
+                except OSError:
+                    time.sleep(STARTUP_READY_CHECK_SECONDS)
+                    continue
+                done(True)
+                return
+            done(False)
+
+        threading.Thread(target=_watch, name="flyteinteractive-startup-profiler", daemon=True).start()
+
+    def finish(self) -> Optional[dict]:
+        """
+        Write the trace and log its summary, once. Called when the startup has ended and the server answers, or when
+        the task ends before that.
+
+        Returns:
+            dict: The trace, or None if the profiler is disabled or has already finished.
+        """
+        with self._lock:
+            if self._finished:
+                return None
+            self._finished = True
+            phases = sorted(self._phases, key=lambda p: p["start"])
+
+        total_seconds = max((p["start"] + p["seconds"] for p in phases), default=0.0) - min(
+            (p["start"] for p in phases), default=0.0
+        )
+        trace = {
+            "labels": self.labels,
+            "started_at": self.started_at,
+            "process_started_at": process_started_at(),
+            "total_seconds": total_seconds,
+            "phases": phases,
+        }
+        try:
+            os.makedirs(os.path.dirname(self.config.trace_path) or ".", exist_ok=True)
+            tmp_path = f"{self.config.trace_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(trace, f, indent=2)
+            os.replace(tmp_path, self.config.trace_path)
+        except OSError as e:
+            logger.warning(f"Failed to write the startup trace to {self.config.trace_path}: {e}")
+
+        summary = ", ".join(f"{p['name']} {p['seconds']:.2f}s" for p in phases)
+        slowest = max(phases, key=lambda p: p["seconds"], default=None)
+        logger.info(
+            f"Startup took {total_seconds:.2f}s: {summary or 'no phases'}"
+            + (f"; slowest phase is {slowest['name']}" if slowest else "")
+            + f". Trace written to {self.config.trace_path}"
+        )
+        return trace
@@ -0,0 +1,206 @@
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Optional
+
+import fsspec
+
+from flytekit.loggers import logger
+
+from .vscode_constants import CACHE_CHUNK_BYTES, CACHE_DIR_ENV, CACHE_MAX_BYTES_ENV, DEFAULT_CACHE_MAX_BYTES
+
+
+def _url_key(url: str) -> str:
+    return hashlib.sha256(url.encode()).hexdigest()
+
+
+def file_sha256(path: str) -> str:
+    """
+    Compute the SHA-256 digest of a local file.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CACHE_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadCache:
+    """
+    DownloadCache is a node-local, content-addressed cache of downloaded files, meant to live on a hostPath or PVC
+    directory shared by all pods of a node, so only the first pod downloads the code-server tarball and extensions.
+
+    Layout of the cache directory:
+        objects/<sha256>         The file contents, named by their SHA-256 digest.
+        index/<sha256(url)>.json The digest, size and file name each URL resolved to.
+        locks/                   Lock files serializing the population of a URL, and the eviction with the placement
+                                 of objects into target directories.
+
+    Args:
+        cache_dir (str): The cache directory.
+        max_bytes (int, optional): The total size of cached objects above which the least recently used are evicted.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.objects_dir = os.path.join(cache_dir, "objects")
+        self.index_dir = os.path.join(cache_dir, "index")
+        self.locks_dir = os.path.join(cache_dir, "locks")
+        for d in (self.objects_dir, self.index_dir, self.locks_dir):
+            os.makedirs(d, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["DownloadCache"]:
+        """
+        Create the cache configured by the FLYTEINTERACTIVE_CACHE_DIR and FLYTEINTERACTIVE_CACHE_MAX_BYTES environment
+        variables, or return None if no cache directory is configured.
+        """
+        cache_dir = os.getenv(CACHE_DIR_ENV)
+        if not cache_dir:
+            return None
+        return cls(cache_dir, int(os.getenv(CACHE_MAX_BYTES_ENV, DEFAULT_CACHE_MAX_BYTES)))
+
+    @contextlib.contextmanager
+    def _lock(self, name: str):
+        with open(os.path.join(self.locks_dir, f"{name}.lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lookup(self, url: str) -> Optional[str]:
+        """
+        Return the path of the cached object for a URL if it is present and intact.
+        """
+        index_path = os.path.join(self.index_dir, f"{_url_key(url)}.json")
+        try:
+            with open(index_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        object_path = os.path.join(self.objects_dir, entry["sha256"])
+        try:
+            if os.path.getsize(object_path) == entry["size"] and file_sha256(object_path) == entry["sha256"]:
+                return object_path
+        except OSError:
+            return None
+
+        logger.warning(f"Cached object for {url} is corrupted, downloading it again")
+        with contextlib.suppress(OSError):
+            os.remove(object_path)
+        return None
+
+    def _place(self, object_path: str, local_file_name: str):
+        """
+        Link or copy a cached object to local_file_name and mark it as recently used. Must be called while holding
+        the eviction lock, so the object cannot be evicted halfway.
+        """
+        # The modification time of an object records its last use for LRU eviction
+        os.utime(object_path)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(local_file_name)
+        try:
+            os.link(object_path, local_file_name)
+        except OSError:
+            shutil.copyfile(object_path, local_file_name)
+
+    def _populate(self, url: str, local_file_name: str):
+        fs = fsspec.filesystem("http")
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.objects_dir, prefix=".download-")
+        try:
+            with os.fdopen(fd, "wb") as out, fs.open(url, "rb", block_size=CACHE_CHUNK_BYTES) as remote:
+                for chunk in iter(lambda: remote.read(CACHE_CHUNK_BYTES), b""):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+            object_path = os.path.join(self.objects_dir, digest.hexdigest())
+            with self._lock("evict"):
+                os.replace(tmp_path, object_path)
+                self._place(object_path, local_file_name)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+
+        entry = {"url": url, "sha256": digest.hexdigest(), "size": size}
+        index_path = os.path.join(self.index_dir, f"{_url_key(url)}.json")
+        with open(f"{index_path}.tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(f"{index_path}.tmp", index_path)
+
+    def get(self, url: str, target_dir: str) -> str:
+        """
+        Place the file behind a URL into target_dir, downloading it only if the cache does not hold it yet.
+        Concurrent callers for the same URL wait for the first one instead of downloading in parallel.
+
+        Args:
+            url (str): The http/https URL of the file.
+            target_dir (str): The directory the file is placed in, named after the last segment of the URL.
+
+        Returns:
+            str: The path to the file in target_dir.
+        """
+        local_file_name = os.path.join(target_dir, os.path.basename(url))
+        with self._lock(_url_key(url)):
+            object_path = self._lookup(url)
+            if object_path is not None:
+                try:
+                    with self._lock("evict"):
+                        self._place(object_path, local_file_name)
+                    logger.info(f"Cache hit for {url}")
+                except FileNotFoundError:
+                    # Another pod evicted the object since the lookup
+                    object_path = None
+            if object_path is None:
+                logger.info(f"Cache miss, downloading {url} into {self.cache_dir}")
+                self._populate(url, local_file_name)
+
+        self.evict()
+        return local_file_name
+
+    def evict(self):
+        """
+        Remove the least recently used objects until the cache fits into max_bytes.
+        """
+        with self._lock("evict"):
+            objects = []
+            for name in os.listdir(self.objects_dir):
+                if name.startswith("."):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.objects_dir, name))
+                except FileNotFoundError:
+                    continue
+                objects.append((stat.st_mtime, stat.st_size, name))
+
+            total = sum(size for _, size, _ in objects)
+            for _, size, name in sorted(objects):
+                if total <= self.max_bytes:
+                    break
+                logger.info(f"Evicting {name} from {self.cache_dir}")
+                with contextlib.suppress(OSError):
+                    os.remove(os.path.join(self.objects_dir, name))
+                total -= size
+
+            # Index entries of evicted or corrupted objects would otherwise pile up, one per URL ever fetched
+            for name in os.listdir(self.index_dir):
+                if not name.endswith(".json"):
+                    continue
+                index_path = os.path.join(self.index_dir, name)
+                try:
+                    with open(index_path) as f:
+                        object_name = json.load(f)["sha256"]
+                except (OSError, ValueError, KeyError):
+                    object_name = None
+                if object_name is None or not os.path.exists(os.path.join(self.objects_dir, object_name)):
+                    with contextlib.suppress(OSError):
+                        os.remove(index_path)
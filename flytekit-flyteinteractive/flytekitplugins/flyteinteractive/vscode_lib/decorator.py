@@ -1,3 +1,9 @@
+import contextlib
+import os
+import shutil
+import tarfile
+from typing import Callable, Iterator, List, Optional
+
 # This file has been moved to flytekit.interactive.vscode_lib.decorator
 # Import flytekit.interactive module to keep backwards compatibility
 from flytekit.interactive.vscode_lib.decorator import (  # noqa: F401
@@ -11,5 +17,153 @@ from flytekit.interactive.vscode_lib.decorator import (  # noqa: F401
     prepare_interactive_python,
     prepare_launch_json,
     prepare_resume_task_python,
-    vscode,
 )
+from flytekit.interactive.vscode_lib import decorator as _decorator
+from flytekit.interactive.vscode_lib.decorator import vscode as _vscode
+
+import flytekit
+from flytekit.core.context_manager import FlyteContextManager
+
+from ..profiler import StartupProfiler, StartupProfilerConfig
+from .cache import DownloadCache
+from .config import VscodeConfig
+from .extensions import install_extensions
+from .layout import PrebakedLayout, load_layout
+from .vscode_constants import DOWNLOAD_DIR, EXECUTABLE_NAME
+
+
+def use_prebaked_layout(layout: PrebakedLayout) -> List[str]:
+    """
+    Put the code-server of a prebaked image on $PATH.
+
+    Returns:
+        List[str]: The installed extensions recorded in the layout, to be extended with extensions installed later.
+    """
+    if layout.code_server_bin_dir not in os.environ["PATH"].split(os.pathsep):
+        os.environ["PATH"] = layout.code_server_bin_dir + os.pathsep + os.environ["PATH"]
+    return list(layout.extensions)
+
+
+@contextlib.contextmanager
+def installed_extensions_override(get_extensions: Callable[[], Optional[List[str]]]) -> Iterator[None]:
+    """
+    Let the next call of download_vscode within the block take the installed extensions from get_extensions instead
+    of running code-server --list-extensions. download_vscode of flytekit.interactive looks get_installed_extensions
+    up in its module, so it is replaced there for that one call and restored right after, or when the block exits.
+
+    Args:
+        get_extensions (Callable[[], Optional[List[str]]]): Returns the installed extensions, or None to list them
+            with code-server. Called when download_vscode asks, i.e. after pre_execute has run.
+    """
+    original = _decorator.get_installed_extensions
+
+    def get_installed_extensions_once() -> List[str]:
+        _decorator.get_installed_extensions = original
+        extensions = get_extensions()
+        return original() if extensions is None else list(extensions)
+
+    _decorator.get_installed_extensions = get_installed_extensions_once
+    try:
+        yield
+    finally:
+        _decorator.get_installed_extensions = original
+
+
+def prefetch_vscode(config: VscodeConfig, cache: Optional[DownloadCache] = None) -> Optional[List[str]]:
+    """
+    Download vscode server and extensions, optionally through a node-local cache, and install them.
+    Extensions are downloaded in parallel and installed as soon as each download finishes.
+    Once this has run, download_vscode finds the server and extensions in place and skips downloading them.
+    In a prebaked image, the server and the installed extensions are taken from the recorded layout.
+
+    Args:
+        config (VscodeConfig): VSCode config contains default URLs of the VSCode server and extension remote paths.
+        cache (DownloadCache, optional): The node-local download cache.
+
+    Returns:
+        Optional[List[str]]: In a prebaked image, the installed extensions, for download_vscode to use through
+            installed_extensions_override. None otherwise, download_vscode then lists them itself.
+    """
+    logger = flytekit.current_context().logging
+
+    layout = load_layout()
+    if layout is not None:
+        logger.info(f"Using prebaked code-server at {layout.code_server_bin_dir}")
+        installed_extensions = use_prebaked_layout(layout)
+    elif shutil.which(EXECUTABLE_NAME) is None:
+        code_server_bin_dir = os.path.join(DOWNLOAD_DIR, get_code_server_info(config.code_server_dir_names), "bin")
+        if os.path.isdir(code_server_bin_dir):
+            # Left by an earlier task on the node, e.g. on a warm node
+            logger.info(f"Using code server downloaded before at {code_server_bin_dir}")
+        else:
+            logger.info("Code server is not in $PATH, start downloading code server...")
+            os.makedirs(DOWNLOAD_DIR, exist_ok=True)
+            code_server_remote_path = get_code_server_info(config.code_server_remote_paths)
+            if cache is not None:
+                code_server_tar_path = cache.get(code_server_remote_path, DOWNLOAD_DIR)
+            else:
+                code_server_tar_path = download_file(code_server_remote_path, DOWNLOAD_DIR)
+            with tarfile.open(code_server_tar_path, "r:gz") as tar:
+                tar.extractall(path=DOWNLOAD_DIR)
+        os.environ["PATH"] = code_server_bin_dir + os.pathsep + os.environ["PATH"]
+
+    if layout is None:
+        installed_extensions = get_installed_extensions()
+    missing_extensions = [
+        extension
+        for extension in config.extension_remote_paths
+        if not is_extension_installed(extension, installed_extensions)
+    ]
+    results = install_extensions(missing_extensions, target_dir=str(DOWNLOAD_DIR), cache=cache)
+    if layout is None:
+        return None
+    # is_extension_installed matches an installed extension against the URL, so the URL itself matches
+    installed_extensions.extend(result.extension for result in results if not result.error)
+    return installed_extensions
+
+
+class vscode(_vscode):
+    """
+    vscode decorator of flytekit.interactive, which fetches code-server and installs its extensions in parallel.
+    The downloads go through the node-local download cache when the FLYTEINTERACTIVE_CACHE_DIR environment variable
+    points to a cache directory. See flytekit.interactive.vscode for the other arguments.
+
+    Args:
+        startup_profiler (StartupProfilerConfig, optional): Times the startup phases until the server answers,
+            writes them to a JSON trace and logs a summary.
+    """
+
+    def __init__(self, task_function=None, startup_profiler: Optional[StartupProfilerConfig] = None, **kwargs):
+        super().__init__(task_function, **kwargs)
+        # flytekit.interactive does not know the argument, keep it for the instance created when decorating
+        self.decorator_kwargs["startup_profiler"] = startup_profiler
+        self.startup_profiler = startup_profiler
+        self._profiler = StartupProfiler()
+        # The installed extensions of a prebaked image, set by prefetch_vscode for download_vscode
+        self._installed_extensions: Optional[List[str]] = None
+        pre_execute = self._pre_execute
+
+        # Runs right before download_vscode, which then finds everything in place
+        def pre_execute_with_prefetch():
+            profiler = self._profiler
+            if pre_execute is not None:
+                with profiler.phase("pre_execute"):
+                    pre_execute()
+            with profiler.phase("prefetch"):
+                self._installed_extensions = prefetch_vscode(self._config, DownloadCache.from_env())
+            # The server launch and the preparation of the debugging scripts follow in flytekit.interactive
+            profiler.watch_port(self.port)
+            profiler.end_startup()
+
+        self._pre_execute = pre_execute_with_prefetch
+
+    def execute(self, *args, **kwargs):
+        ctx = FlyteContextManager.current_context()
+        if self.enable and not ctx.execution_state.is_local_execution():
+            self._profiler = StartupProfiler(self.startup_profiler, self.get_extra_config())
+        self._installed_extensions = None
+        try:
+            with installed_extensions_override(lambda: self._installed_extensions):
+                return super().execute(*args, **kwargs)
+        finally:
+            self._profiler.finish()
@@ -0,0 +1,126 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Optional
+
+from flytekit.interactive.vscode_lib.decorator import download_file
+from flytekit.loggers import logger
+
+from ..utils import execute_command
+from .cache import DownloadCache
+from .vscode_constants import DEFAULT_CODE_SERVER_EXTENSIONS, DOWNLOAD_DIR, EXTENSION_DOWNLOAD_WORKERS
+
+
+@dataclass
+class ExtensionInstallResult:
+    """
+    ExtensionInstallResult records the outcome and timing of installing one extension.
+
+    Args:
+        extension (str): The URL or local path of the .vsix file.
+        path (str, optional): The local path the extension was installed from.
+        download_seconds (float): The duration of the download.
+        install_seconds (float): The duration of code-server --install-extension.
+        error (str, optional): The error message if downloading or installing failed.
+    """
+
+    extension: str
+    path: Optional[str] = None
+    download_seconds: float = 0.0
+    install_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def _fetch_extension(extension: str, target_dir: str, cache: Optional[DownloadCache]) -> ExtensionInstallResult:
+    start_time = time.monotonic()
+    if not extension.startswith("http"):
+        # A local .vsix file, e.g. downloaded by a Dockerfile step
+        return ExtensionInstallResult(extension=extension, path=extension)
+    path = cache.get(extension, target_dir) if cache is not None else download_file(extension, target_dir)
+    return ExtensionInstallResult(extension=extension, path=path, download_seconds=time.monotonic() - start_time)
+
+
+def install_extensions(
+    extensions: List[str],
+    target_dir: str = str(DOWNLOAD_DIR),
+    max_workers: int = EXTENSION_DOWNLOAD_WORKERS,
+    cache: Optional[DownloadCache] = None,
+) -> List[ExtensionInstallResult]:
+    """
+    Download extensions concurrently and install each one as soon as its download has finished.
+    Downloads run on a bounded thread pool, while installations run one at a time, since concurrent
+    code-server --install-extension calls race on the extensions manifest.
+
+    Args:
+        extensions (List[str]): The URLs or local paths of the .vsix files.
+        target_dir (str, optional): The directory the extensions are downloaded to.
+        max_workers (int, optional): The maximum number of concurrent downloads.
+        cache (DownloadCache, optional): The node-local download cache to fetch the extensions through.
+
+    Returns:
+        List[ExtensionInstallResult]: The outcome of each extension, in the order the extensions were given.
+    """
+    if not extensions:
+        return []
+    os.makedirs(target_dir, exist_ok=True)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(_fetch_extension, e, target_dir, cache): e for e in extensions}
+        for future in as_completed(futures):
+            extension = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"Failed to download extension {extension}: {e}")
+                results[extension] = ExtensionInstallResult(extension=extension, error=str(e))
+                continue
+
+            start_time = time.monotonic()
+            try:
+                execute_command(f"code-server --install-extension {result.path}")
+            except RuntimeError as e:
+                logger.error(f"Failed to install extension {result.path}: {e}")
+                result.error = str(e)
+            result.install_seconds = time.monotonic() - start_time
+            logger.info(
+                f"Extension {os.path.basename(result.path)}: download {result.download_seconds:.2f}s, "
+                f"install {result.install_seconds:.2f}s"
+            )
+            results[extension] = result
+
+    return [results[e] for e in extensions]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Install extensions from the command line, e.g. in a Dockerfile:
+        python -m flytekitplugins.flyteinteractive.vscode_lib.extensions --target-dir /tmp/code-server URL_OR_PATH...
+    """
+    parser = argparse.ArgumentParser(description="Download and install code-server extensions in parallel.")
+    parser.add_argument("extensions", nargs="*", help="URLs or local paths of .vsix files. Defaults to the default extensions.")
+    parser.add_argument("--target-dir", default=str(DOWNLOAD_DIR), help="Directory to download the extensions to.")
+    parser.add_argument("--workers", type=int, default=EXTENSION_DOWNLOAD_WORKERS, help="Maximum concurrent downloads.")
+    args = parser.parse_args(argv)
+
+    start_time = time.monotonic()
+    results = install_extensions(
+        args.extensions or DEFAULT_CODE_SERVER_EXTENSIONS,
+        target_dir=args.target_dir,
+        max_workers=args.workers,
+        cache=DownloadCache.from_env(),
+    )
+    for result in results:
+        status = "FAILED" if result.error else "OK"
+        print(
+            f"{status:6} {result.extension} download={result.download_seconds:.2f}s install={result.install_seconds:.2f}s"
+        )
+    print(f"Installed {len(results)} extensions in {time.monotonic() - start_time:.2f}s")
+    return 1 if any(result.error for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional
+
+from flytekit.loggers import logger
+
+from .vscode_constants import DEFAULT_LAYOUT_PATH, EXECUTABLE_NAME, LAYOUT_PATH_ENV
+
+
+def _extensions_dir() -> str:
+    # code-server's default, which depends on the HOME of the user running it
+    return os.path.join(os.path.expanduser("~"), ".local", "share", "code-server", "extensions")
+
+
+@dataclass
+class PrebakedLayout:
+    """
+    PrebakedLayout records what a prebaked image installed at build time, so that the vscode decorator neither looks
+    for code-server nor runs code-server --list-extensions when a pod starts.
+
+    Args:
+        code_server_bin_dir (str): The directory of the code-server executable.
+        extensions_dir (str): The extensions directory of the user the extensions were installed for.
+        extensions (List[str]): The installed extensions, as listed by code-server --list-extensions.
+        python_version (str): The Python version site-packages were byte-compiled with, empty if they were not.
+        created (float): The time the layout was recorded, in seconds since the epoch.
+    """
+
+    code_server_bin_dir: str
+    extensions_dir: str
+    extensions: List[str] = field(default_factory=list)
+    python_version: str = ""
+    created: float = 0.0
+
+    def is_usable(self) -> bool:
+        """
+        Whether the layout still describes this container, i.e. code-server is in place and the pod runs as the user
+        the extensions were installed for.
+        """
+        return (
+            os.path.isfile(os.path.join(self.code_server_bin_dir, EXECUTABLE_NAME))
+            and self.extensions_dir == _extensions_dir()
+            and os.path.isdir(self.extensions_dir)
+        )
+
+
+def layout_path() -> str:
+    return os.getenv(LAYOUT_PATH_ENV, DEFAULT_LAYOUT_PATH)
+
+
+def load_layout(path: Optional[str] = None) -> Optional[PrebakedLayout]:
+    """
+    Load the layout recorded in the image, or return None if there is none or it does not describe this container.
+    """
+    path = path or layout_path()
+    try:
+        with open(path) as f:
+            layout = PrebakedLayout(**json.load(f))
+    except FileNotFoundError:
+        return None
+    except (OSError, TypeError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable prebaked layout {path}: {e}")
+        return None
+    if not layout.is_usable():
+        logger.info(f"Ignoring prebaked layout {path}, which does not match this container")
+        return None
+    return layout
+
+
+def record_layout(path: Optional[str] = None, compiled: bool = False) -> PrebakedLayout:
+    """
+    Record the code-server executable and installed extensions of the current user, run at the end of an image build.
+
+    Args:
+        path (str, optional): The file to write the layout to.
+        compiled (bool, optional): Whether site-packages were byte-compiled.
+
+    Raises:
+        RuntimeError: If code-server is not in $PATH or cannot list its extensions.
+    """
+    path = path or layout_path()
+    executable_path = shutil.which(EXECUTABLE_NAME)
+    if executable_path is None:
+        raise RuntimeError("Code server is not in $PATH, install it before recording the layout")
+    listed = subprocess.run([executable_path, "--list-extensions"], capture_output=True, text=True)
+    if listed.returncode != 0:
+        raise RuntimeError(f"Command code-server --list-extensions failed with error: {listed.stderr}")
+
+    layout = PrebakedLayout(
+        code_server_bin_dir=os.path.dirname(os.path.realpath(executable_path)),
+        extensions_dir=_extensions_dir(),
+        extensions=listed.stdout.split(),
+        python_version=platform.python_version() if compiled else "",
+        created=time.time(),
+    )
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(asdict(layout), f, indent=2)
+    os.replace(tmp_path, path)
+    return layout
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Record the layout from the command line, as the runtime user in a Dockerfile:
+        python -m flytekitplugins.flyteinteractive.vscode_lib.layout --compiled
+    """
+    parser = argparse.ArgumentParser(description="Record the code-server layout of a prebaked image.")
+    parser.add_argument("--output", default=None, help=f"The layout file. Defaults to ${LAYOUT_PATH_ENV} or {DEFAULT_LAYOUT_PATH}.")
+    parser.add_argument("--compiled", action="store_true", help="Site-packages were byte-compiled.")
+    args = parser.parse_args(argv)
+
+    try:
+        layout = record_layout(args.output, compiled=args.compiled)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Recorded code-server at {layout.code_server_bin_dir} with extensions {', '.join(layout.extensions) or 'none'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
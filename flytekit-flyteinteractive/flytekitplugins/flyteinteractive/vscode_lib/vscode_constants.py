@@ -16,3 +16,16 @@ from flytekit.interactive.vscode_lib.vscode_constants import (  # noqa: F401
     VSCODE_PORT_KEY,
     VSCODE_TYPE_KEY,
 )
+
+# Node-local download cache for code-server and its extensions, shared by the pods of a node
+CACHE_DIR_ENV = "FLYTEINTERACTIVE_CACHE_DIR"
+CACHE_MAX_BYTES_ENV = "FLYTEINTERACTIVE_CACHE_MAX_BYTES"
+DEFAULT_CACHE_MAX_BYTES = 2 * 1024**3  # 2 GiB
+CACHE_CHUNK_BYTES = 1024**2  # 1 MiB
+
+# Maximum number of extensions downloaded concurrently
+EXTENSION_DOWNLOAD_WORKERS = 4
+
+# Layout recorded by a prebaked image, which lets the decorator skip looking for code-server and its extensions
+LAYOUT_PATH_ENV = "FLYTEINTERACTIVE_LAYOUT"
+DEFAULT_LAYOUT_PATH = "/etc/flyteinteractive/layout.json"
@@ -1,8 +1,17 @@
+import asyncio
+import json
+import os
+import socket
+import time
 from collections import OrderedDict
 
 import mock
+import nbformat as nbf
 import pytest
-from flytekitplugins.flyteinteractive import jupyter
+from flytekitplugins.flyteinteractive import StartupProfilerConfig, jupyter
+from flytekitplugins.flyteinteractive.jupyter_lib.decorator import write_example_notebook
+from flytekitplugins.flyteinteractive.jupyter_lib.jupyter_constants import EXAMPLE_JUPYTER_NOTEBOOK_NAME
+from flytekitplugins.flyteinteractive.jupyter_lib.supervisor import wait_for_server_ready
 
 from flytekit import task, workflow
 from flytekit.configuration import Image, ImageConfig, SerializationSettings
@@ -24,16 +33,18 @@ def mock_remote_execution():
 
 @pytest.fixture
 def jupyter_patches():
-    with mock.patch("multiprocessing.Process") as mock_process, mock.patch(
+    with mock.patch(
+        "flytekitplugins.flyteinteractive.jupyter_lib.decorator.JupyterServerSupervisor"
+    ) as mock_supervisor, mock.patch(
         "flytekitplugins.flyteinteractive.jupyter_lib.decorator.write_example_notebook"
     ) as mock_write_example_notebook, mock.patch(
         "flytekitplugins.flyteinteractive.jupyter_lib.decorator.exit_handler"
     ) as mock_exit_handler:
-        yield (mock_process, mock_write_example_notebook, mock_exit_handler)
+        yield (mock_supervisor, mock_write_example_notebook, mock_exit_handler)
 
 
 def test_jupyter_remote_execution(jupyter_patches, mock_remote_execution):
-    (mock_process, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
+    (mock_supervisor, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
 
     @task
     @jupyter
@@ -45,13 +56,13 @@ def test_jupyter_remote_execution(jupyter_patches, mock_remote_execution):
         t()
 
     wf()
-    mock_process.assert_called_once()
+    mock_supervisor.return_value.start.assert_called_once()
     mock_write_example_notebook.assert_called_once()
     mock_exit_handler.assert_called_once()
 
 
 def test_jupyter_remote_execution_but_disable(jupyter_patches, mock_remote_execution):
-    (mock_process, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
+    (mock_supervisor, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
 
     @task
     @jupyter(enable=False)
@@ -63,13 +74,13 @@ def test_jupyter_remote_execution_but_disable(jupyter_patches, mock_remote_execu
         t()
 
     wf()
-    mock_process.assert_not_called()
+    mock_supervisor.assert_not_called()
     mock_write_example_notebook.assert_not_called()
     mock_exit_handler.assert_not_called()
 
 
 def test_jupyter_local_execution(jupyter_patches, mock_local_execution):
-    (mock_process, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
+    (mock_supervisor, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
 
     @task
     @jupyter
@@ -81,7 +92,7 @@ def test_jupyter_local_execution(jupyter_patches, mock_local_execution):
         t()
 
     wf()
-    mock_process.assert_not_called()
+    mock_supervisor.assert_not_called()
     mock_write_example_notebook.assert_not_called()
     mock_exit_handler.assert_not_called()
 
@@ -102,7 +113,7 @@ def test_jupyter_run_task_first_succeed(mock_remote_execution):
 
 
 def test_jupyter_run_task_first_fail(jupyter_patches, mock_remote_execution):
-    (mock_process, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
+    (mock_supervisor, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
 
     @task
     @jupyter(run_task_first=True)
@@ -115,11 +126,94 @@ def test_jupyter_run_task_first_fail(jupyter_patches, mock_remote_execution):
         t(a=a, b=b)
 
     wf(a=10, b=0)
-    mock_process.assert_called_once()
+    mock_supervisor.return_value.start.assert_called_once()
     mock_write_example_notebook.assert_called_once()
     mock_exit_handler.assert_called_once()
 
 
+def test_jupyter_prefork(jupyter_patches, mock_remote_execution):
+    (mock_supervisor, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
+    calls = []
+    mock_supervisor.return_value.start.side_effect = lambda: calls.append("start_server")
+
+    @task
+    @jupyter(prefork=True, pre_execute=lambda: calls.append("pre_execute"))
+    def t():
+        return
+
+    @workflow
+    def wf():
+        t()
+
+    wf()
+    assert calls == ["start_server", "pre_execute"]
+    mock_write_example_notebook.assert_called_once()
+    mock_exit_handler.assert_called_once()
+
+
+def test_jupyter_prefork_stops_server_if_pre_execute_fails(jupyter_patches, mock_remote_execution):
+    (mock_supervisor, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
+
+    def pre_execute():
+        raise RuntimeError("pre_execute failed")
+
+    @task
+    @jupyter(prefork=True, pre_execute=pre_execute)
+    def t():
+        return
+
+    with pytest.raises(Exception, match="pre_execute failed"):
+        t()
+    mock_supervisor.return_value.stop.assert_called_once()
+    mock_supervisor.return_value.wait.assert_called_once()
+    mock_exit_handler.assert_not_called()
+
+
+def test_jupyter_startup_profiler(jupyter_patches, mock_remote_execution, tmp_path):
+    (mock_supervisor, mock_write_example_notebook, mock_exit_handler) = jupyter_patches
+    trace_path = tmp_path / "trace.json"
+
+    @task
+    @jupyter(
+        pre_execute=lambda: None,
+        startup_profiler=StartupProfilerConfig(trace_path=str(trace_path), ready_timeout_seconds=0),
+    )
+    def t():
+        return
+
+    @workflow
+    def wf():
+        t()
+
+    wf()
+    trace = json.loads(trace_path.read_text())
+    assert [p["name"] for p in trace["phases"] if p["name"] != "process"] == [
+        "pre_execute",
+        "server_launch",
+        "example_notebook",
+    ]
+    assert trace["labels"]["link_type"] == "jupyter"
+
+
+def test_wait_for_server_ready():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        port = server.getsockname()[1]
+        ready_seconds = asyncio.run(wait_for_server_ready(port, start_time=time.monotonic(), timeout_seconds=5))
+    assert ready_seconds is not None and ready_seconds < 5
+
+
+def test_wait_for_server_ready_timeout():
+    with socket.socket() as unused:
+        unused.bind(("127.0.0.1", 0))
+        port = unused.getsockname()[1]
+    ready_seconds = asyncio.run(
+        wait_for_server_ready(port, start_time=time.monotonic(), timeout_seconds=0.2, check_seconds=0.05)
+    )
+    assert ready_seconds is None
+
+
 def test_jupyter_extra_config(mock_remote_execution):
     @jupyter(
         max_idle_seconds=100,
@@ -157,3 +251,60 @@ def test_serialize_vscode(mock_remote_execution):
 
     serialized_task = get_serializable_task(OrderedDict(), default_serialization_settings, t)
     assert serialized_task.template.config == {"link_type": "jupyter", "port": "8889"}
+
+
+def example_task_v1():
+    return 1
+
+
+def example_task_v2():
+    return 2
+
+
+def test_write_example_notebook(tmp_path):
+    write_example_notebook(example_task_v1, str(tmp_path))
+    nb = nbf.read(str(tmp_path / EXAMPLE_JUPYTER_NOTEBOOK_NAME), as_version=4)
+    assert [c.cell_type for c in nb.cells] == ["markdown", "code", "code", "code", "markdown"]
+    assert "return 1" in nb.cells[2].source
+    assert nb.cells[3].source == "example_task_v1()"
+    assert os.listdir(tmp_path) == [EXAMPLE_JUPYTER_NOTEBOOK_NAME]
+
+
+def test_write_example_notebook_skips_unchanged(tmp_path):
+    write_example_notebook(example_task_v1, str(tmp_path))
+    with mock.patch("os.replace") as mock_replace:
+        write_example_notebook(example_task_v1, str(tmp_path))
+    mock_replace.assert_not_called()
+
+
+def test_write_example_notebook_merges_user_edits(tmp_path):
+    notebook_path = str(tmp_path / EXAMPLE_JUPYTER_NOTEBOOK_NAME)
+    write_example_notebook(example_task_v1, str(tmp_path))
+    nb = nbf.read(notebook_path, as_version=4)
+    nb.cells[2].source = "# my edit"
+    nb.cells.append(nbf.v4.new_code_cell("my_cell = 1"))
+    nbf.write(nb, notebook_path)
+
+    write_example_notebook(example_task_v2, str(tmp_path))
+    sources = [c.source for c in nbf.read(notebook_path, as_version=4).cells]
+    # The edited task cell is kept next to the new task source, the unedited call cell is updated in place.
+    assert "# my edit" in sources
+    assert sources[sources.index("# my edit") + 1].endswith("return 2\n")
+    assert "example_task_v2()" in sources
+    assert "example_task_v1()" not in sources
+    assert "my_cell = 1" in sources
+
+
+def test_write_example_notebook_with_inputs(tmp_path):
+    notebook_path = str(tmp_path / EXAMPLE_JUPYTER_NOTEBOOK_NAME)
+    write_example_notebook(example_task_v1, str(tmp_path), with_inputs=True)
+    nb = nbf.read(notebook_path, as_version=4)
+    sources = [c.source for c in nb.cells]
+    assert any("LazyTaskInputs(" in source and "context_working_dir" not in source for source in sources)
+    assert "example_task_v1(**inputs)" in sources
+
+    # The working directory changes on every launch but is not part of the cells, so the notebook is left untouched
+    mtime = os.path.getmtime(notebook_path)
+    os.utime(notebook_path, (mtime - 10, mtime - 10))
+    write_example_notebook(example_task_v1, str(tmp_path), with_inputs=True)
+    assert os.path.getmtime(notebook_path) == mtime - 10
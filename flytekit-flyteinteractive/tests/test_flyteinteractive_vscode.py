@@ -1,3 +1,4 @@
+import json
 from collections import OrderedDict
 
 import mock
@@ -15,6 +16,7 @@ from flytekitplugins.flyteinteractive import (
     DEFAULT_CODE_SERVER_REMOTE_PATHS,
     VIM_CONFIG,
     VIM_EXTENSION,
+    StartupProfilerConfig,
     VscodeConfig,
     vscode,
 )
@@ -62,7 +64,9 @@ def vscode_patches():
         "flytekit.interactive.vscode_lib.decorator.prepare_resume_task_python"
     ) as mock_prepare_resume_task_python, mock.patch(
         "flytekit.interactive.vscode_lib.decorator.prepare_launch_json"
-    ) as mock_prepare_launch_json:
+    ) as mock_prepare_launch_json, mock.patch(
+        "flytekitplugins.flyteinteractive.vscode_lib.decorator.prefetch_vscode"
+    ) as mock_prefetch_vscode:
         yield (
             mock_process,
             mock_prepare_interactive_python,
@@ -71,6 +75,7 @@ def vscode_patches():
             mock_signal,
             mock_prepare_resume_task_python,
             mock_prepare_launch_json,
+            mock_prefetch_vscode,
         )
 
 
@@ -83,6 +88,7 @@ def test_vscode_remote_execution(vscode_patches, mock_remote_execution):
         mock_signal,
         mock_prepare_resume_task_python,
         mock_prepare_launch_json,
+        mock_prefetch_vscode,
     ) = vscode_patches
 
     @task
@@ -96,6 +102,7 @@ def test_vscode_remote_execution(vscode_patches, mock_remote_execution):
 
     wf()
     mock_download_vscode.assert_called_once()
+    mock_prefetch_vscode.assert_called_once()
     mock_process.assert_called_once()
     mock_exit_handler.assert_called_once()
     mock_prepare_interactive_python.assert_called_once()
@@ -103,6 +110,47 @@ def test_vscode_remote_execution(vscode_patches, mock_remote_execution):
     mock_prepare_launch_json.assert_called_once()
 
 
+def test_vscode_passes_prebaked_extensions_to_download(vscode_patches, mock_remote_execution):
+    from flytekit.interactive.vscode_lib import decorator as upstream_decorator
+
+    mock_download_vscode = vscode_patches[3]
+    mock_prefetch_vscode = vscode_patches[7]
+    mock_prefetch_vscode.return_value = ["ms-python.python"]
+    original = upstream_decorator.get_installed_extensions
+    seen = []
+    mock_download_vscode.side_effect = lambda config: seen.append(upstream_decorator.get_installed_extensions())
+
+    @task
+    @vscode
+    def t():
+        return
+
+    t()
+    assert seen == [["ms-python.python"]]
+    assert upstream_decorator.get_installed_extensions is original
+
+
+def test_vscode_startup_profiler(vscode_patches, mock_remote_execution, tmp_path):
+    trace_path = tmp_path / "trace.json"
+
+    @task
+    @vscode(
+        pre_execute=lambda: None,
+        startup_profiler=StartupProfilerConfig(trace_path=str(trace_path), ready_timeout_seconds=0),
+    )
+    def t():
+        return
+
+    @workflow
+    def wf():
+        t()
+
+    wf()
+    trace = json.loads(trace_path.read_text())
+    assert [p["name"] for p in trace["phases"] if p["name"] != "process"] == ["pre_execute", "prefetch"]
+    assert trace["labels"]["link_type"] == "vscode"
+
+
 def test_vscode_remote_execution_but_disable(vscode_patches, mock_remote_execution):
     (
         mock_process,
@@ -112,6 +160,7 @@ def test_vscode_remote_execution_but_disable(vscode_patches, mock_remote_executi
         mock_signal,
         mock_prepare_resume_task_python,
         mock_prepare_launch_json,
+        mock_prefetch_vscode,
     ) = vscode_patches
 
     @task
@@ -125,6 +174,7 @@ def test_vscode_remote_execution_but_disable(vscode_patches, mock_remote_executi
 
     wf()
     mock_download_vscode.assert_not_called()
+    mock_prefetch_vscode.assert_not_called()
     mock_process.assert_not_called()
     mock_exit_handler.assert_not_called()
     mock_prepare_interactive_python.assert_not_called()
@@ -142,6 +192,7 @@ def test_vscode_local_execution(vscode_patches, mock_local_execution):
         mock_signal,
         mock_prepare_resume_task_python,
         mock_prepare_launch_json,
+        mock_prefetch_vscode,
     ) = vscode_patches
 
     @task
@@ -155,6 +206,7 @@ def test_vscode_local_execution(vscode_patches, mock_local_execution):
 
     wf()
     mock_download_vscode.assert_not_called()
+    mock_prefetch_vscode.assert_not_called()
     mock_process.assert_not_called()
     mock_exit_handler.assert_not_called()
     mock_prepare_interactive_python.assert_not_called()
@@ -187,6 +239,7 @@ def test_vscode_run_task_first_fail(vscode_patches, mock_remote_execution):
         mock_signal,
         mock_prepare_resume_task_python,
         mock_prepare_launch_json,
+        mock_prefetch_vscode,
     ) = vscode_patches
 
     @task
@@ -201,6 +254,7 @@ def test_vscode_run_task_first_fail(vscode_patches, mock_remote_execution):
 
     wf(a=10, b=0)
     mock_download_vscode.assert_called_once()
+    mock_prefetch_vscode.assert_called_once()
     mock_process.assert_called_once()
     mock_exit_handler.assert_called_once()
     mock_prepare_interactive_python.assert_called_once()
@@ -273,6 +327,7 @@ def test_vscode_with_args(vscode_patches, mock_remote_execution):
         mock_signal,
         mock_prepare_resume_task_python,
         mock_prepare_launch_json,
+        mock_prefetch_vscode,
     ) = vscode_patches
 
     @task
@@ -287,6 +342,7 @@ def test_vscode_with_args(vscode_patches, mock_remote_execution):
     wf()
 
     mock_download_vscode.assert_called_once()
+    mock_prefetch_vscode.assert_called_once()
     mock_process.assert_called_once()
     mock_exit_handler.assert_called_once()
     mock_prepare_interactive_python.assert_called_once()
@@ -416,6 +472,7 @@ def test_vscode_with_dynamic(vscode_patches):
         mock_signal,
         mock_prepare_resume_task_python,
         mock_prepare_launch_json,
+        mock_prefetch_vscode,
     ) = vscode_patches
 
     mock_exit_handler.return_value = None
@@ -0,0 +1,55 @@
+import json
+import subprocess
+import sys
+
+import flytekitplugins.flyteinteractive as flyteinteractive
+import pytest
+
+IMPORT_BENCHMARK = """
+import json, sys, time
+start = time.perf_counter()
+import flytekitplugins.flyteinteractive as flyteinteractive
+import_seconds = time.perf_counter() - start
+start = time.perf_counter()
+getattr(flyteinteractive, "{attribute}")
+access_seconds = time.perf_counter() - start
+print(json.dumps({{
+    "import_seconds": import_seconds,
+    "access_seconds": access_seconds,
+    "modules": [m for m in ("flytekit", "nbformat") if m in sys.modules],
+}}))
+"""
+
+
+def run_import_benchmark(attribute: str) -> dict:
+    # A fresh interpreter, so that modules imported by other tests do not hide the import cost
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_BENCHMARK.format(attribute=attribute)], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output)
+
+
+def test_vscode_does_not_import_jupyter():
+    result = run_import_benchmark("vscode")
+    assert result["modules"] == ["flytekit"]
+    # The cost of importing flytekit moves from the package import to the first access
+    assert result["import_seconds"] < result["access_seconds"]
+
+
+def test_jupyter_imports_nbformat():
+    result = run_import_benchmark("jupyter")
+    assert result["modules"] == ["flytekit", "nbformat"]
+    assert result["import_seconds"] < result["access_seconds"]
+
+
+def test_package_import_is_lazy():
+    result = run_import_benchmark("__name__")
+    assert result["modules"] == []
+
+
+def test_lazy_attributes():
+    assert set(flyteinteractive.__all__) <= set(dir(flyteinteractive))
+    for name in flyteinteractive.__all__:
+        assert getattr(flyteinteractive, name) is not None
+    with pytest.raises(AttributeError):
+        flyteinteractive.does_not_exist
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from flytekitplugins.flyteinteractive.jupyter_lib.metrics import (
+    JupyterServerMonitor,
+    MetricsReporter,
+    get_process_tree,
+    get_process_tree_usage,
+    parse_timestamp,
+)
+
+LAST_ACTIVITY = "2024-01-01T00:00:00.000000Z"
+
+
+@pytest.fixture
+def jupyter_status_server():
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps({"kernels": 2, "connections": 1, "last_activity": LAST_ACTIVITY}).encode()
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_process_tree_usage():
+    assert os.getpid() in get_process_tree(os.getpid())
+    cpu_seconds, rss_bytes = get_process_tree_usage(os.getpid())
+    assert cpu_seconds > 0
+    assert rss_bytes > 0
+
+
+def test_parse_timestamp():
+    assert parse_timestamp(LAST_ACTIVITY) == 1704067200.0
+    assert parse_timestamp(None) is None
+    assert parse_timestamp("not a timestamp") is None
+
+
+def test_monitor_collect(jupyter_status_server):
+    monitor = JupyterServerMonitor(port=jupyter_status_server, max_idle_seconds=10, pid=os.getpid())
+    monitor.ready_seconds = 1.5
+    metrics = monitor.collect()
+    assert metrics["server_up"] == 1
+    assert metrics["server_ready_seconds"] == 1.5
+    assert metrics["kernels"] == 2
+    assert metrics["connections"] == 1
+    assert metrics["last_activity_timestamp_seconds"] == 1704067200.0
+    assert metrics["idle_seconds_remaining"] == 0
+    assert metrics["process_resident_memory_bytes"] > 0
+
+    text = monitor.to_prometheus(metrics)
+    assert "# TYPE flyteinteractive_jupyter_process_cpu_seconds_total counter" in text
+    assert "flyteinteractive_jupyter_kernels 2" in text
+
+
+def test_monitor_server_down():
+    monitor = JupyterServerMonitor(port=1)
+    assert monitor.collect() == {"server_up": 0}
+
+
+def test_monitor_write_json(tmp_path):
+    path = str(tmp_path / "metrics.json")
+    JupyterServerMonitor(port=8888).write_json(path, {"server_up": 0})
+    with open(path) as f:
+        data = json.load(f)
+    assert data["port"] == 8888
+    assert data["server_up"] == 0
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_metrics_reporter(jupyter_status_server, tmp_path):
+    path = str(tmp_path / "metrics.json")
+    reporter = MetricsReporter(JupyterServerMonitor(port=jupyter_status_server), port=0, path=path)
+    reporter.start()
+    try:
+        metrics_port = reporter._http_server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{metrics_port}/metrics", timeout=5) as response:
+            assert "flyteinteractive_jupyter_server_up 1" in response.read().decode()
+        deadline = time.monotonic() + 5
+        while not os.path.exists(path) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert os.path.exists(path)
+    finally:
+        reporter.stop()
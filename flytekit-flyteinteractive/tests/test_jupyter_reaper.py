@@ -0,0 +1,81 @@
+import time
+
+import mock
+import pytest
+from flytekitplugins.flyteinteractive import IdleReaperConfig, jupyter
+from flytekitplugins.flyteinteractive.jupyter_lib.reaper import IdleReaper
+
+from flytekit import task, workflow
+from flytekit.core.context_manager import ExecutionState
+
+
+@pytest.fixture
+def reaper_patches():
+    with mock.patch("flytekitplugins.flyteinteractive.jupyter_lib.reaper.get_kernels") as mock_get_kernels, mock.patch(
+        "flytekitplugins.flyteinteractive.jupyter_lib.reaper.get_process_tree_usage"
+    ) as mock_get_usage, mock.patch(
+        "flytekitplugins.flyteinteractive.jupyter_lib.reaper.get_gpu_utilization"
+    ) as mock_get_gpu:
+        mock_get_kernels.return_value = [{"execution_state": "idle"}]
+        mock_get_usage.return_value = (0.0, 0)
+        mock_get_gpu.return_value = None
+        yield mock_get_kernels, mock_get_usage, mock_get_gpu
+
+
+def test_reaper_busy_kernel_is_active(reaper_patches):
+    mock_get_kernels, _, _ = reaper_patches
+    mock_get_kernels.return_value = [{"execution_state": "idle"}, {"execution_state": "busy"}]
+    reaper = IdleReaper(port=8888, pid=1, max_idle_seconds=0, config=IdleReaperConfig())
+    assert reaper.is_active()
+    assert not reaper.check()
+
+
+def test_reaper_cpu_is_active(reaper_patches):
+    _, mock_get_usage, _ = reaper_patches
+    reaper = IdleReaper(port=8888, pid=1, max_idle_seconds=0, config=IdleReaperConfig(cpu_threshold=0.5))
+    mock_get_usage.return_value = (0.0, 0)
+    assert not reaper.is_active()
+    # One CPU second within a few milliseconds is far above half a core
+    time.sleep(0.01)
+    mock_get_usage.return_value = (1.0, 0)
+    assert reaper.is_active()
+
+
+def test_reaper_gpu_is_active(reaper_patches):
+    _, _, mock_get_gpu = reaper_patches
+    mock_get_gpu.return_value = 80.0
+    reaper = IdleReaper(port=8888, pid=1, max_idle_seconds=0, config=IdleReaperConfig(gpu_threshold=10))
+    assert reaper.is_active()
+
+
+def test_reaper_idle_timeout(reaper_patches):
+    reaper = IdleReaper(port=8888, pid=1, max_idle_seconds=60, config=IdleReaperConfig())
+    assert not reaper.check()
+    reaper.last_active_time -= 120
+    assert reaper.check()
+
+
+def test_jupyter_idle_reaper_replaces_shutdown_timeout():
+    with mock.patch.object(ExecutionState, "is_local_execution", return_value=False), mock.patch(
+        "flytekitplugins.flyteinteractive.jupyter_lib.decorator.JupyterServerSupervisor"
+    ) as mock_supervisor, mock.patch(
+        "flytekitplugins.flyteinteractive.jupyter_lib.decorator.write_example_notebook"
+    ), mock.patch(
+        "flytekitplugins.flyteinteractive.jupyter_lib.decorator.exit_handler"
+    ):
+
+        @task
+        @jupyter(max_idle_seconds=100, idle_reaper=IdleReaperConfig())
+        def t():
+            return
+
+        @workflow
+        def wf():
+            t()
+
+        wf()
+        kwargs = mock_supervisor.call_args.kwargs
+        assert not any("shutdown_no_activity_timeout" in arg for arg in kwargs["cmd"])
+        assert kwargs["idle_reaper"] == IdleReaperConfig()
+        mock_supervisor.return_value.start.assert_called_once()
+        mock_supervisor.return_value.stop.assert_called_once()
@@ -0,0 +1,96 @@
+import signal
+import socket
+import sys
+import time
+
+import mock
+import pytest
+from flytekitplugins.flyteinteractive import IdleReaperConfig
+from flytekitplugins.flyteinteractive.jupyter_lib.decorator import exit_handler
+from flytekitplugins.flyteinteractive.jupyter_lib.metrics import JupyterServerMonitor
+from flytekitplugins.flyteinteractive.jupyter_lib.supervisor import JupyterServerSupervisor
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_supervisor_streams_output_and_exits(capsys):
+    monitor = JupyterServerMonitor(port=0)
+    supervisor = JupyterServerSupervisor(_python("print('hello')"), port=0, labels={"port": "0"}, monitor=monitor)
+    supervisor.start()
+    assert supervisor.wait() == 0
+    assert supervisor.restarts == 0
+    assert monitor.pid == supervisor.pid
+    assert '"message": "hello"' in capsys.readouterr().out
+
+
+def test_supervisor_reports_readiness():
+    ready = []
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = _python(f"import socket, time; s = socket.socket(); s.bind(('127.0.0.1', {port})); s.listen(); time.sleep(30)")
+    supervisor = JupyterServerSupervisor(server, port=port, on_ready=ready.append)
+    supervisor.start()
+    deadline = time.monotonic() + 10
+    while not ready and time.monotonic() < deadline:
+        time.sleep(0.1)
+    supervisor.stop()
+    supervisor.wait()
+    assert ready == [True]
+
+
+def test_supervisor_restarts_crashed_server_with_backoff():
+    supervisor = JupyterServerSupervisor(
+        _python("import sys; sys.exit(3)"), port=0, max_restarts=2, backoff_seconds=0.01
+    )
+    supervisor.start()
+    assert supervisor.wait() == 3
+    assert supervisor.restarts == 2
+
+
+def test_supervisor_stop_terminates_server():
+    supervisor = JupyterServerSupervisor(_python("import time; time.sleep(30)"), port=0)
+    supervisor.start()
+    time.sleep(0.5)
+    start_time = time.monotonic()
+    supervisor.stop()
+    assert supervisor.wait() == -signal.SIGTERM
+    assert time.monotonic() - start_time < 5
+    assert supervisor.restarts == 0
+
+
+def test_supervisor_does_not_wait_for_leftover_output():
+    # The orphaned sleep keeps the output pipes open after the server exits
+    supervisor = JupyterServerSupervisor(
+        _python("import subprocess; subprocess.Popen(['sleep', '30'])"), port=0, max_restarts=0
+    )
+    start_time = time.monotonic()
+    with mock.patch("flytekitplugins.flyteinteractive.jupyter_lib.supervisor.SERVER_OUTPUT_DRAIN_TIMEOUT_SECONDS", 0.5):
+        supervisor.start()
+        assert supervisor.wait() == 0
+    assert time.monotonic() - start_time < 10
+
+
+def test_supervisor_idle_shutdown():
+    with mock.patch("flytekitplugins.flyteinteractive.jupyter_lib.supervisor.IdleReaper") as mock_reaper:
+        mock_reaper.return_value.check.return_value = True
+        supervisor = JupyterServerSupervisor(
+            _python("import time; time.sleep(30)"),
+            port=0,
+            max_idle_seconds=60,
+            idle_reaper=IdleReaperConfig(check_interval_seconds=0.01),
+        )
+        supervisor.start()
+        assert supervisor.wait() == -signal.SIGTERM
+    assert supervisor.received_signal is None
+
+
+def test_exit_handler_does_not_resume_after_signal():
+    supervisor = mock.Mock(received_signal=signal.SIGTERM)
+    task_function = mock.Mock()
+    with pytest.raises(SystemExit) as e:
+        exit_handler(supervisor, task_function, args=(), kwargs={})
+    assert e.value.code == 128 + signal.SIGTERM
+    task_function.assert_not_called()
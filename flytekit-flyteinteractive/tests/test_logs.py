@@ -0,0 +1,57 @@
+import io
+import json
+
+import mock
+from flytekitplugins.flyteinteractive.logs import LogMultiplexer, normalize_message
+
+LABELS = {"link_type": "jupyter", "port": "8888"}
+
+
+def read_records(output: io.StringIO):
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_normalize_message():
+    assert normalize_message("[I 2024-01-01 12:00:01.123 ServerApp] Kernel 1f2e3d4c-aaaa-bbbb-cccc-0123456789ab") == (
+        "[I #-#-# #:#:#.# ServerApp] Kernel #"
+    )
+
+
+def test_multiplexer_tags_lines():
+    output = io.StringIO()
+    LogMultiplexer(LABELS, output=output).emit("stderr", "Serving notebooks")
+    (record,) = read_records(output)
+    assert record["link_type"] == "jupyter"
+    assert record["port"] == "8888"
+    assert record["stream"] == "stderr"
+    assert record["message"] == "Serving notebooks"
+
+
+def test_multiplexer_deduplicates():
+    output = io.StringIO()
+    with mock.patch("time.monotonic") as mock_monotonic:
+        mock_monotonic.return_value = 100.0
+        multiplexer = LogMultiplexer(LABELS, output=output, dedup_window_seconds=60)
+        for i in range(5):
+            multiplexer.emit("stderr", f"[I 12:00:0{i}] heartbeat")
+        multiplexer.emit("stderr", "other message")
+        mock_monotonic.return_value = 200.0
+        multiplexer.emit("stderr", "[I 12:01:40] heartbeat")
+
+    records = read_records(output)
+    assert [r["message"] for r in records] == ["[I 12:00:00] heartbeat", "other message", "[I 12:01:40] heartbeat"]
+    assert records[2]["repeated"] == 4
+
+
+def test_multiplexer_rate_limits():
+    output = io.StringIO()
+    with mock.patch("time.monotonic", return_value=100.0):
+        multiplexer = LogMultiplexer(LABELS, output=output, rate_limit=1, burst=3)
+        for i in "abcdef":
+            multiplexer.emit("stdout", i)
+    multiplexer.flush()
+
+    records = read_records(output)
+    assert [r["message"] for r in records] == ["a", "b", "c", "Suppressed log lines"]
+    assert records[-1]["dropped"] == 3
+
@@ -0,0 +1,86 @@
+import json
+import pstats
+import socket
+import time
+
+from flytekitplugins.flyteinteractive import StartupProfilerConfig
+from flytekitplugins.flyteinteractive.profiler import StartupProfiler, process_started_at
+
+
+def test_startup_profiler_writes_trace(tmp_path):
+    trace_path = tmp_path / "trace.json"
+    profiler = StartupProfiler(StartupProfilerConfig(trace_path=str(trace_path)), labels={"link_type": "jupyter"})
+    with profiler.phase("pre_execute"):
+        time.sleep(0.05)
+    with profiler.phase("example_notebook"):
+        pass
+
+    trace = profiler.finish()
+    assert profiler.finish() is None
+    assert json.loads(trace_path.read_text()) == trace
+    assert trace["labels"] == {"link_type": "jupyter"}
+    names = [p["name"] for p in trace["phases"]]
+    assert names[-2:] == ["pre_execute", "example_notebook"]
+    pre_execute = trace["phases"][names.index("pre_execute")]
+    assert pre_execute["seconds"] >= 0.05
+    assert trace["total_seconds"] >= pre_execute["seconds"]
+
+
+def test_startup_profiler_watch_port(tmp_path):
+    trace_path = tmp_path / "trace.json"
+    profiler = StartupProfiler(StartupProfilerConfig(trace_path=str(trace_path)))
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        port = server.getsockname()[1]
+        profiler.watch_port(port)
+        profiler.end_startup()
+        time.sleep(0.1)
+        assert not trace_path.exists()
+        server.listen()
+        for _ in range(50):
+            if trace_path.exists():
+                break
+            time.sleep(0.1)
+
+    trace = json.loads(trace_path.read_text())
+    assert trace["phases"][-1]["name"] == "server_ready"
+    assert trace["phases"][-1]["seconds"] >= 0.1
+
+
+def test_startup_profiler_cprofile(tmp_path):
+    cprofile_path = tmp_path / "startup.prof"
+    profiler = StartupProfiler(
+        StartupProfilerConfig(trace_path=str(tmp_path / "trace.json"), cprofile_path=str(cprofile_path))
+    )
+    with profiler.phase("pre_execute"):
+        sorted(range(1000))
+    profiler.end_startup()
+    assert pstats.Stats(str(cprofile_path)).total_calls > 0
+
+
+def test_startup_profiler_disabled(tmp_path):
+    profiler = StartupProfiler()
+    with profiler.phase("pre_execute"):
+        pass
+    profiler.watch_port(1)
+    profiler.end_startup()
+    assert profiler.phases == []
+    assert profiler.finish() is None
+
+
+def test_process_started_at():
+    started_at = process_started_at()
+    assert started_at is None or started_at <= time.time()
+
+
+def test_startup_profiler_expect(tmp_path):
+    trace_path = tmp_path / "trace.json"
+    profiler = StartupProfiler(StartupProfilerConfig(trace_path=str(trace_path)))
+    done = profiler.expect("server_ready")
+    profiler.end_startup()
+    assert not trace_path.exists()
+    done(True)
+    done(False)
+    assert [p["name"] for p in json.loads(trace_path.read_text())["phases"] if p["name"] != "process"] == [
+        "server_ready"
+    ]
@@ -1,8 +1,13 @@
 import os
 
-from flytekitplugins.flyteinteractive import get_task_inputs
+import mock
+import pytest
+from flytekitplugins.flyteinteractive import LazyTaskInputs, get_task_inputs
+from flytekitplugins.flyteinteractive.jupyter_lib.jupyter_constants import WORKING_DIR_ENV
 from flytekitplugins.flyteinteractive.utils import load_module_from_path
 
+from flytekit.types.file import FlyteFile
+
 
 def test_load_module_from_path():
     module_name = "task"
@@ -18,3 +23,38 @@ def test_get_task_inputs():
     test_working_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "testdata")
     native_inputs = get_task_inputs("task", "t1", test_working_dir)
     assert native_inputs == {"a": 30, "b": 0}
+
+
+def test_lazy_task_inputs():
+    test_working_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "testdata")
+    inputs = LazyTaskInputs("task", "t1", test_working_dir)
+    assert inputs._literals is None
+    assert inputs.a == 30
+    assert list(inputs._values) == ["a"]
+    assert inputs["b"] == 0
+    assert dict(inputs) == get_task_inputs("task", "t1", test_working_dir)
+    assert inputs.handle("a") == 30
+    with pytest.raises(AttributeError):
+        inputs.c
+    with pytest.raises(KeyError):
+        inputs["c"]
+    with pytest.raises(TypeError):
+        inputs.mmap("a")
+
+
+def test_lazy_task_inputs_from_env(monkeypatch):
+    test_working_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)), "testdata")
+    monkeypatch.setenv(WORKING_DIR_ENV, test_working_dir)
+    assert LazyTaskInputs("task", "t1").a == 30
+    monkeypatch.delenv(WORKING_DIR_ENV)
+    with pytest.raises(ValueError):
+        LazyTaskInputs("task", "t1")
+
+
+@pytest.mark.parametrize("content", [b"", b"content"])
+def test_lazy_task_inputs_mmap(tmp_path, content):
+    path = tmp_path / "input"
+    path.write_bytes(content)
+    inputs = LazyTaskInputs("task", "t1", str(tmp_path))
+    with mock.patch.object(LazyTaskInputs, "handle", return_value=FlyteFile(str(path))):
+        assert bytes(inputs.mmap("f")) == content
@@ -0,0 +1,126 @@
+import functools
+import json
+import os
+import threading
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import mock
+import pytest
+from flytekitplugins.flyteinteractive import VscodeConfig
+from flytekitplugins.flyteinteractive.vscode_lib.cache import DownloadCache, file_sha256
+from flytekitplugins.flyteinteractive.vscode_lib.decorator import prefetch_vscode
+
+
+@pytest.fixture
+def file_server(tmp_path):
+    served_dir = tmp_path / "served"
+    served_dir.mkdir()
+    (served_dir / "ext-1.0.vsix").write_bytes(b"a" * 1000)
+    (served_dir / "ext-2.0.vsix").write_bytes(b"b" * 1000)
+    requests = []
+
+    class _Handler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            requests.append(self.path)
+            super().do_GET()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_Handler, directory=str(served_dir)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", requests
+    server.shutdown()
+    server.server_close()
+
+
+def test_cache_downloads_once(file_server, tmp_path):
+    base_url, requests = file_server
+    cache = DownloadCache(str(tmp_path / "cache"))
+    for pod in ("pod1", "pod2"):
+        target_dir = tmp_path / pod
+        target_dir.mkdir()
+        path = cache.get(f"{base_url}/ext-1.0.vsix", str(target_dir))
+        assert path == str(target_dir / "ext-1.0.vsix")
+        assert open(path, "rb").read() == b"a" * 1000
+    assert requests == ["/ext-1.0.vsix"]
+    assert os.listdir(cache.objects_dir) == [file_sha256(path)]
+
+
+def test_cache_redownloads_corrupted_object(file_server, tmp_path):
+    base_url, requests = file_server
+    cache = DownloadCache(str(tmp_path / "cache"))
+    path = cache.get(f"{base_url}/ext-1.0.vsix", str(tmp_path))
+    object_path = os.path.join(cache.objects_dir, file_sha256(path))
+    os.remove(path)
+    with open(object_path, "r+b") as f:
+        f.write(b"x")
+
+    path = cache.get(f"{base_url}/ext-1.0.vsix", str(tmp_path))
+    assert open(path, "rb").read() == b"a" * 1000
+    assert len(requests) == 2
+
+
+def test_cache_evicts_least_recently_used(file_server, tmp_path):
+    base_url, _ = file_server
+    cache = DownloadCache(str(tmp_path / "cache"), max_bytes=1500)
+    first = file_sha256(cache.get(f"{base_url}/ext-1.0.vsix", str(tmp_path)))
+    os.utime(os.path.join(cache.objects_dir, first), (0, 0))
+    second = file_sha256(cache.get(f"{base_url}/ext-2.0.vsix", str(tmp_path)))
+    assert os.listdir(cache.objects_dir) == [second]
+
+
+def test_cache_prunes_index_of_evicted_objects(file_server, tmp_path):
+    base_url, _ = file_server
+    cache = DownloadCache(str(tmp_path / "cache"), max_bytes=1500)
+    cache.get(f"{base_url}/ext-1.0.vsix", str(tmp_path))
+    os.utime(os.path.join(cache.objects_dir, os.listdir(cache.objects_dir)[0]), (0, 0))
+    cache.get(f"{base_url}/ext-2.0.vsix", str(tmp_path))
+    assert [json.load(open(os.path.join(cache.index_dir, name)))["url"] for name in os.listdir(cache.index_dir)] == [
+        f"{base_url}/ext-2.0.vsix"
+    ]
+
+
+def test_cache_redownloads_object_evicted_after_lookup(file_server, tmp_path):
+    base_url, requests = file_server
+    cache = DownloadCache(str(tmp_path / "cache"))
+    cache.get(f"{base_url}/ext-1.0.vsix", str(tmp_path))
+    lookup = cache._lookup
+
+    def lookup_then_evict(url):
+        # Another pod evicts the object right after this one found it
+        object_path = lookup(url)
+        os.remove(object_path)
+        return object_path
+
+    target_dir = tmp_path / "pod"
+    target_dir.mkdir()
+    with mock.patch.object(cache, "_lookup", side_effect=lookup_then_evict):
+        path = cache.get(f"{base_url}/ext-1.0.vsix", str(target_dir))
+    assert open(path, "rb").read() == b"a" * 1000
+    assert len(requests) == 2
+
+
+def test_cache_from_env(tmp_path):
+    with mock.patch.dict(os.environ, {"FLYTEINTERACTIVE_CACHE_DIR": str(tmp_path), "FLYTEINTERACTIVE_CACHE_MAX_BYTES": "10"}):
+        cache = DownloadCache.from_env()
+    assert cache.cache_dir == str(tmp_path)
+    assert cache.max_bytes == 10
+    with mock.patch.dict(os.environ, {"FLYTEINTERACTIVE_CACHE_DIR": ""}):
+        assert DownloadCache.from_env() is None
+
+
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.extensions.execute_command")
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.decorator.get_installed_extensions")
+@mock.patch("shutil.which", return_value="/usr/bin/code-server")
+def test_prefetch_vscode_installs_missing_extensions_through_cache(
+    mock_which, mock_get_installed_extensions, mock_execute_command, file_server, tmp_path
+):
+    base_url, _ = file_server
+    mock_get_installed_extensions.return_value = ["ext-1.0"]
+    config = VscodeConfig(extension_remote_paths=[f"{base_url}/ext-1.0.vsix", f"{base_url}/ext-2.0.vsix"])
+    with mock.patch("flytekitplugins.flyteinteractive.vscode_lib.decorator.DOWNLOAD_DIR", str(tmp_path / "download")):
+        prefetch_vscode(config, DownloadCache(str(tmp_path / "cache")))
+    mock_execute_command.assert_called_once_with(
+        f"code-server --install-extension {tmp_path / 'download' / 'ext-2.0.vsix'}"
+    )
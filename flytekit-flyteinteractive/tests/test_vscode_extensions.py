@@ -0,0 +1,39 @@
+import os
+
+import mock
+from flytekitplugins.flyteinteractive.vscode_lib.extensions import install_extensions, main
+
+
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.extensions.execute_command")
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.extensions.download_file")
+def test_install_extensions(mock_download_file, mock_execute_command, tmp_path):
+    mock_download_file.side_effect = lambda url, target_dir: os.path.join(target_dir, os.path.basename(url))
+    extensions = ["https://example.com/a.vsix", "/local/b.vsix", "https://example.com/c.vsix"]
+
+    results = install_extensions(extensions, target_dir=str(tmp_path), max_workers=2)
+
+    assert [r.extension for r in results] == extensions
+    assert [r.path for r in results] == [str(tmp_path / "a.vsix"), "/local/b.vsix", str(tmp_path / "c.vsix")]
+    assert all(r.error is None for r in results)
+    assert mock_download_file.call_count == 2
+    assert sorted(c.args[0] for c in mock_execute_command.call_args_list) == sorted(
+        f"code-server --install-extension {r.path}" for r in results
+    )
+
+
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.extensions.execute_command")
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.extensions.download_file")
+def test_install_extensions_reports_failures(mock_download_file, mock_execute_command, tmp_path):
+    mock_download_file.side_effect = OSError("connection reset")
+    mock_execute_command.side_effect = RuntimeError("bad vsix")
+
+    results = install_extensions(["https://example.com/a.vsix", "/local/b.vsix"], target_dir=str(tmp_path))
+
+    assert results[0].error == "connection reset"
+    assert results[1].error == "bad vsix"
+    mock_execute_command.assert_called_once_with("code-server --install-extension /local/b.vsix")
+    assert main(["--target-dir", str(tmp_path), "/local/b.vsix"]) == 1
+
+
+def test_install_extensions_empty():
+    assert install_extensions([]) == []
@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+
+import mock
+import pytest
+from flytekit.interactive.vscode_lib import decorator as upstream_decorator
+from flytekitplugins.flyteinteractive import VscodeConfig
+from flytekitplugins.flyteinteractive.vscode_lib.decorator import installed_extensions_override, prefetch_vscode
+from flytekitplugins.flyteinteractive.vscode_lib.layout import load_layout, main, record_layout
+from flytekitplugins.flyteinteractive.vscode_lib.vscode_constants import LAYOUT_PATH_ENV
+
+
+@pytest.fixture
+def prebaked(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "code-server" / "bin"
+    bin_dir.mkdir(parents=True)
+    executable = bin_dir / "code-server"
+    executable.write_text("#!/bin/sh\necho ms-python.python\necho ms-toolsai.jupyter\n")
+    executable.chmod(0o755)
+    home = tmp_path / "home"
+    (home / ".local" / "share" / "code-server" / "extensions").mkdir(parents=True)
+    layout_path = tmp_path / "layout.json"
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv(LAYOUT_PATH_ENV, str(layout_path))
+    return layout_path
+
+
+def test_record_and_load_layout(prebaked):
+    assert main(["--compiled"]) == 0
+    layout = load_layout()
+    assert layout.extensions == ["ms-python.python", "ms-toolsai.jupyter"]
+    assert layout.code_server_bin_dir == os.path.realpath(prebaked.parent / "code-server" / "bin")
+    assert layout.python_version
+    assert json.loads(prebaked.read_text())["extensions_dir"].endswith("code-server/extensions")
+
+
+def test_load_layout_of_other_user(prebaked, tmp_path, monkeypatch):
+    record_layout()
+    monkeypatch.setenv("HOME", str(tmp_path / "other"))
+    assert load_layout() is None
+
+
+def test_load_missing_layout(tmp_path):
+    assert load_layout(str(tmp_path / "missing.json")) is None
+
+
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.decorator.install_extensions")
+@mock.patch("flytekitplugins.flyteinteractive.vscode_lib.decorator.get_installed_extensions")
+def test_prefetch_vscode_uses_layout(mock_get_installed_extensions, mock_install_extensions, prebaked):
+    record_layout()
+    extra = "https://example.com/vscodevim.vim-1.0.vsix"
+    mock_install_extensions.return_value = [mock.Mock(extension=extra, error=None)]
+    config = VscodeConfig(
+        extension_remote_paths=["https://example.com/ms-python.python-2023.20.0.vsix", extra],
+    )
+    original = upstream_decorator.get_installed_extensions
+    installed_extensions = prefetch_vscode(config)
+    mock_get_installed_extensions.assert_not_called()
+    mock_install_extensions.assert_called_once()
+    assert mock_install_extensions.call_args[0][0] == [extra]
+    # The prebaked extensions and the ones installed on top of them, for download_vscode
+    assert all(upstream_decorator.is_extension_installed(e, installed_extensions) for e in config.extension_remote_paths)
+    # flytekit.interactive is left alone
+    assert upstream_decorator.get_installed_extensions is original
+
+
+def test_prefetch_vscode_without_layout_lists_nothing(tmp_path, monkeypatch):
+    monkeypatch.setenv(LAYOUT_PATH_ENV, str(tmp_path / "missing.json"))
+    monkeypatch.setattr(shutil, "which", lambda name: "/usr/bin/code-server")
+    with mock.patch(
+        "flytekitplugins.flyteinteractive.vscode_lib.decorator.get_installed_extensions", return_value=[]
+    ), mock.patch("flytekitplugins.flyteinteractive.vscode_lib.decorator.install_extensions", return_value=[]):
+        assert prefetch_vscode(VscodeConfig(extension_remote_paths=[])) is None
+
+
+
+def test_prefetch_vscode_uses_earlier_download(tmp_path, monkeypatch):
+    config = VscodeConfig(extension_remote_paths=[])
+    download_dir = tmp_path / "download"
+    bin_dir = download_dir / upstream_decorator.get_code_server_info(config.code_server_dir_names) / "bin"
+    bin_dir.mkdir(parents=True)
+    (bin_dir / "code-server").write_text("#!/bin/sh\n")
+    (bin_dir / "code-server").chmod(0o755)
+    monkeypatch.setenv(LAYOUT_PATH_ENV, str(tmp_path / "missing.json"))
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+
+    def get_installed_extensions():
+        assert shutil.which("code-server") == str(bin_dir / "code-server")
+        return []
+
+    with mock.patch(
+        "flytekitplugins.flyteinteractive.vscode_lib.decorator.DOWNLOAD_DIR", str(download_dir)
+    ), mock.patch(
+        "flytekitplugins.flyteinteractive.vscode_lib.decorator.get_installed_extensions",
+        side_effect=get_installed_extensions,
+    ), mock.patch(
+        "flytekitplugins.flyteinteractive.vscode_lib.decorator.download_file", side_effect=AssertionError
+    ), mock.patch("flytekitplugins.flyteinteractive.vscode_lib.decorator.install_extensions", return_value=[]):
+        assert prefetch_vscode(config) is None
+    assert os.environ["PATH"].split(os.pathsep)[0] == str(bin_dir)
+
+def test_installed_extensions_override_is_scoped():
+    original = upstream_decorator.get_installed_extensions
+    extensions = None
+    with mock.patch.object(upstream_decorator, "get_installed_extensions", return_value=["listed"]) as listed:
+        patched = upstream_decorator.get_installed_extensions
+        with installed_extensions_override(lambda: extensions):
+            extensions = ["prebaked"]
+            assert upstream_decorator.get_installed_extensions() == ["prebaked"]
+            # Only the first call, made by download_vscode, is answered from the override
+            assert upstream_decorator.get_installed_extensions() == ["listed"]
+        assert upstream_decorator.get_installed_extensions is patched
+        with installed_extensions_override(lambda: None):
+            assert upstream_decorator.get_installed_extensions() == ["listed"]
+        assert listed.call_count == 2
+        with pytest.raises(RuntimeError):
+            with installed_extensions_override(lambda: ["prebaked"]):
+                raise RuntimeError()
+        assert upstream_decorator.get_installed_extensions is patched
+    assert upstream_decorator.get_installed_extensions is original
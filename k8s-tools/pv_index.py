@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+一次性建立 Pod → PVC → PV → RBD 镜像的索引，代替 GetPersistentVolumes.sh 对每个卷分别执行 kubectl。
+
+Pod 和 PVC 每个命名空间只列一次（-A 时整个集群一次），PV 只列一次，在内存中关联后可以同时查询任意多个 Pod。
+也可以把列出的 JSON 保存到目录（--save），之后用 --from-dir 离线查询。
+
+用法：
+    python3 pv_index.py -n aione-staging                         # 命名空间内所有 Pod
+    python3 pv_index.py -n aione-staging --pod a9nfdzwpd7d47vxpsmj7-n0-0 --format json
+    python3 pv_index.py -A --image csi-vol-69caf1ac-888b-11f0-9950-321b7441d1d3
+    python3 pv_index.py -n aione-staging --save /tmp/pv-snapshot
+    python3 pv_index.py --from-dir /tmp/pv-snapshot --format csv
+"""
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, fields
+from typing import Dict, Iterable, List, Optional
+
+# --save 和 --from-dir 使用的文件名
+PODS_FILE = "pods.json"
+PVCS_FILE = "pvcs.json"
+PVS_FILE = "pvs.json"
+
+
+@dataclass
+class VolumeRow:
+    namespace: str
+    pod: str
+    node: str
+    volume: str
+    pvc: str
+    pv: str
+    capacity: str
+    volume_handle: str
+    image: str
+    pool: str
+
+
+def kubectl_json(kubectl: str, *args: str) -> dict:
+    result = subprocess.run([kubectl, "get", *args, "-o", "json"], capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"kubectl get {' '.join(args)} 失败: {result.stderr.strip()}")
+    return json.loads(result.stdout)
+
+
+def fetch(kubectl: str, namespace: Optional[str]) -> Dict[str, List[dict]]:
+    """
+    列出 Pod、PVC 和 PV，共三次 kubectl 调用。
+    """
+    scope = ["-A"] if namespace is None else ["-n", namespace]
+    return {
+        PODS_FILE: kubectl_json(kubectl, "pods", *scope)["items"],
+        PVCS_FILE: kubectl_json(kubectl, "pvc", *scope)["items"],
+        PVS_FILE: kubectl_json(kubectl, "pv")["items"],
+    }
+
+
+def load_dir(path: str) -> Dict[str, List[dict]]:
+    """
+    读取 --save 保存的或 `kubectl get <kind> -o json` 录制的文件。
+    """
+    snapshot = {}
+    for name in (PODS_FILE, PVCS_FILE, PVS_FILE):
+        with open(os.path.join(path, name)) as f:
+            snapshot[name] = json.load(f)["items"]
+    return snapshot
+
+
+def save_dir(snapshot: Dict[str, List[dict]], path: str):
+    os.makedirs(path, exist_ok=True)
+    for name, items in snapshot.items():
+        with open(os.path.join(path, name), "w") as f:
+            json.dump({"apiVersion": "v1", "kind": "List", "items": items}, f)
+
+
+def pod_claims(pod: dict) -> Iterable[tuple]:
+    """
+    返回 Pod 使用的 (卷名, PVC 名)，包括通用临时卷（PVC 名为 <pod>-<卷名>）。
+    """
+    for volume in pod["spec"].get("volumes", []):
+        if "persistentVolumeClaim" in volume:
+            yield volume["name"], volume["persistentVolumeClaim"]["claimName"]
+        elif "ephemeral" in volume:
+            yield volume["name"], f"{pod['metadata']['name']}-{volume['name']}"
+
+
+def pv_source(pv: dict) -> Dict[str, str]:
+    spec = pv["spec"]
+    if "csi" in spec:
+        attributes = spec["csi"].get("volumeAttributes") or {}
+        return {
+            "volume_handle": spec["csi"].get("volumeHandle", ""),
+            "image": attributes.get("imageName", ""),
+            "pool": attributes.get("pool", ""),
+        }
+    # in-tree rbd 卷
+    if "rbd" in spec:
+        return {"volume_handle": "", "image": spec["rbd"].get("image", ""), "pool": spec["rbd"].get("pool", "")}
+    return {"volume_handle": "", "image": "", "pool": ""}
+
+
+class VolumeIndex:
+    """
+    Pod → PVC → PV 的内存索引，可按 Pod、PV 或镜像名查询。未绑定的 PVC 和找不到的 PV 对应字段为空。
+    """
+
+    def __init__(self, pods: List[dict], pvcs: List[dict], pvs: List[dict]):
+        pvs_by_name = {pv["metadata"]["name"]: pv for pv in pvs}
+        pvcs_by_key = {(pvc["metadata"]["namespace"], pvc["metadata"]["name"]): pvc for pvc in pvcs}
+        self.rows: List[VolumeRow] = []
+        for pod in pods:
+            namespace = pod["metadata"]["namespace"]
+            for volume, claim in pod_claims(pod):
+                pvc = pvcs_by_key.get((namespace, claim), {})
+                pv_name = pvc.get("spec", {}).get("volumeName", "")
+                pv = pvs_by_name.get(pv_name)
+                source = pv_source(pv) if pv else {"volume_handle": "", "image": "", "pool": ""}
+                self.rows.append(
+                    VolumeRow(
+                        namespace=namespace,
+                        pod=pod["metadata"]["name"],
+                        node=pod["spec"].get("nodeName", ""),
+                        volume=volume,
+                        pvc=claim,
+                        pv=pv_name,
+                        capacity=pv["spec"].get("capacity", {}).get("storage", "") if pv else "",
+                        **source,
+                    )
+                )
+
+    def lookup(
+        self, pods: Optional[List[str]] = None, images: Optional[List[str]] = None, pvs: Optional[List[str]] = None
+    ) -> List[VolumeRow]:
+        rows = self.rows
+        for attribute, wanted in (("pod", pods), ("image", images), ("pv", pvs)):
+            if wanted:
+                wanted = set(wanted)
+                rows = [row for row in rows if getattr(row, attribute) in wanted]
+        return rows
+
+
+def write_rows(rows: List[VolumeRow], fmt: str, out=None):
+    out = out if out is not None else sys.stdout
+    if fmt == "json":
+        json.dump([asdict(row) for row in rows], out, indent=2)
+        out.write("\n")
+        return
+    names = [f.name for f in fields(VolumeRow)]
+    if fmt == "csv":
+        writer = csv.writer(out)
+        writer.writerow(names)
+        writer.writerows([getattr(row, name) for name in names] for row in rows)
+        return
+    table = [names] + [[getattr(row, name) or "-" for name in names] for row in rows]
+    widths = [max(len(row[i]) for row in table) for i in range(len(names))]
+    for row in table:
+        out.write("  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() + "\n")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    scope = parser.add_mutually_exclusive_group(required=True)
+    scope.add_argument("-n", "--namespace", help="命名空间")
+    scope.add_argument("-A", "--all-namespaces", action="store_true", help="整个集群")
+    scope.add_argument("--from-dir", help="从 --save 保存的目录读取，不访问集群")
+    parser.add_argument("--pod", action="append", help="只输出这些 Pod，可重复")
+    parser.add_argument("--image", action="append", help="只输出使用这些 RBD 镜像的卷，可重复")
+    parser.add_argument("--pv", action="append", help="只输出这些 PV，可重复")
+    parser.add_argument("--format", choices=("table", "csv", "json"), default="table", help="输出格式")
+    parser.add_argument("--save", help="把列出的 Pod、PVC、PV 保存到该目录")
+    parser.add_argument("--kubectl", default="kubectl", help="kubectl 命令")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.from_dir:
+            snapshot = load_dir(args.from_dir)
+        else:
+            snapshot = fetch(args.kubectl, None if args.all_namespaces else args.namespace)
+        if args.save:
+            save_dir(snapshot, args.save)
+    except (OSError, RuntimeError, ValueError, KeyError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+
+    index = VolumeIndex(snapshot[PODS_FILE], snapshot[PVCS_FILE], snapshot[PVS_FILE])
+    rows = index.lookup(args.pod, args.image, args.pv)
+    write_rows(rows, args.format)
+    missing = sorted(set(args.pod or []) - {row.pod for row in index.rows})
+    if missing:
+        print(f"未找到使用 PVC 的 Pod: {', '.join(missing)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
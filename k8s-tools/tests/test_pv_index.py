@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from pv_index import (
+    PODS_FILE,
+    PVCS_FILE,
+    PVS_FILE,
+    VolumeIndex,
+    VolumeRow,
+    load_dir,
+    main,
+    pod_claims,
+    save_dir,
+    write_rows,
+)
+
+SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata", "snapshot")
+
+
+@pytest.fixture
+def snapshot():
+    return load_dir(SNAPSHOT_DIR)
+
+
+@pytest.fixture
+def index(snapshot):
+    return VolumeIndex(snapshot[PODS_FILE], snapshot[PVCS_FILE], snapshot[PVS_FILE])
+
+
+def rows_of(index, namespace, pod):
+    return {row.volume: row for row in index.rows if row.namespace == namespace and row.pod == pod}
+
+
+def test_pod_claims(snapshot):
+    pods = {(p["metadata"]["namespace"], p["metadata"]["name"]): p for p in snapshot[PODS_FILE]}
+    # The configMap volume is skipped, the ephemeral volume is claimed as <pod>-<volume>
+    assert list(pod_claims(pods[("aione-staging", "web-0")])) == [
+        ("data", "data-web-0"),
+        ("scratch", "web-0-scratch"),
+        ("pending", "unbound-claim"),
+    ]
+    assert list(pod_claims(pods[("aione-staging", "no-volumes")])) == []
+
+
+def test_csi_rbd_volume(index):
+    row = rows_of(index, "aione-staging", "web-0")["data"]
+    assert row == VolumeRow(
+        namespace="aione-staging",
+        pod="web-0",
+        node="node1",
+        volume="data",
+        pvc="data-web-0",
+        pv="pvc-1111",
+        capacity="10Gi",
+        volume_handle="0001-0024-csi-vol-1111",
+        image="csi-vol-1111",
+        pool="kube",
+    )
+
+
+def test_ephemeral_volume(index):
+    row = rows_of(index, "aione-staging", "web-0")["scratch"]
+    assert (row.pvc, row.pv, row.image, row.capacity) == ("web-0-scratch", "pvc-2222", "csi-vol-2222", "1Gi")
+
+
+def test_unbound_pvc(index):
+    row = rows_of(index, "aione-staging", "web-0")["pending"]
+    assert (row.pvc, row.pv, row.capacity, row.image) == ("unbound-claim", "", "", "")
+
+
+def test_missing_pv(index):
+    row = rows_of(index, "aione-staging", "legacy-0")["gone"]
+    assert (row.pvc, row.pv, row.capacity, row.image, row.pool) == ("orphan", "pvc-deleted", "", "", "")
+
+
+def test_in_tree_rbd_pv(index):
+    row = rows_of(index, "aione-staging", "legacy-0")["old"]
+    assert (row.pv, row.capacity, row.volume_handle, row.image, row.pool) == (
+        "pv-legacy",
+        "50Gi",
+        "",
+        "kubernetes-dynamic-pvc-abc",
+        "rbd",
+    )
+
+
+def test_claims_are_matched_within_the_namespace(index):
+    row = rows_of(index, "other", "web-0")["data"]
+    # Same claim name as in aione-staging, bound to an NFS volume without an RBD image
+    assert (row.pv, row.capacity, row.image) == ("pvc-3333", "5Gi", "")
+
+
+def test_lookup(index):
+    assert {(row.namespace, row.volume) for row in index.lookup(pods=["web-0"])} == {
+        ("aione-staging", "data"),
+        ("aione-staging", "scratch"),
+        ("aione-staging", "pending"),
+        ("other", "data"),
+    }
+    assert [row.pod for row in index.lookup(images=["kubernetes-dynamic-pvc-abc"])] == ["legacy-0"]
+    assert [row.volume for row in index.lookup(pods=["web-0"], pvs=["pvc-2222"])] == ["scratch"]
+    assert index.lookup(pods=["no-volumes"]) == []
+
+
+def test_write_rows(index):
+    rows = index.lookup(pods=["legacy-0"])
+
+    out = io.StringIO()
+    write_rows(rows, "json", out)
+    assert [row["pv"] for row in json.loads(out.getvalue())] == ["pv-legacy", "pvc-deleted"]
+
+    out = io.StringIO()
+    write_rows(rows, "csv", out)
+    records = list(csv.DictReader(io.StringIO(out.getvalue())))
+    assert records[1]["image"] == ""
+    assert records[0]["image"] == "kubernetes-dynamic-pvc-abc"
+
+    out = io.StringIO()
+    write_rows(rows, "table", out)
+    lines = out.getvalue().splitlines()
+    assert lines[0].split() == ["namespace", "pod", "node", "volume", "pvc", "pv", "capacity", "volume_handle", "image", "pool"]
+    # Empty fields are shown as -, so the columns stay aligned
+    assert lines[2].split() == ["aione-staging", "legacy-0", "node2", "gone", "orphan", "pvc-deleted", "-", "-", "-", "-"]
+
+
+def test_save_and_load_dir(snapshot, tmp_path):
+    save_dir(snapshot, str(tmp_path))
+    assert json.load(open(tmp_path / PVS_FILE))["kind"] == "List"
+    assert load_dir(str(tmp_path)) == snapshot
+
+
+def test_main_from_dir(capsys):
+    assert main(["--from-dir", SNAPSHOT_DIR, "--pod", "legacy-0", "--format", "json"]) == 0
+    assert [row["volume"] for row in json.loads(capsys.readouterr().out)] == ["old", "gone"]
+    # Pods without claims are not in the index
+    assert main(["--from-dir", SNAPSHOT_DIR, "--pod", "no-volumes"]) == 1
+    assert "no-volumes" in capsys.readouterr().err
+    assert main(["--from-dir", os.path.join(SNAPSHOT_DIR, "missing")]) == 1
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+并行、流式压缩的 MySQL/MariaDB 备份，代替 backup.sh 中的单个 `mysqldump --all-databases`。
+
+- 每个数据库一个 mysqldump（--single-transaction），按数据量从大到小并行执行；--per-table 时按表拆分，
+  每个数据库另有一个只含结构、视图、存储过程和事件的文件。每个文件内部是一致的，不同文件之间不是同一时间点。
+- mysqldump 的输出直接经过 zstd（没有时用 gzip）写入备份文件，不产生未压缩的临时文件；stderr 单独记录到日志。
+- 凭据从 MySQL 选项文件读取（[client] 段的 user/password，可选 host/port），不出现在命令行中。
+- 备份目录中写入 manifest.json，记录每个文件的数据库、表、大小、sha256 和用时。
+- 全部成功后才把 <名称>.partial 目录改名为正式目录，并按 --keep/--keep-days 删除旧备份。
+  失败的运行留下的 .partial 目录可用于排查，下一次备份成功时删除。
+
+凭据文件示例（权限 600）：
+    [client]
+    user=root
+    password=...
+
+用法：
+    python3 backup.py --container mariadb --credentials /etc/mysql-backup.cnf --output /opt/backup
+    python3 backup.py --credentials ~/.my.cnf --per-table --jobs 8 --keep 7
+恢复：
+    zstd -dc <数据库>.sql.zst | mysql
+    zstd -dc <数据库>.schema.sql.zst | mysql <数据库>   # --per-table 时先恢复结构，再恢复各表
+"""
+import argparse
+import configparser
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Dict, List, Optional
+
+DEFAULT_OUTPUT = "/opt/backup"
+DEFAULT_JOBS = 4
+# 默认保留最近 7 份备份
+DEFAULT_KEEP = 7
+BACKUP_PREFIX = "backup-"
+PARTIAL_SUFFIX = ".partial"
+MANIFEST_NAME = "manifest.json"
+LOCK_NAME = ".backup.lock"
+CHUNK_SIZE = 1024 * 1024
+SKIP_DATABASES = frozenset({"information_schema", "performance_schema", "sys"})
+DUMP_OPTIONS = ["--single-transaction", "--quick", "--hex-blob", "--routines", "--events", "--triggers"]
+# 压缩命令和扩展名，按顺序选择第一个可用的
+COMPRESSORS = [("zstd", ["zstd", "-q", "-c", "-3"], ".zst"), ("gzip", ["gzip", "-c", "-6"], ".gz")]
+
+logger = logging.getLogger("mysql_backup")
+
+
+class BackupError(Exception):
+    pass
+
+
+@dataclass
+class DumpJob:
+    database: str
+    table: Optional[str]
+    # schema：只含结构、视图、存储过程和事件；data：单表的数据和触发器；database：整个数据库
+    kind: str
+    size: int
+
+    @property
+    def filename(self) -> str:
+        if self.kind == "schema":
+            return f"{self.database}.schema.sql"
+        if self.kind == "data":
+            return f"{self.database}.{self.table}.sql"
+        return f"{self.database}.sql"
+
+
+@dataclass
+class ManifestEntry:
+    database: str
+    table: Optional[str]
+    kind: str
+    file: str
+    bytes: int
+    sha256: str
+    seconds: float
+
+
+class MySQL:
+    """
+    在本机或 docker 容器中执行 mysql/mysqldump，密码通过选项文件或 MYSQL_PWD 环境变量传递，不出现在命令行中。
+
+    Args:
+        credentials (str): MySQL 选项文件。
+        container (str, optional): 容器名，为空时在本机执行。
+    """
+
+    def __init__(self, credentials: str, container: Optional[str] = None):
+        self.credentials = os.path.expanduser(credentials)
+        self.container = container
+        self.env = dict(os.environ)
+        self.client_args: List[str] = []
+        parser = configparser.ConfigParser(allow_no_value=True, interpolation=None)
+        if not parser.read(self.credentials):
+            raise BackupError(f"无法读取凭据文件 {self.credentials}")
+        if container:
+            # 容器内读不到本机的选项文件，密码通过 docker exec -e MYSQL_PWD 从环境变量传入
+            client = parser["client"] if parser.has_section("client") else {}
+            self.env["MYSQL_PWD"] = client.get("password", "") or ""
+            self.client_args = [f"--{key}={client[key]}" for key in ("user", "host", "port") if client.get(key)]
+        else:
+            self.client_args = [f"--defaults-extra-file={self.credentials}"]
+
+    def command(self, tool: str, *args: str) -> List[str]:
+        if self.container:
+            return ["docker", "exec", "-e", "MYSQL_PWD", self.container, tool, *self.client_args, *args]
+        return [tool, *self.client_args, *args]
+
+    def query(self, sql: str) -> List[List[str]]:
+        result = subprocess.run(
+            self.command("mysql", "-N", "-B", "-e", sql), capture_output=True, text=True, env=self.env
+        )
+        if result.returncode != 0:
+            raise BackupError(f"执行 {sql!r} 失败: {result.stderr.strip()}")
+        return [line.split("\t") for line in result.stdout.splitlines() if line]
+
+
+def plan_jobs(
+    mysql: MySQL, databases: Optional[List[str]], exclude: List[str], per_table: bool
+) -> List[DumpJob]:
+    """
+    按 information_schema 中的数据量生成备份任务，从大到小排列，使最大的任务最先开始。
+    """
+    names = [row[0] for row in mysql.query("SHOW DATABASES")]
+    if databases:
+        unknown = set(databases) - set(names)
+        if unknown:
+            raise BackupError(f"数据库不存在: {', '.join(sorted(unknown))}")
+        names = databases
+    names = [name for name in names if name not in SKIP_DATABASES and name not in exclude]
+
+    tables: Dict[str, Dict[str, int]] = {name: {} for name in names}
+    for schema, table, size in mysql.query(
+        "SELECT table_schema, table_name, COALESCE(data_length + index_length, 0) "
+        "FROM information_schema.TABLES WHERE table_type = 'BASE TABLE'"
+    ):
+        if schema in tables:
+            tables[schema][table] = int(size)
+
+    jobs = []
+    for name in names:
+        # mysql 系统库包含权限表，始终整库备份
+        if per_table and name != "mysql" and tables[name]:
+            jobs.append(DumpJob(name, None, "schema", 0))
+            jobs.extend(DumpJob(name, table, "data", size) for table, size in tables[name].items())
+        else:
+            jobs.append(DumpJob(name, None, "database", sum(tables[name].values())))
+    return sorted(jobs, key=lambda job: job.size, reverse=True)
+
+
+def dump_args(job: DumpJob) -> List[str]:
+    if job.kind == "schema":
+        return [*DUMP_OPTIONS, "--no-data", "--skip-triggers", job.database]
+    if job.kind == "data":
+        return [*DUMP_OPTIONS, "--no-create-info", "--skip-routines", "--skip-events", job.database, job.table]
+    return [*DUMP_OPTIONS, "--databases", job.database]
+
+
+def choose_compressor() -> tuple:
+    for name, cmd, extension in COMPRESSORS:
+        if shutil.which(cmd[0]):
+            return name, cmd, extension
+    raise BackupError("未找到 zstd 或 gzip")
+
+
+def run_dump(mysql: MySQL, job: DumpJob, compressor: List[str], path: str) -> ManifestEntry:
+    """
+    mysqldump | 压缩 | 写文件，同时计算压缩后文件的大小和 sha256。
+    """
+    start = time.monotonic()
+    # stderr 写入临时文件而不是管道，输出较多时也不会阻塞 mysqldump
+    with tempfile.TemporaryFile() as dump_stderr, tempfile.TemporaryFile() as compress_stderr:
+        dump = subprocess.Popen(
+            mysql.command("mysqldump", *dump_args(job)), stdout=subprocess.PIPE, stderr=dump_stderr, env=mysql.env
+        )
+        compress = subprocess.Popen(compressor, stdin=dump.stdout, stdout=subprocess.PIPE, stderr=compress_stderr)
+        # 只由压缩进程持有管道，mysqldump 才能在压缩进程退出时收到 SIGPIPE
+        dump.stdout.close()
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "wb") as f:
+            for chunk in iter(lambda: compress.stdout.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+        compress.wait()
+        dump.wait()
+        compress_stderr.seek(0)
+        dump_stderr.seek(0)
+        compress_error = compress_stderr.read().decode(errors="replace").strip()
+        dump_error = dump_stderr.read().decode(errors="replace").strip()
+    if compress.returncode != 0:
+        raise BackupError(f"压缩 {job.filename} 失败: {compress_error}")
+    if dump.returncode != 0:
+        raise BackupError(f"mysqldump {job.filename} 失败: {dump_error}")
+    if dump_error:
+        logger.warning(f"mysqldump {job.filename}: {dump_error}")
+    return ManifestEntry(
+        job.database, job.table, job.kind, os.path.basename(path), size, digest.hexdigest(), time.monotonic() - start
+    )
+
+
+def rotate(output: str, current: str, keep: int, keep_days: Optional[float]):
+    """
+    删除超出保留数量或天数的旧备份（只删除有 manifest 的完整备份），以及之前运行失败留下的 .partial 目录。
+    """
+    completed = sorted(
+        name
+        for name in os.listdir(output)
+        if name.startswith(BACKUP_PREFIX)
+        and not name.endswith(PARTIAL_SUFFIX)
+        and os.path.isfile(os.path.join(output, name, MANIFEST_NAME))
+    )
+    expired = set(completed[:-keep]) if keep > 0 else set()
+    if keep_days is not None:
+        cutoff = time.time() - keep_days * 86400
+        expired |= {name for name in completed if os.path.getmtime(os.path.join(output, name, MANIFEST_NAME)) < cutoff}
+    expired.discard(current)
+    stale = {name for name in os.listdir(output) if name.startswith(BACKUP_PREFIX) and name.endswith(PARTIAL_SUFFIX)}
+    for name in sorted(expired | stale):
+        logger.info(f"删除旧备份 {name}")
+        shutil.rmtree(os.path.join(output, name))
+
+
+def backup(args) -> str:
+    mysql = MySQL(args.credentials, args.container)
+    compressor_name, compressor, extension = choose_compressor()
+    jobs = plan_jobs(mysql, args.databases, args.exclude, args.per_table)
+    if not jobs:
+        raise BackupError("没有需要备份的数据库")
+
+    name = f"{BACKUP_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    partial = os.path.join(args.output, name + PARTIAL_SUFFIX)
+    os.makedirs(partial)
+    logger.info(f"备份 {len(jobs)} 个文件到 {partial}，并发 {args.jobs}，压缩 {compressor_name}")
+
+    started_at = time.time()
+    entries: List[ManifestEntry] = []
+    errors = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = {
+            executor.submit(run_dump, mysql, job, compressor, os.path.join(partial, job.filename + extension)): job
+            for job in jobs
+        }
+        for future, job in futures.items():
+            try:
+                entry = future.result()
+            except (BackupError, OSError) as e:
+                logger.error(str(e))
+                errors.append(str(e))
+                continue
+            entries.append(entry)
+            logger.info(f"{entry.file}: {entry.bytes} 字节，用时 {entry.seconds:.1f} 秒")
+
+    manifest = {
+        "name": name,
+        "host": socket.gethostname(),
+        "container": args.container,
+        "compression": compressor_name,
+        "per_table": args.per_table,
+        "started_at": datetime.fromtimestamp(started_at).isoformat(timespec="seconds"),
+        "finished_at": datetime.now().isoformat(timespec="seconds"),
+        "seconds": round(time.time() - started_at, 1),
+        "total_bytes": sum(entry.bytes for entry in entries),
+        "files": [asdict(entry) for entry in sorted(entries, key=lambda e: e.file)],
+        "errors": errors,
+    }
+    with open(os.path.join(partial, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    if errors:
+        raise BackupError(f"{len(errors)} 个文件备份失败，未完成的备份 {partial} 将在下次备份成功时删除")
+
+    final = os.path.join(args.output, name)
+    os.rename(partial, final)
+    logger.info(f"备份完成: {final}，共 {manifest['total_bytes']} 字节，用时 {manifest['seconds']} 秒")
+    return name
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--credentials", required=True, help="MySQL 选项文件，[client] 段包含 user 和 password")
+    parser.add_argument("--container", help="在该 docker 容器中执行 mysqldump，默认在本机执行")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="备份根目录")
+    parser.add_argument("--jobs", type=int, default=DEFAULT_JOBS, help="并行的 mysqldump 数量")
+    parser.add_argument("--databases", nargs="+", help="只备份这些数据库，默认全部")
+    parser.add_argument("--exclude", nargs="+", default=[], help="不备份的数据库")
+    parser.add_argument("--per-table", action="store_true", help="按表拆分备份，大库可以并行")
+    parser.add_argument("--keep", type=int, default=DEFAULT_KEEP, help="保留的备份份数，0 表示不按份数删除")
+    parser.add_argument("--keep-days", type=float, help="删除早于该天数的备份")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s %(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, LOCK_NAME), "w") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            logger.error(f"{args.output} 中已有备份在运行")
+            return 1
+        try:
+            name = backup(args)
+            rotate(args.output, name, args.keep, args.keep_days)
+        except (BackupError, OSError) as e:
+            logger.error(str(e))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
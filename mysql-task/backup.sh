@@ -1,3 +1,2 @@
-BACKUP_NAME="backup-$(date +%Y%m%d).sql"
-
-nohup docker exec mariadb mysqldump -uroot -paPuYeuVwqhrwTJTIpNtXAvYjzbNow0mN0RJUP0xl --all-databases > /opt/backup/$BACKUP_NAME 2>&1 &
+# 凭据放在 /etc/mysql-backup.cnf（[client] 段的 user/password，权限 600），见 backup.py
+nohup python3 "$(dirname "$0")/backup.py" --container mariadb --credentials /etc/mysql-backup.cnf --output /opt/backup >> /opt/backup/backup.log 2>&1 &
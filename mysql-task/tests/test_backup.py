@@ -0,0 +1,207 @@
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import backup
+from backup import BACKUP_PREFIX, MANIFEST_NAME, PARTIAL_SUFFIX, BackupError, DumpJob, MySQL, dump_args, main, plan_jobs, rotate
+
+# Stand-ins for the mysql client and mysqldump, answering from cluster.json next to them
+FAKE_MYSQL = """#!{python}
+import json, os, sys
+
+with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "cluster.json")) as f:
+    cluster = json.load(f)
+sql = sys.argv[sys.argv.index("-e") + 1]
+if sql == "SHOW DATABASES":
+    print("\\n".join(cluster["databases"]))
+elif "information_schema.TABLES" in sql:
+    print("\\n".join("\\t".join(map(str, row)) for row in cluster["tables"]))
+else:
+    print(f"unexpected query {{sql}}", file=sys.stderr)
+    sys.exit(1)
+"""
+
+FAKE_MYSQLDUMP = """#!{python}
+import json, os, sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+with open(os.path.join(here, "cluster.json")) as f:
+    cluster = json.load(f)
+args = [arg for arg in sys.argv[1:] if not arg.startswith("--defaults-extra-file=")]
+with open(os.path.join(here, "dumps.log"), "a") as f:
+    f.write(" ".join(args) + "\\n")
+if set(args) & set(cluster.get("fail", [])):
+    print("mysqldump: Got error: 1045: Access denied", file=sys.stderr)
+    sys.exit(2)
+print("-- dump " + " ".join(arg for arg in args if not arg.startswith("-")))
+"""
+
+DATABASES = ["information_schema", "app", "mysql", "empty", "logs"]
+TABLES = [["app", "users", 1000], ["app", "orders", 5000], ["mysql", "user", 10], ["logs", "events", 3000]]
+
+
+@pytest.fixture
+def mysql_bin(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, source in (("mysql", FAKE_MYSQL), ("mysqldump", FAKE_MYSQLDUMP)):
+        path = bin_dir / name
+        path.write_text(source.format(python=sys.executable))
+        path.chmod(0o755)
+    (bin_dir / "cluster.json").write_text(json.dumps({"databases": DATABASES, "tables": TABLES}))
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return bin_dir
+
+
+@pytest.fixture
+def credentials(tmp_path):
+    path = tmp_path / "backup.cnf"
+    path.write_text("[client]\nuser=backup\npassword=secret\nhost=db.local\n")
+    path.chmod(0o600)
+    return str(path)
+
+
+def test_mysql_credentials_stay_off_the_command_line(credentials):
+    local = MySQL(credentials)
+    assert local.command("mysqldump", "app") == ["mysqldump", f"--defaults-extra-file={credentials}", "app"]
+    container = MySQL(credentials, "mariadb")
+    assert container.command("mysql", "-e", "SELECT 1") == [
+        "docker", "exec", "-e", "MYSQL_PWD", "mariadb", "mysql", "--user=backup", "--host=db.local", "-e", "SELECT 1"
+    ]
+    assert container.env["MYSQL_PWD"] == "secret"
+    with pytest.raises(BackupError):
+        MySQL(credentials + ".missing")
+
+
+def test_plan_jobs(mysql_bin, credentials):
+    mysql = MySQL(credentials)
+    jobs = plan_jobs(mysql, None, [], per_table=False)
+    assert [(job.database, job.kind, job.size) for job in jobs] == [
+        ("app", "database", 6000),
+        ("logs", "database", 3000),
+        ("mysql", "database", 10),
+        ("empty", "database", 0),
+    ]
+    assert [job.database for job in plan_jobs(mysql, ["logs", "app"], ["app"], per_table=False)] == ["logs"]
+    with pytest.raises(BackupError, match="nope"):
+        plan_jobs(mysql, ["nope"], [], per_table=False)
+
+
+def test_plan_jobs_per_table(mysql_bin, credentials):
+    jobs = plan_jobs(MySQL(credentials), None, [], per_table=True)
+    # The largest tables start first, the mysql system database and empty databases are dumped whole
+    assert [(job.database, job.table, job.kind) for job in jobs] == [
+        ("app", "orders", "data"),
+        ("logs", "events", "data"),
+        ("app", "users", "data"),
+        ("mysql", None, "database"),
+        ("app", None, "schema"),
+        ("empty", None, "database"),
+        ("logs", None, "schema"),
+    ]
+    assert [job.filename for job in jobs[:5]] == [
+        "app.orders.sql",
+        "logs.events.sql",
+        "app.users.sql",
+        "mysql.sql",
+        "app.schema.sql",
+    ]
+
+
+def test_dump_args():
+    assert dump_args(DumpJob("app", None, "database", 0))[-2:] == ["--databases", "app"]
+    schema = dump_args(DumpJob("app", None, "schema", 0))
+    assert "--no-data" in schema and "--skip-triggers" in schema and schema[-1] == "app"
+    data = dump_args(DumpJob("app", "users", "data", 0))
+    assert "--no-create-info" in data and data[-2:] == ["app", "users"]
+    assert all("--single-transaction" in args for args in (schema, data))
+
+
+def read_backup(path, entry):
+    with open(os.path.join(path, entry["file"]), "rb") as f:
+        content = f.read()
+    assert hashlib.sha256(content).hexdigest() == entry["sha256"]
+    assert len(content) == entry["bytes"]
+    if entry["file"].endswith(".gz"):
+        return gzip.decompress(content).decode()
+    return subprocess.run(["zstd", "-dc"], input=content, capture_output=True, check=True).stdout.decode()
+
+
+def test_backup(mysql_bin, credentials, tmp_path):
+    output = tmp_path / "backup"
+    assert main(["--credentials", credentials, "--output", str(output), "--per-table", "--jobs", "3"]) == 0
+    [name] = [n for n in os.listdir(output) if n.startswith(BACKUP_PREFIX)]
+    manifest = json.loads((output / name / MANIFEST_NAME).read_text())
+    assert manifest["errors"] == []
+    files = {entry["file"].rsplit(".", 1)[0]: entry for entry in manifest["files"]}
+    assert sorted(files) == sorted(
+        ["app.orders.sql", "app.users.sql", "app.schema.sql", "logs.events.sql", "logs.schema.sql", "mysql.sql", "empty.sql"]
+    )
+    assert read_backup(output / name, files["app.orders.sql"]) == "-- dump app orders\n"
+    assert "--defaults-extra-file" not in (mysql_bin / "dumps.log").read_text()
+
+
+def test_failed_backup_is_removed_by_the_next_successful_one(mysql_bin, credentials, tmp_path, caplog):
+    output = tmp_path / "backup"
+    cluster = json.loads((mysql_bin / "cluster.json").read_text())
+    (mysql_bin / "cluster.json").write_text(json.dumps({**cluster, "fail": ["logs"]}))
+    assert main(["--credentials", credentials, "--output", str(output)]) == 1
+    [partial] = [n for n in os.listdir(output) if n.endswith(PARTIAL_SUFFIX)]
+    assert "下次备份成功时删除" in caplog.text
+    manifest = json.loads((output / partial / MANIFEST_NAME).read_text())
+    assert len(manifest["errors"]) == 1 and "Access denied" in manifest["errors"][0]
+    # Backups are named by the second they start at, move the failed one out of the way of the next run
+    os.rename(output / partial, output / f"{BACKUP_PREFIX}20000101_000000{PARTIAL_SUFFIX}")
+
+    (mysql_bin / "cluster.json").write_text(json.dumps(cluster))
+    assert main(["--credentials", credentials, "--output", str(output)]) == 0
+    assert not [n for n in os.listdir(output) if n.endswith(PARTIAL_SUFFIX)]
+
+
+def make_backup(output, name, age_days=0):
+    path = output / name
+    path.mkdir()
+    (path / MANIFEST_NAME).write_text("{}")
+    mtime = time.time() - age_days * 86400
+    os.utime(path / MANIFEST_NAME, (mtime, mtime))
+
+
+def test_rotate(tmp_path):
+    for day in range(1, 6):
+        make_backup(tmp_path, f"{BACKUP_PREFIX}2025090{day}_000000", age_days=10 - day)
+    (tmp_path / f"{BACKUP_PREFIX}20250906_000000{PARTIAL_SUFFIX}").mkdir()
+    # Not a complete backup, left alone
+    (tmp_path / f"{BACKUP_PREFIX}20250907_000000").mkdir()
+    (tmp_path / "other").mkdir()
+
+    rotate(str(tmp_path), f"{BACKUP_PREFIX}20250905_000000", keep=3, keep_days=None)
+    assert sorted(os.listdir(tmp_path)) == [
+        f"{BACKUP_PREFIX}20250903_000000",
+        f"{BACKUP_PREFIX}20250904_000000",
+        f"{BACKUP_PREFIX}20250905_000000",
+        f"{BACKUP_PREFIX}20250907_000000",
+        "other",
+    ]
+
+    rotate(str(tmp_path), f"{BACKUP_PREFIX}20250905_000000", keep=0, keep_days=5.5)
+    assert sorted(os.listdir(tmp_path))[:2] == [f"{BACKUP_PREFIX}20250905_000000", f"{BACKUP_PREFIX}20250907_000000"]
+
+    # The current backup is kept even if it is older than keep_days
+    rotate(str(tmp_path), f"{BACKUP_PREFIX}20250905_000000", keep=0, keep_days=1)
+    assert f"{BACKUP_PREFIX}20250905_000000" in os.listdir(tmp_path)
+
+
+def test_concurrent_run_is_refused(mysql_bin, credentials, tmp_path):
+    output = tmp_path / "backup"
+    output.mkdir()
+    with open(output / backup.LOCK_NAME, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        assert main(["--credentials", credentials, "--output", str(output)]) == 1
+    assert not [n for n in os.listdir(output) if n.startswith(BACKUP_PREFIX)]
@@ -10,6 +10,7 @@
 HOST_FILE="host.txt"
 RESTART_SCRIPT="restart.sh"
 LOG_FILE="restart-$(date +%Y%m%d_%H%M%S).log"
+HEALTH_WATCH="$(dirname "$0")/health_watch.py"
 
 # 颜色定义
 RED='\033[0;31m'
@@ -49,12 +50,32 @@ check_ceph_status() {
 }
 
 # 等待Ceph状态恢复正常
+# 有 python3 时使用 health_watch.py：复用一个 ceph 会话，集群事件发生时立即检查，并输出恢复进度和预计剩余时间
 wait_for_ceph_ok() {
     local max_wait=$1
     local wait_count=0
     
     log_info "等待Ceph集群状态恢复正常，最大等待时间: ${max_wait}秒"
     
+    if command -v python3 > /dev/null 2>&1 && [ -f "$HEALTH_WATCH" ]; then
+        local output_file=$(mktemp)
+        python3 "$HEALTH_WATCH" --until health-ok --timeout "$max_wait" 2>&1 | tee -a "$LOG_FILE" "$output_file"
+        local rc=${PIPESTATUS[0]}
+        # health_watch.py 的最后一条错误日志，没有时（例如 Python 异常）取最后一行输出
+        local last_error=$(grep '^\[ERROR' "$output_file" | tail -1)
+        [ -z "$last_error" ] && last_error=$(tail -n 1 "$output_file")
+        rm -f "$output_file"
+        if [ "$rc" -eq 0 ]; then
+            log_success "Ceph集群状态已恢复正常"
+            return 0
+        elif [ "$rc" -eq 2 ]; then
+            log_error "等待超时，Ceph集群状态未能在${max_wait}秒内恢复正常: ${last_error}"
+        else
+            log_error "检查Ceph集群状态失败（health_watch.py 退出码 ${rc}）: ${last_error}"
+        fi
+        return 1
+    fi
+    
     while [ $wait_count -lt $max_wait ]; do
         if check_ceph_status > /dev/null 2>&1; then
             log_success "Ceph集群状态已恢复正常"
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+等待 Ceph 集群恢复，代替按固定间隔反复执行 `ceph health detail`。
+
+- 状态查询复用一个会话：有 python3-rados 时通过一个持久的 librados 连接发送 mon 命令，否则退回 ceph CLI。
+- 后台常驻一个 `ceph -w --format json` 进程，集群日志一有变化（例如 PG 状态变化、健康检查清除）就立即查询，
+  无事件时按恢复进度自适应间隔轮询：接近完成时查询更频繁，没有进展时指数退避。
+- 根据降级和错位对象数量及其下降速度估算剩余恢复时间。
+
+- 查询状态失败（例如 mon 选举期间）不会中断等待，继续轮询直到超时。
+
+用法：
+    python3 health_watch.py --timeout 3000                  # 等待所有 PG active+clean
+    python3 health_watch.py --until health-ok --timeout 3000   # 等待 HEALTH_OK
+
+退出码：0 已恢复，2 超时，1 其他错误。
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# 无事件时轮询间隔的范围（秒）
+MIN_POLL_SECONDS = 2
+MAX_POLL_SECONDS = 30
+# 两次状态查询的最小间隔，避免恢复期间大量集群日志引起频繁查询
+MIN_CHECK_SECONDS = 2
+# 无变化时进度日志的间隔（秒）
+PROGRESS_LOG_SECONDS = 30
+# 恢复速度的平滑系数
+RATE_SMOOTHING = 0.3
+# 超时的退出码，与其他错误区分
+EXIT_TIMEOUT = 2
+# 出现这些状态的 PG 说明副本不全或不可用
+UNSAFE_PG_STATES = frozenset({"degraded", "undersized", "down", "stale", "peering", "incomplete", "unknown"})
+
+logger = logging.getLogger("health_watch")
+
+
+class HealthError(Exception):
+    pass
+
+
+class HealthTimeout(HealthError):
+    pass
+
+
+def pgs_clean(states: Dict[str, int]) -> bool:
+    """
+    所有 PG 是否都为 active+clean，允许 scrubbing 等附加状态。
+    """
+    for name, count in states.items():
+        parts = set(name.split("+"))
+        if count and (not {"active", "clean"} <= parts or parts & UNSAFE_PG_STATES):
+            return False
+    return True
+
+
+@dataclass
+class Progress:
+    health: str
+    pg_states: Dict[str, int]
+    degraded_objects: int
+    misplaced_objects: int
+    recovery_objects_per_sec: float
+
+    @classmethod
+    def from_status(cls, status: dict) -> "Progress":
+        pgmap = status.get("pgmap", {})
+        return cls(
+            health=status.get("health", {}).get("status", "UNKNOWN"),
+            pg_states={item["state_name"]: item["count"] for item in pgmap.get("pgs_by_state", [])},
+            degraded_objects=pgmap.get("degraded_objects", 0),
+            misplaced_objects=pgmap.get("misplaced_objects", 0),
+            recovery_objects_per_sec=pgmap.get("recovering_objects_per_sec", 0),
+        )
+
+    @property
+    def clean(self) -> bool:
+        return bool(self.pg_states) and pgs_clean(self.pg_states)
+
+    @property
+    def remaining_objects(self) -> int:
+        return self.degraded_objects + self.misplaced_objects
+
+    def unclean_states(self) -> Dict[str, int]:
+        return {name: count for name, count in self.pg_states.items() if not pgs_clean({name: count})}
+
+
+class StatusSession:
+    """
+    查询 `ceph status` 的会话，优先使用持久的 librados 连接，每次查询不必重新启动进程和认证。
+
+    Args:
+        ceph (str, optional): ceph 命令，librados 不可用时使用。
+        conffile (str, optional): ceph.conf 路径。
+        use_rados (bool, optional): 是否尝试 librados。
+    """
+
+    def __init__(self, ceph: str = "ceph", conffile: str = "/etc/ceph/ceph.conf", use_rados: bool = True):
+        self.ceph = ceph
+        self._cluster = None
+        if use_rados:
+            try:
+                import rados
+
+                cluster = rados.Rados(conffile=conffile)
+                cluster.connect()
+                self._cluster = cluster
+            except Exception as e:  # python3-rados 未安装或连接失败
+                logger.debug(f"librados 不可用，使用 ceph CLI: {e}")
+
+    def status(self) -> dict:
+        if self._cluster is not None:
+            ret, out, err = self._cluster.mon_command(json.dumps({"prefix": "status", "format": "json"}), b"")
+            if ret != 0:
+                raise HealthError(f"ceph status 失败: {err}")
+            return json.loads(out)
+        try:
+            result = subprocess.run([self.ceph, "status", "--format", "json"], capture_output=True, text=True)
+        except OSError as e:
+            raise HealthError(f"无法执行 {self.ceph}: {e}")
+        if result.returncode != 0:
+            raise HealthError(f"ceph status 失败: {result.stderr.strip()}")
+        return json.loads(result.stdout)
+
+    def close(self):
+        if self._cluster is not None:
+            self._cluster.shutdown()
+            self._cluster = None
+
+
+class ClusterEvents:
+    """
+    常驻的 `ceph -w` 进程，每收到一行集群日志就触发一次事件。进程退出后只靠轮询，不影响结果。
+    """
+
+    def __init__(self, ceph: str = "ceph"):
+        self.event = threading.Event()
+        try:
+            self._process = subprocess.Popen(
+                [ceph, "-w", "--format", "json"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+            )
+        except OSError as e:
+            logger.debug(f"无法启动 ceph -w: {e}")
+            self._process = None
+            return
+        threading.Thread(target=self._read, daemon=True).start()
+
+    def _read(self):
+        for line in self._process.stdout:
+            try:
+                message = json.loads(line).get("message")
+            except (ValueError, AttributeError):
+                message = line.strip()
+            if message:
+                logger.debug(f"集群事件: {message}")
+            self.event.set()
+
+    def close(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            self._process.wait()
+
+
+class HealthWatcher:
+    """
+    等待集群达到目标状态，并估算剩余恢复时间。可在多次等待之间复用，会话和 `ceph -w` 进程只启动一次。
+
+    Args:
+        ceph (str, optional): ceph 命令。
+        use_rados (bool, optional): 是否尝试通过 librados 查询状态。
+        watch_events (bool, optional): 是否启动 `ceph -w` 以便在集群事件发生时立即查询。
+    """
+
+    def __init__(self, ceph: str = "ceph", use_rados: bool = True, watch_events: bool = True):
+        self.session = StatusSession(ceph, use_rados=use_rados)
+        self.events = ClusterEvents(ceph) if watch_events else None
+        self._rate: Optional[float] = None
+        self._last: Optional[tuple] = None
+
+    def close(self):
+        self.session.close()
+        if self.events is not None:
+            self.events.close()
+
+    def __enter__(self) -> "HealthWatcher":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _eta(self, progress: Progress, now: float) -> Optional[float]:
+        """
+        用剩余对象数除以平滑后的恢复速度，速度取观测到的下降速度，没有观测值时取 ceph 报告的速度。
+        """
+        remaining = progress.remaining_objects
+        if self._last is not None:
+            last_time, last_remaining = self._last
+            if now > last_time and last_remaining > remaining:
+                observed = (last_remaining - remaining) / (now - last_time)
+                self._rate = observed if self._rate is None else RATE_SMOOTHING * observed + (1 - RATE_SMOOTHING) * self._rate
+        self._last = (now, remaining)
+        rate = self._rate or progress.recovery_objects_per_sec
+        if remaining and rate:
+            return remaining / rate
+        return None
+
+    def wait(self, until: str = "clean", timeout: float = 3000) -> Progress:
+        """
+        等待所有 PG active+clean（until="clean"）或 HEALTH_OK（until="health-ok"）。
+
+        查询状态失败时记录警告并按退避间隔重试，超时信息中包含最后一次失败的原因。
+
+        Raises:
+            HealthTimeout: 超时仍未达到目标状态。
+        """
+        start = time.monotonic()
+        interval = MIN_POLL_SECONDS
+        last_logged = 0.0
+        last_remaining = None
+        self._rate, self._last = None, None
+        while True:
+            checked = time.monotonic()
+            try:
+                progress = Progress.from_status(self.session.status())
+            except (HealthError, ValueError) as e:
+                logger.warning(f"查询集群状态失败，稍后重试: {e}")
+                remaining_time = timeout - (time.monotonic() - start)
+                if remaining_time <= 0:
+                    raise HealthTimeout(f"{timeout:.0f} 秒内集群未恢复（{until}），最后一次查询失败: {e}")
+                time.sleep(min(interval, remaining_time))
+                interval = min(interval * 2, MAX_POLL_SECONDS)
+                continue
+            done = progress.clean if until == "clean" else progress.health == "HEALTH_OK"
+            if done:
+                logger.info(f"集群已恢复（{until}），用时 {checked - start:.0f} 秒")
+                return progress
+
+            eta = self._eta(progress, checked)
+            if checked - last_logged >= PROGRESS_LOG_SECONDS or progress.remaining_objects != last_remaining:
+                eta_text = f"，预计还需 {eta:.0f} 秒" if eta is not None else ""
+                logger.info(
+                    f"{progress.health}，未完成 PG: {progress.unclean_states() or '无'}，"
+                    f"降级对象 {progress.degraded_objects}，错位对象 {progress.misplaced_objects}，"
+                    f"恢复速度 {progress.recovery_objects_per_sec} 对象/秒{eta_text}"
+                )
+                last_logged = checked
+
+            # 有进展时按剩余时间缩短间隔，没有进展时指数退避
+            if eta is not None:
+                interval = min(MAX_POLL_SECONDS, max(MIN_POLL_SECONDS, eta / 4))
+            elif progress.remaining_objects == last_remaining:
+                interval = min(interval * 2, MAX_POLL_SECONDS)
+            last_remaining = progress.remaining_objects
+
+            remaining_time = timeout - (time.monotonic() - start)
+            if remaining_time <= 0:
+                raise HealthTimeout(f"{timeout:.0f} 秒内集群未恢复（{until}）：{progress.health}")
+            if self.events is not None:
+                self.events.event.clear()
+                self.events.event.wait(min(interval, remaining_time))
+            else:
+                time.sleep(min(interval, remaining_time))
+            # 事件触发时也至少间隔 MIN_CHECK_SECONDS
+            time.sleep(max(0.0, min(MIN_CHECK_SECONDS - (time.monotonic() - checked), remaining_time)))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--until", choices=("clean", "health-ok"), default="clean", help="等待的目标状态")
+    parser.add_argument("--timeout", type=float, default=3000, help="超时秒数")
+    parser.add_argument("--ceph", default="ceph", help="ceph 命令")
+    parser.add_argument("--no-rados", action="store_true", help="不使用 librados，只用 ceph CLI")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(levelname)s %(asctime)s] %(message)s", datefmt="%Y-%m-%d %H:%M:%S")
+    with HealthWatcher(args.ceph, use_rados=not args.no_rados) as watcher:
+        try:
+            watcher.wait(args.until, args.timeout)
+        except HealthTimeout as e:
+            logger.error(str(e))
+            return EXIT_TIMEOUT
+        except HealthError as e:
+            logger.error(str(e))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+按 CRUSH 故障域分批滚动重启节点。
+
+同一故障域内的主机不会持有同一个 PG 的两个副本，因此每一批只包含同一故障域的若干主机，
+并在重启前用 `ceph osd ok-to-stop` 确认这些 OSD 停止后所有 PG 仍然可用，否则缩小批次。
+
+每一批的流程：
+  1. 等待所有 PG 为 active+clean（只看 PG 状态，不看 HEALTH_OK，无关告警不会阻塞，见 health_watch.py）
+  2. 对本批主机设置 noout（ceph osd set-group noout）
+  3. 通过 ansible reboot 模块并行重启本批主机（模块自身会等待主机恢复，无需固定 sleep）
+  4. 等待本批 OSD 全部 up，取消 noout
+  5. 等待 PG 恢复 active+clean 后进入下一批
+
+已完成的主机在 host.txt 中标记为 "已重启"，与 auto-restart-nodes.sh 相同，中断后重新执行会跳过它们。
+
+用法：
+    python3 rolling_restart.py --max-parallel 3
+    python3 rolling_restart.py --dry-run          # 只打印分批计划
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from health_watch import HealthError, HealthWatcher
+
+HOST_FILE = "host.txt"
+INVENTORY = "/etc/kolla/hosts"
+RESTARTED_MARK = "已重启"
+# 故障域内允许同时重启的最大主机数
+DEFAULT_MAX_PARALLEL = 3
+# 轮询 ceph 状态的初始间隔和最大间隔（秒）
+POLL_INTERVAL_SECONDS = 5
+MAX_POLL_INTERVAL_SECONDS = 30
+# ansible reboot 模块等待主机恢复的超时时间（秒）
+REBOOT_TIMEOUT_SECONDS = 1200
+OSD_UP_TIMEOUT_SECONDS = 900
+PG_TIMEOUT_SECONDS = 3000
+
+logger = logging.getLogger("rolling_restart")
+
+
+class RestartError(Exception):
+    pass
+
+
+class Ceph:
+    """
+    ceph 命令的封装，所有查询使用 JSON 输出。
+    """
+
+    def __init__(self, binary: str = "ceph"):
+        self.binary = binary
+
+    def run(self, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+        result = subprocess.run([self.binary, *args], capture_output=True, text=True)
+        if check and result.returncode != 0:
+            raise RestartError(f"ceph {' '.join(args)} 失败: {result.stderr.strip()}")
+        return result
+
+    def json(self, *args: str):
+        return json.loads(self.run(*args, "--format", "json").stdout)
+
+    def ok_to_stop(self, osd_ids: List[int]) -> bool:
+        return self.run("osd", "ok-to-stop", *map(str, osd_ids), check=False).returncode == 0
+
+    def osdmap_epoch(self) -> int:
+        return self.json("osd", "dump")["epoch"]
+
+    def osds_not_restarted(self, osd_ids: List[int], epoch: int) -> List[int]:
+        """
+        返回尚未在 epoch 之后重新 up 的 OSD，避免把重启前还未被标记为 down 的 OSD 当作已恢复。
+        """
+        wanted = set(osd_ids)
+        return sorted(
+            osd["osd"]
+            for osd in self.json("osd", "dump")["osds"]
+            if osd["osd"] in wanted and (not osd["up"] or osd.get("up_from", 0) <= epoch)
+        )
+
+
+def load_hosts(path: str) -> List[str]:
+    """
+    读取待重启的主机，跳过注释、空行和已标记为已重启的主机。
+    """
+    hosts = []
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#") or RESTARTED_MARK in fields[1:]:
+                continue
+            hosts.append(fields[0])
+    return hosts
+
+
+def mark_restarted(path: str, hosts: List[str]):
+    done = set(hosts)
+    stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(path) as f:
+        lines = f.read().splitlines()
+    lines = [f"{line} {RESTARTED_MARK} {stamp}" if line.strip() in done else line for line in lines]
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def detect_failure_domain(ceph: Ceph) -> str:
+    """
+    取所有 CRUSH 规则中 chooseleaf 层级最低的类型作为故障域，保证对每个池都安全。
+    """
+    crush = ceph.json("osd", "crush", "dump")
+    type_ids = {t["name"]: t["type_id"] for t in crush["types"]}
+    domains = {
+        step["type"]
+        for rule in crush["rules"]
+        for step in rule["steps"]
+        if step["op"].startswith("chooseleaf") or step["op"].startswith("choose_")
+    }
+    if not domains:
+        return "host"
+    return min(domains, key=lambda name: type_ids.get(name, 0))
+
+
+def group_hosts(ceph: Ceph, hosts: List[str], failure_domain: str):
+    """
+    按故障域分组主机，并找出每台主机上的 OSD。
+
+    Returns:
+        (OrderedDict[str, List[str]], Dict[str, List[int]]): 故障域 -> 主机，主机 -> OSD ID。
+    """
+    nodes = {node["id"]: node for node in ceph.json("osd", "tree")["nodes"]}
+    parents = {child: node["id"] for node in nodes.values() for child in node.get("children", [])}
+    by_name = {node["name"]: node for node in nodes.values() if node["type"] == "host"}
+
+    domains: "OrderedDict[str, List[str]]" = OrderedDict()
+    host_osds = {}
+    for host in hosts:
+        node = by_name.get(host)
+        if node is None:
+            raise RestartError(f"主机 {host} 不在 CRUSH 树中")
+        host_osds[host] = sorted(child for child in node.get("children", []) if child >= 0)
+        domain = node
+        while domain["type"] != failure_domain:
+            if domain["id"] not in parents:
+                raise RestartError(f"主机 {host} 没有类型为 {failure_domain} 的上级")
+            domain = nodes[parents[domain["id"]]]
+        domains.setdefault(domain["name"], []).append(host)
+    return domains, host_osds
+
+
+def plan_waves(domains: "OrderedDict[str, List[str]]", max_parallel: int) -> List[List[str]]:
+    """
+    每个故障域内按 max_parallel 切分批次，不同故障域的主机不会出现在同一批。
+    """
+    waves = []
+    for domain_hosts in domains.values():
+        for i in range(0, len(domain_hosts), max_parallel):
+            waves.append(domain_hosts[i : i + max_parallel])
+    return waves
+
+
+def wait_until(condition, timeout: float, description: str):
+    """
+    轮询直到 condition() 返回真，间隔从 POLL_INTERVAL_SECONDS 逐步增加到 MAX_POLL_INTERVAL_SECONDS。
+    """
+    start = time.monotonic()
+    interval = POLL_INTERVAL_SECONDS
+    while True:
+        if condition():
+            logger.info(f"{description}：已满足，用时 {time.monotonic() - start:.0f} 秒")
+            return
+        elapsed = time.monotonic() - start
+        if elapsed >= timeout:
+            raise RestartError(f"{description}：{timeout:.0f} 秒内未满足")
+        time.sleep(min(interval, timeout - elapsed))
+        interval = min(interval * 2, MAX_POLL_INTERVAL_SECONDS)
+
+
+def wait_for_clean_pgs(watcher: HealthWatcher, timeout: float):
+    try:
+        watcher.wait("clean", timeout)
+    except HealthError as e:
+        raise RestartError(str(e))
+
+
+def shrink_to_safe(ceph: Ceph, wave: List[str], host_osds: Dict[str, List[int]]) -> List[str]:
+    """
+    去掉批次末尾的主机，直到 ceph osd ok-to-stop 确认可以同时停止剩余主机的 OSD。
+    """
+    while wave:
+        osd_ids = [osd for host in wave for osd in host_osds[host]]
+        if not osd_ids or ceph.ok_to_stop(osd_ids):
+            return wave
+        logger.warning(f"ceph osd ok-to-stop 不允许同时停止 {', '.join(wave)}")
+        wave = wave[:-1]
+    return wave
+
+
+def reboot_hosts(ansible: str, inventory: str, hosts: List[str]):
+    cmd = [
+        ansible,
+        ",".join(hosts),
+        "-i",
+        inventory,
+        "-b",
+        "-f",
+        str(len(hosts)),
+        "-m",
+        "reboot",
+        "-a",
+        f"reboot_timeout={REBOOT_TIMEOUT_SECONDS}",
+    ]
+    logger.info(f"执行: {' '.join(cmd)}")
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RestartError(f"重启 {', '.join(hosts)} 失败:\n{result.stdout}{result.stderr}")
+
+
+def restart_wave(
+    ceph: Ceph, watcher: HealthWatcher, args, wave: List[str], host_osds: Dict[str, List[int]]
+) -> List[str]:
+    """
+    重启一批主机，返回实际重启的主机（可能因 ok-to-stop 缩小）。
+    """
+    wait_for_clean_pgs(watcher, args.pg_timeout)
+    wave = shrink_to_safe(ceph, wave, host_osds)
+    if not wave:
+        raise RestartError("ceph osd ok-to-stop 不允许停止任何一台主机")
+    osd_ids = [osd for host in wave for osd in host_osds[host]]
+
+    ceph.run("osd", "set-group", "noout", *wave)
+    logger.info(f"已对 {', '.join(wave)} 设置 noout")
+    try:
+        epoch = ceph.osdmap_epoch()
+        reboot_hosts(args.ansible, args.inventory, wave)
+        wait_until(
+            lambda: not ceph.osds_not_restarted(osd_ids, epoch), args.osd_up_timeout, f"OSD {osd_ids} 重启后全部 up"
+        )
+    except RestartError:
+        # OSD 未恢复时保留 noout，避免数据迁移，由管理员处理
+        logger.error(f"保留了 {', '.join(wave)} 的 noout，处理后执行: ceph osd unset-group noout {' '.join(wave)}")
+        raise
+    ceph.run("osd", "unset-group", "noout", *wave)
+    logger.info(f"已取消 {', '.join(wave)} 的 noout")
+    wait_for_clean_pgs(watcher, args.pg_timeout)
+    return wave
+
+
+def confirm(wave: List[str]) -> bool:
+    answer = input(f"确认要重启 {', '.join(wave)} 吗？(y/N): ")
+    return answer.strip().lower() == "y"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host-file", default=HOST_FILE, help="主机列表文件")
+    parser.add_argument("--inventory", default=INVENTORY, help="ansible inventory")
+    parser.add_argument("--failure-domain", help="CRUSH 故障域类型，默认从 CRUSH 规则中检测")
+    parser.add_argument("--max-parallel", type=int, default=DEFAULT_MAX_PARALLEL, help="每批最多同时重启的主机数")
+    parser.add_argument("--pg-timeout", type=float, default=PG_TIMEOUT_SECONDS, help="等待 PG 恢复的超时秒数")
+    parser.add_argument("--osd-up-timeout", type=float, default=OSD_UP_TIMEOUT_SECONDS, help="等待 OSD up 的超时秒数")
+    parser.add_argument("--ceph", default="ceph", help="ceph 命令")
+    parser.add_argument("--ansible", default="ansible", help="ansible 命令")
+    parser.add_argument("--dry-run", action="store_true", help="只打印分批计划")
+    parser.add_argument("-y", "--yes", action="store_true", help="不逐批确认")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(levelname)s %(asctime)s] %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler(f"restart-{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+        ],
+    )
+
+    ceph = Ceph(args.ceph)
+    try:
+        hosts = load_hosts(args.host_file)
+        if not hosts:
+            logger.info("没有待重启的主机")
+            return 0
+        failure_domain = args.failure_domain or detect_failure_domain(ceph)
+        domains, host_osds = group_hosts(ceph, hosts, failure_domain)
+        # 故障域为 host 时，不同主机可能持有同一 PG 的副本，每批只能有一台
+        max_parallel = 1 if failure_domain == "host" else args.max_parallel
+        waves = plan_waves(domains, max_parallel)
+        logger.info(f"故障域 {failure_domain}，{len(hosts)} 台主机分为 {len(waves)} 批")
+        for i, wave in enumerate(waves, 1):
+            logger.info(f"  第 {i} 批: {', '.join(wave)}")
+        if args.dry_run:
+            return 0
+
+        # 整个滚动重启复用一个状态会话和 ceph -w 进程
+        with HealthWatcher(args.ceph) as watcher:
+            start = time.monotonic()
+            pending = [list(wave) for wave in waves]
+            while pending:
+                wave = pending.pop(0)
+                if not args.yes and not confirm(wave):
+                    logger.info("用户取消")
+                    return 1
+                wave_start = time.monotonic()
+                done = restart_wave(ceph, watcher, args, wave, host_osds)
+                mark_restarted(args.host_file, done)
+                logger.info(f"{', '.join(done)} 重启完成，用时 {time.monotonic() - wave_start:.0f} 秒")
+                # ok-to-stop 缩小批次时，剩余主机作为下一批
+                if len(done) < len(wave):
+                    pending.insert(0, wave[len(done) :])
+            logger.info(f"全部 {len(hosts)} 台主机重启完成，用时 {time.monotonic() - start:.0f} 秒")
+        return 0
+    except RestartError as e:
+        logger.error(str(e))
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
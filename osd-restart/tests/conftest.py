@@ -0,0 +1,123 @@
+import json
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Stand-in for the ceph CLI. The cluster lives in state.json next to it; every call is appended to calls.log.
+FAKE_CEPH = """#!{python}
+import json, os, sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+state_path = os.path.join(here, "state.json")
+with open(state_path) as f:
+    state = json.load(f)
+with open(os.path.join(here, "calls.log"), "a") as f:
+    f.write(" ".join(["ceph", *sys.argv[1:]]) + "\\n")
+args = [arg for arg in sys.argv[1:] if arg not in ("--format", "json")]
+
+if args == ["-w"]:
+    sys.exit(0)
+if args == ["status"]:
+    # Answered in order, the last answer repeats
+    status = state["status"][0]
+    if len(state["status"]) > 1:
+        state["status"].pop(0)
+        with open(state_path, "w") as f:
+            json.dump(state, f)
+    if "error" in status:
+        print(status["error"], file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(status))
+elif args[:2] == ["osd", "ok-to-stop"]:
+    sys.exit(0 if len(args) - 2 <= state["ok_to_stop_max"] else 1)
+elif args == ["osd", "dump"]:
+    print(json.dumps(state["osd_dump"]))
+elif args == ["osd", "tree"]:
+    print(json.dumps(state["osd_tree"]))
+elif args == ["osd", "crush", "dump"]:
+    print(json.dumps(state["crush_dump"]))
+"""
+
+# Stand-in for ansible, whose reboot module brings the OSDs of the given hosts up in a new osdmap epoch
+FAKE_ANSIBLE = """#!{python}
+import json, os, sys
+
+here = os.path.dirname(os.path.abspath(__file__))
+state_path = os.path.join(here, "state.json")
+with open(state_path) as f:
+    state = json.load(f)
+with open(os.path.join(here, "calls.log"), "a") as f:
+    f.write(" ".join(["ansible", *sys.argv[1:]]) + "\\n")
+hosts = sys.argv[1].split(",")
+if set(hosts) & set(state.get("reboot_fails", [])):
+    print("UNREACHABLE", file=sys.stderr)
+    sys.exit(4)
+osdmap = state["osd_dump"]
+osdmap["epoch"] += 1
+for osd in osdmap["osds"]:
+    if any(osd["osd"] in state["host_osds"][host] for host in hosts):
+        osd["up"] = 1
+        osd["up_from"] = osdmap["epoch"]
+with open(state_path, "w") as f:
+    json.dump(state, f)
+"""
+
+
+class FakeCluster:
+    """
+    A directory with fake ceph and ansible executables sharing one cluster state.
+
+    Args:
+        directory (str): The directory to create the executables and state in.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        self.ceph = os.path.join(self.directory, "ceph")
+        self.ansible = os.path.join(self.directory, "ansible")
+        for path, source in ((self.ceph, FAKE_CEPH), (self.ansible, FAKE_ANSIBLE)):
+            with open(path, "w") as f:
+                f.write(source.format(python=sys.executable))
+            os.chmod(path, 0o755)
+        self.state = {"status": [status()], "ok_to_stop_max": 0, "host_osds": {}}
+        self.save()
+
+    def save(self):
+        with open(os.path.join(self.directory, "state.json"), "w") as f:
+            json.dump(self.state, f)
+
+    def load(self):
+        with open(os.path.join(self.directory, "state.json")) as f:
+            self.state = json.load(f)
+        return self.state
+
+    def calls(self, program="ceph"):
+        try:
+            with open(os.path.join(self.directory, "calls.log")) as f:
+                return [line.split(" ", 1)[1].strip() for line in f if line.startswith(program + " ")]
+        except FileNotFoundError:
+            return []
+
+
+def status(health="HEALTH_OK", pgs=None, degraded=0, misplaced=0):
+    """
+    A `ceph status --format json` answer.
+    """
+    pgs = pgs if pgs is not None else {"active+clean": 128}
+    return {
+        "health": {"status": health},
+        "pgmap": {
+            "pgs_by_state": [{"state_name": name, "count": count} for name, count in pgs.items()],
+            "degraded_objects": degraded,
+            "misplaced_objects": misplaced,
+        },
+    }
+
+
+@pytest.fixture
+def cluster(tmp_path):
+    return FakeCluster(tmp_path)
@@ -0,0 +1,109 @@
+import os
+import subprocess
+
+import pytest
+
+import health_watch
+from conftest import status
+from health_watch import HealthTimeout, HealthWatcher, Progress, main
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(health_watch, "MIN_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(health_watch, "MAX_POLL_SECONDS", 0.05)
+    monkeypatch.setattr(health_watch, "MIN_CHECK_SECONDS", 0)
+
+
+def watcher(cluster):
+    return HealthWatcher(cluster.ceph, use_rados=False, watch_events=False)
+
+
+def test_progress_from_status():
+    progress = Progress.from_status(status("HEALTH_WARN", {"active+clean": 120, "active+undersized+degraded": 8}, 10, 5))
+    assert not progress.clean
+    assert progress.remaining_objects == 15
+    assert progress.unclean_states() == {"active+undersized+degraded": 8}
+    assert Progress.from_status(status(pgs={"active+clean+scrubbing": 4, "active+clean": 124})).clean
+
+
+def test_wait_until_clean(cluster):
+    cluster.state["status"] = [
+        status("HEALTH_WARN", {"active+undersized+degraded": 128}, degraded=100),
+        status("HEALTH_WARN", {"active+undersized+degraded": 64, "active+clean": 64}, degraded=50),
+        # Warnings unrelated to the PGs do not block waiting for clean PGs
+        status("HEALTH_WARN", {"active+clean": 128}),
+    ]
+    cluster.save()
+    with watcher(cluster) as w:
+        progress = w.wait("clean", timeout=10)
+    assert progress.health == "HEALTH_WARN"
+    assert cluster.calls() == ["status --format json"] * 3
+
+
+def test_wait_until_health_ok(cluster):
+    cluster.state["status"] = [status("HEALTH_WARN"), status("HEALTH_OK")]
+    cluster.save()
+    with watcher(cluster) as w:
+        assert w.wait("health-ok", timeout=10).health == "HEALTH_OK"
+
+
+def test_wait_retries_failed_queries(cluster):
+    cluster.state["status"] = [
+        {"error": "error connecting to the cluster"},
+        {"error": "error connecting to the cluster"},
+        status(),
+    ]
+    cluster.save()
+    with watcher(cluster) as w:
+        assert w.wait("clean", timeout=10).clean
+    assert len(cluster.calls()) == 3
+
+
+def test_wait_timeout_reports_last_error(cluster):
+    cluster.state["status"] = [{"error": "monclient: hunting for new mon"}]
+    cluster.save()
+    with watcher(cluster) as w, pytest.raises(HealthTimeout, match="hunting for new mon"):
+        w.wait("clean", timeout=0.2)
+
+
+def test_wait_timeout(cluster):
+    cluster.state["status"] = [status("HEALTH_WARN", {"active+undersized+degraded": 128}, degraded=100)]
+    cluster.save()
+    with watcher(cluster) as w, pytest.raises(HealthTimeout, match="HEALTH_WARN"):
+        w.wait("clean", timeout=0.2)
+
+
+def test_eta_from_observed_rate(cluster):
+    with watcher(cluster) as w:
+        assert w._eta(Progress.from_status(status(degraded=1000)), 0.0) is None
+        # 500 objects recovered in 10 seconds leave 50 seconds for the remaining 500
+        assert w._eta(Progress.from_status(status(degraded=500)), 10.0) == pytest.approx(10.0)
+        w._rate = None
+        w._last = (10.0, 500)
+        assert w._eta(Progress.from_status(status(degraded=250)), 20.0) == pytest.approx(10.0)
+
+
+def test_main_exit_codes(cluster):
+    assert main(["--ceph", cluster.ceph, "--no-rados", "--timeout", "5"]) == 0
+    cluster.state["status"] = [status("HEALTH_WARN")]
+    cluster.save()
+    assert main(["--ceph", cluster.ceph, "--no-rados", "--until", "health-ok", "--timeout", "0.1"]) == 2
+
+
+@pytest.mark.parametrize(
+    "exit_code, message",
+    [(2, "等待超时，Ceph集群状态未能在30秒内恢复正常: [ERROR x] 30 秒内集群未恢复"), (1, "退出码 1）: [ERROR x] 30 秒内集群未恢复")],
+)
+def test_wait_for_ceph_ok_reports_error(tmp_path, exit_code, message):
+    fake_watch = tmp_path / "health_watch.py"
+    fake_watch.write_text(f"import sys\nprint('[ERROR x] 30 秒内集群未恢复', file=sys.stderr)\nsys.exit({exit_code})\n")
+    script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "auto-restart-nodes.sh")
+    result = subprocess.run(
+        ["bash", "-c", f'source "{script}"; HEALTH_WATCH="{fake_watch}"; wait_for_ceph_ok 30'],
+        cwd=tmp_path,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 1
+    assert message in result.stdout
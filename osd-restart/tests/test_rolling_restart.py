@@ -0,0 +1,134 @@
+import pytest
+
+import health_watch
+import rolling_restart
+from rolling_restart import (
+    Ceph,
+    detect_failure_domain,
+    group_hosts,
+    load_hosts,
+    main,
+    plan_waves,
+    shrink_to_safe,
+)
+
+HOST_OSDS = {"node1": [0, 1], "node2": [2, 3], "node3": [4, 5], "node4": [6, 7]}
+RACKS = {"rack1": ["node1", "node2", "node3"], "rack2": ["node4"]}
+
+
+@pytest.fixture(autouse=True)
+def fast_polling(monkeypatch):
+    monkeypatch.setattr(rolling_restart, "POLL_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(rolling_restart, "MAX_POLL_INTERVAL_SECONDS", 0.05)
+    monkeypatch.setattr(health_watch, "MIN_POLL_SECONDS", 0.01)
+    monkeypatch.setattr(health_watch, "MIN_CHECK_SECONDS", 0)
+
+
+@pytest.fixture
+def racks(cluster, tmp_path, monkeypatch):
+    """
+    Four hosts with two OSDs each, in two racks, replicated across racks.
+    """
+    nodes = [{"id": -1, "name": "default", "type": "root", "children": [-2, -3]}]
+    host_ids = {}
+    for rack_index, (rack, hosts) in enumerate(RACKS.items()):
+        rack_id = -2 - rack_index
+        children = []
+        for host in hosts:
+            host_ids[host] = -10 - len(host_ids)
+            children.append(host_ids[host])
+        nodes.append({"id": rack_id, "name": rack, "type": "rack", "children": children})
+    for host, osds in HOST_OSDS.items():
+        nodes.append({"id": host_ids[host], "name": host, "type": "host", "children": osds})
+        nodes.extend({"id": osd, "name": f"osd.{osd}", "type": "osd"} for osd in osds)
+
+    cluster.state.update(
+        osd_tree={"nodes": nodes},
+        crush_dump={
+            "types": [
+                {"type_id": 0, "name": "osd"},
+                {"type_id": 1, "name": "host"},
+                {"type_id": 3, "name": "rack"},
+                {"type_id": 11, "name": "root"},
+            ],
+            "rules": [
+                {"steps": [{"op": "take", "item": -1}, {"op": "chooseleaf_firstn", "num": 0, "type": "rack"}, {"op": "emit"}]}
+            ],
+        },
+        osd_dump={"epoch": 10, "osds": [{"osd": osd, "up": 1, "up_from": 5} for osds in HOST_OSDS.values() for osd in osds]},
+        host_osds=HOST_OSDS,
+        ok_to_stop_max=4,
+    )
+    cluster.save()
+    (tmp_path / "host.txt").write_text("# hosts\nnode1\nnode2 已重启 2025-09-15 10:00:00\nnode3\nnode4\n\n")
+    monkeypatch.chdir(tmp_path)
+    return cluster
+
+
+def test_load_hosts_skips_restarted(racks, tmp_path):
+    assert load_hosts(str(tmp_path / "host.txt")) == ["node1", "node3", "node4"]
+
+
+def test_waves_stay_within_failure_domain(racks):
+    ceph = Ceph(racks.ceph)
+    assert detect_failure_domain(ceph) == "rack"
+    domains, host_osds = group_hosts(ceph, ["node1", "node2", "node4", "node3"], "rack")
+    assert dict(domains) == {"rack1": ["node1", "node2", "node3"], "rack2": ["node4"]}
+    assert host_osds["node4"] == [6, 7]
+    assert plan_waves(domains, 2) == [["node1", "node2"], ["node3"], ["node4"]]
+
+
+def test_shrink_to_safe(racks):
+    ceph = Ceph(racks.ceph)
+    racks.state["ok_to_stop_max"] = 2
+    racks.save()
+    assert shrink_to_safe(ceph, ["node1", "node2", "node3"], HOST_OSDS) == ["node1"]
+    assert racks.calls() == ["osd ok-to-stop 0 1 2 3 4 5", "osd ok-to-stop 0 1 2 3", "osd ok-to-stop 0 1"]
+    racks.state["ok_to_stop_max"] = 0
+    racks.save()
+    assert shrink_to_safe(ceph, ["node1"], HOST_OSDS) == []
+
+
+def test_osds_not_restarted_waits_for_new_up_from(racks):
+    ceph = Ceph(racks.ceph)
+    epoch = ceph.osdmap_epoch()
+    # Still up from before the reboot, i.e. not yet marked down
+    assert ceph.osds_not_restarted([0, 1], epoch) == [0, 1]
+    racks.state["osd_dump"]["osds"][0].update(up=0)
+    racks.state["osd_dump"]["osds"][1].update(up=1, up_from=epoch + 1)
+    racks.save()
+    assert ceph.osds_not_restarted([0, 1], epoch) == [0]
+
+
+def test_rolling_restart(racks, tmp_path):
+    racks.state["ok_to_stop_max"] = 2
+    racks.save()
+    assert main(["--ceph", racks.ceph, "--ansible", racks.ansible, "--max-parallel", "2", "--yes"]) == 0
+
+    # node1 and node3 share a rack but ok-to-stop allows only one host at a time, so node3 follows on its own
+    reboots = [call.split()[0] for call in racks.calls("ansible")]
+    assert reboots == ["node1", "node3", "node4"]
+    noout = [call for call in racks.calls() if "noout" in call]
+    assert noout == [
+        "osd set-group noout node1",
+        "osd unset-group noout node1",
+        "osd set-group noout node3",
+        "osd unset-group noout node3",
+        "osd set-group noout node4",
+        "osd unset-group noout node4",
+    ]
+    assert all("已重启" in line for line in (tmp_path / "host.txt").read_text().splitlines()[1:5])
+
+
+def test_rolling_restart_keeps_noout_after_failed_reboot(racks, tmp_path):
+    racks.state["reboot_fails"] = ["node3"]
+    racks.save()
+    assert main(["--ceph", racks.ceph, "--ansible", racks.ansible, "--max-parallel", "2", "--yes"]) == 1
+    assert [call for call in racks.calls() if "noout" in call] == ["osd set-group noout node1 node3"]
+    assert (tmp_path / "host.txt").read_text().splitlines()[1:4:2] == ["node1", "node3"]
+
+
+def test_dry_run(racks):
+    assert main(["--ceph", racks.ceph, "--dry-run"]) == 0
+    assert racks.calls("ansible") == []
+    assert not any("noout" in call for call in racks.calls())